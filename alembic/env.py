@@ -2,7 +2,7 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
-from app.database import settings, Base
+from app.database import settings, sync_database_url, Base
 from app.models import User, Recipe, Favorite, Rating, AIRequest
 
 config = context.config
@@ -10,10 +10,17 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+config.set_main_option("sqlalchemy.url", sync_database_url(settings.DATABASE_URL).replace("%", "%%"))
 
 target_metadata = Base.metadata
 
+# Database-managed objects that are intentionally not mapped on the models
+UNMAPPED_OBJECTS = {"search_vector", "ix_recipes_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return name not in UNMAPPED_OBJECTS
+
 
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
@@ -22,6 +29,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -37,7 +45,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,65 @@
+"""recipe_tags_ingredients_jsonb
+
+Revision ID: 392bf1b35142
+Revises: b2b8d922f190
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '392bf1b35142'
+down_revision: Union[str, None] = 'b2b8d922f190'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Same expression as b2b8d922f190; the generated column has to be rebuilt because
+# Postgres refuses to change the type of a column a generated column depends on.
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(tags::text, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(ingredients::text, '')), 'C')"
+)
+
+
+def _drop_search_vector() -> None:
+    op.drop_index('ix_recipes_search_vector', table_name='recipes')
+    op.drop_column('recipes', 'search_vector')
+
+
+def _add_search_vector() -> None:
+    op.execute(
+        f"ALTER TABLE recipes ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED"
+    )
+    op.create_index('ix_recipes_search_vector', 'recipes', ['search_vector'], postgresql_using='gin')
+
+
+def upgrade() -> None:
+    _drop_search_vector()
+    op.alter_column('recipes', 'ingredients', type_=postgresql.JSONB(), existing_type=sa.JSON(),
+                    existing_nullable=False, postgresql_using='ingredients::jsonb')
+    op.alter_column('recipes', 'tags', type_=postgresql.JSONB(), existing_type=sa.JSON(),
+                    existing_nullable=True, postgresql_using='tags::jsonb')
+    _add_search_vector()
+    op.create_index('ix_recipes_tags', 'recipes', ['tags'], postgresql_using='gin',
+                    postgresql_ops={'tags': 'jsonb_path_ops'})
+    op.create_index('ix_recipes_ingredients', 'recipes', ['ingredients'], postgresql_using='gin',
+                    postgresql_ops={'ingredients': 'jsonb_path_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recipes_ingredients', table_name='recipes')
+    op.drop_index('ix_recipes_tags', table_name='recipes')
+    _drop_search_vector()
+    op.alter_column('recipes', 'tags', type_=sa.JSON(), existing_type=postgresql.JSONB(),
+                    existing_nullable=True, postgresql_using='tags::json')
+    op.alter_column('recipes', 'ingredients', type_=sa.JSON(), existing_type=postgresql.JSONB(),
+                    existing_nullable=False, postgresql_using='ingredients::json')
+    _add_search_vector()
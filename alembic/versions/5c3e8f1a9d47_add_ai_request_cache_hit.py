@@ -0,0 +1,25 @@
+"""add_ai_request_cache_hit
+
+Revision ID: 5c3e8f1a9d47
+Revises: d2025f251da9
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '5c3e8f1a9d47'
+down_revision: Union[str, None] = 'd2025f251da9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ai_requests', sa.Column('cache_hit', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    op.drop_column('ai_requests', 'cache_hit')
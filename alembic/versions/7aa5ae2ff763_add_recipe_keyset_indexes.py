@@ -0,0 +1,46 @@
+"""add_recipe_keyset_indexes
+
+Revision ID: 7aa5ae2ff763
+Revises: 216181ee4c1e
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '7aa5ae2ff763'
+down_revision: Union[str, None] = '216181ee4c1e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Build concurrently so large recipe tables stay writable during the migration
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_recipes_public_created_at_id', 'recipes',
+            [sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_public'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_recipes_public_avg_rating_id', 'recipes',
+            [sa.text('avg_rating DESC NULLS LAST'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_public'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_recipes_user_created_at_id', 'recipes',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_recipes_user_created_at_id', table_name='recipes', postgresql_concurrently=True)
+        op.drop_index('ix_recipes_public_avg_rating_id', table_name='recipes', postgresql_concurrently=True)
+        op.drop_index('ix_recipes_public_created_at_id', table_name='recipes', postgresql_concurrently=True)
@@ -0,0 +1,28 @@
+"""add_recipe_updated_at_index
+
+Revision ID: a4d7c2e9f013
+Revises: 5c3e8f1a9d47
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a4d7c2e9f013'
+down_revision: Union[str, None] = '5c3e8f1a9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Lets the recommendations fold-in find recently changed recipes without a table scan
+    with op.get_context().autocommit_block():
+        op.create_index('ix_recipes_updated_at', 'recipes', ['updated_at'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_recipes_updated_at', table_name='recipes', postgresql_concurrently=True)
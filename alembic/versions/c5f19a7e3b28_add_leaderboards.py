@@ -0,0 +1,50 @@
+"""add_leaderboards
+
+Revision ID: c5f19a7e3b28
+Revises: e81b5d0c6a2f
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c5f19a7e3b28'
+down_revision: Union[str, None] = 'e81b5d0c6a2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'leaderboard_entries',
+        sa.Column('board', sa.String(length=20), nullable=False),
+        sa.Column('tag', sa.String(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('recipe_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['recipe_id'], ['recipes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('board', 'tag', 'rank')
+    )
+    op.create_index('ix_leaderboard_entries_recipe_id', 'leaderboard_entries', ['recipe_id'])
+    op.create_table(
+        'leaderboard_refreshes',
+        sa.Column('board', sa.String(length=20), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('board')
+    )
+    # Trending refreshes read only the last days of activity
+    with op.get_context().autocommit_block():
+        op.create_index('ix_ratings_created_at', 'ratings', ['created_at'], postgresql_concurrently=True)
+        op.create_index('ix_favorites_created_at', 'favorites', ['created_at'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_favorites_created_at', table_name='favorites', postgresql_concurrently=True)
+        op.drop_index('ix_ratings_created_at', table_name='ratings', postgresql_concurrently=True)
+    op.drop_table('leaderboard_refreshes')
+    op.drop_index('ix_leaderboard_entries_recipe_id', table_name='leaderboard_entries')
+    op.drop_table('leaderboard_entries')
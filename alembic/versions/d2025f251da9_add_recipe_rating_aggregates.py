@@ -0,0 +1,51 @@
+"""add_recipe_rating_aggregates
+
+Revision ID: d2025f251da9
+Revises: 392bf1b35142
+Create Date: 2026-10-17 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd2025f251da9'
+down_revision: Union[str, None] = '392bf1b35142'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('recipes', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('recipes', sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+
+    # Keep only the latest rating per user and recipe before enforcing uniqueness
+    op.execute("""
+        DELETE FROM ratings older
+        USING ratings newer
+        WHERE older.user_id = newer.user_id
+          AND older.recipe_id = newer.recipe_id
+          AND older.id < newer.id
+    """)
+    op.create_unique_constraint('uq_ratings_user_recipe', 'ratings', ['user_id', 'recipe_id'])
+
+    op.execute("""
+        UPDATE recipes
+        SET rating_count = agg.rating_count,
+            rating_sum = agg.rating_sum,
+            avg_rating = agg.rating_sum::numeric / agg.rating_count
+        FROM (
+            SELECT recipe_id, count(*) AS rating_count, sum(rating) AS rating_sum
+            FROM ratings
+            GROUP BY recipe_id
+        ) AS agg
+        WHERE recipes.id = agg.recipe_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_ratings_user_recipe', 'ratings', type_='unique')
+    op.drop_column('recipes', 'rating_sum')
+    op.drop_column('recipes', 'rating_count')
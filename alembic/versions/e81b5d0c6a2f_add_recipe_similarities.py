@@ -0,0 +1,37 @@
+"""add_recipe_similarities
+
+Revision ID: e81b5d0c6a2f
+Revises: a4d7c2e9f013
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e81b5d0c6a2f'
+down_revision: Union[str, None] = 'a4d7c2e9f013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'recipe_similarities',
+        sa.Column('recipe_id', sa.Integer(), nullable=False),
+        sa.Column('similar_recipe_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['recipe_id'], ['recipes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['similar_recipe_id'], ['recipes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('recipe_id', 'similar_recipe_id')
+    )
+    op.create_index('ix_recipe_similarities_recipe_score', 'recipe_similarities', ['recipe_id', sa.text('score DESC')])
+    op.create_index('ix_recipe_similarities_similar_recipe_id', 'recipe_similarities', ['similar_recipe_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_recipe_similarities_similar_recipe_id', table_name='recipe_similarities')
+    op.drop_index('ix_recipe_similarities_recipe_score', table_name='recipe_similarities')
+    op.drop_table('recipe_similarities')
@@ -0,0 +1,157 @@
+"""add_recipe_ingredient_tokens
+
+Revision ID: f3a8b61d2c47
+Revises: c5f19a7e3b28
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+import re
+from collections import Counter
+from typing import FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = 'f3a8b61d2c47'
+down_revision: Union[str, None] = 'c5f19a7e3b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# A frozen copy of app.services.ingredients as of this revision, so later changes to the
+# normalizer do not change what this migration writes. Recipes saved afterwards are indexed
+# by the application's own copy.
+_TOKEN_RE = re.compile(r"[a-zà-ÿ]+(?:-[a-zà-ÿ]+)*|[,&()]")
+
+UNITS = frozenset({
+    "cup", "cups", "c", "tablespoon", "tablespoons", "tbsp", "tbs", "tb", "teaspoon", "teaspoons", "tsp",
+    "gram", "grams", "g", "kilogram", "kilograms", "kg", "milligram", "mg", "ounce", "ounces", "oz",
+    "pound", "pounds", "lb", "lbs", "milliliter", "milliliters", "millilitre", "ml", "liter", "liters",
+    "litre", "litres", "l", "dl", "cl", "pint", "pints", "quart", "quarts", "gallon", "pinch", "pinches",
+    "dash", "dashes", "handful", "handfuls", "clove", "cloves", "slice", "slices", "piece", "pieces",
+    "can", "cans", "tin", "tins", "jar", "jars", "package", "packages", "pkg", "packet", "bunch", "bunches",
+    "sprig", "sprigs", "stick", "sticks", "head", "heads", "stalk", "stalks", "fillet", "fillets", "drop",
+    "drops", "knob", "sheet", "sheets", "scoop", "scoops", "bag", "bags", "box", "bottle",
+})
+
+DESCRIPTORS = frozenset({
+    "a", "an", "of", "the", "and", "or", "to", "for", "about", "approximately", "some", "few", "more", "plus",
+    "chopped", "finely", "roughly", "coarsely", "thinly", "minced", "diced", "sliced", "grated", "shredded",
+    "crushed", "ground", "peeled", "seeded", "cored", "trimmed", "halved", "quartered", "cubed", "julienned",
+    "mashed", "melted", "softened", "beaten", "whisked", "sifted", "rinsed", "drained", "washed", "toasted",
+    "cooked", "uncooked", "raw", "boiled", "fresh", "freshly", "frozen", "thawed", "dried", "large", "medium",
+    "small", "big", "whole", "optional", "taste", "room", "temperature", "cold", "warm", "hot", "ripe",
+    "boneless", "skinless", "lean", "extra", "virgin", "organic", "packed", "heaped", "heaping", "level",
+    "good", "quality", "divided", "needed", "garnish", "serving", "into", "pieces", "cut", "inch", "cm",
+    "baby", "leaf", "leaves",
+})
+
+STAPLES = frozenset({"salt", "pepper", "black pepper", "water", "ice"})
+
+MAX_MISSING = 5
+
+_INVARIANT_PLURALS = ("ss", "us", "is", "ous")
+
+
+def singularize(word: str) -> str:
+    if len(word) <= 3 or word.endswith(_INVARIANT_PLURALS):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "sses", "zes")):
+        return word[:-2]
+    if word.endswith("ves") and not word.endswith(("olives", "chives")):
+        return word[:-3] + "f"
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def _canonical(words: List[str]) -> Optional[str]:
+    if not words:
+        return None
+    return " ".join(words[:-1] + [singularize(words[-1])])
+
+
+def ingredient_tokens(text: str) -> Tuple[str, ...]:
+    tokens: List[str] = []
+    words: List[str] = []
+    depth = 0
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word == "(":
+            depth += 1
+        elif word == ")":
+            depth = max(depth - 1, 0)
+        elif depth:
+            continue
+        elif word in ("and", "&"):
+            tokens.append(_canonical(words))
+            words = []
+        elif word in (",", "or"):
+            break
+        elif word not in UNITS and word not in DESCRIPTORS:
+            words.append(word)
+    tokens.append(_canonical(words))
+    return tuple(token for token in tokens if token)
+
+
+def normalize_ingredients(items: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(token for item in items if isinstance(item, str) for token in ingredient_tokens(item))
+
+
+def ingredient_columns(ingredients, frequencies):
+    tokens = sorted(normalize_ingredients(ingredients) - STAPLES)
+    rarest = sorted(tokens, key=lambda token: (frequencies.get(token, 0.0), token))[:MAX_MISSING + 1]
+    return tokens, [f"{position}:{token}" for position, token in enumerate(rarest)]
+
+
+def _batches(connection):
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text("SELECT id, ingredients FROM recipes WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    op.add_column('recipes', sa.Column('ingredient_tokens', postgresql.ARRAY(sa.String()), nullable=True))
+    op.add_column('recipes', sa.Column('ingredient_signature', postgresql.ARRAY(sa.String()), nullable=True))
+
+    # Signatures are picked by how common each ingredient is, so count them all before writing any
+    connection = op.get_bind()
+    counts, total = Counter(), 0
+    for rows in _batches(connection):
+        for row in rows:
+            counts.update(normalize_ingredients(row.ingredients or []) - STAPLES)
+        total += len(rows)
+    frequencies = {token: count / total for token, count in counts.items()}
+    update = sa.text("UPDATE recipes SET ingredient_tokens = :tokens, ingredient_signature = :signature WHERE id = :id")
+    for rows in _batches(connection):
+        params = []
+        for row in rows:
+            tokens, signature = ingredient_columns(row.ingredients or [], frequencies)
+            params.append({"id": row.id, "tokens": tokens, "signature": signature})
+        connection.execute(update, params)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_recipes_ingredient_signature', 'recipes', ['ingredient_signature'],
+            postgresql_using='gin', postgresql_concurrently=True
+        )
+        # Writers read ingredient frequencies from the planner statistics
+        op.execute('ANALYZE recipes')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_recipes_ingredient_signature', table_name='recipes', postgresql_concurrently=True)
+    op.drop_column('recipes', 'ingredient_signature')
+    op.drop_column('recipes', 'ingredient_tokens')
@@ -1,8 +1,15 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional, Union
+from app.services import metrics, query_diagnostics
 
 # Settings
 class Settings(BaseSettings):
@@ -10,23 +17,294 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_TOKEN_CACHE_SIZE: int = 4096
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16  # queued + running hashes before sign-ins get a 503
     OPENAI_API_KEY: Optional[str] = None
-    
+    DB_ASYNC: bool = True  # False serves requests through the sync driver on the threadpool
+    DB_POOL_STRATEGY: str = "queue"  # "queue", "null" (connect per session) or "single" (one connection per process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 300
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 25000  # 0 disables
+    DB_PROXY: bool = False  # behind RDS Proxy/PgBouncer: no server-side prepared statement cache
+    CACHE_BACKEND: Optional[str] = None  # "memory" or "redis"; unset means redis if CACHE_URL is set
+    CACHE_URL: Optional[str] = None
+    CACHE_TTL_SECONDS: int = 60  # also how stale other instances' in-process copies can get
+    CACHE_MAX_ENTRIES: int = 1024
+    AI_CACHE_TTL_SECONDS: int = 86400
+    AI_CACHE_MAX_ENTRIES: int = 256
+    AI_BATCH_MAX_ITEMS: int = 14
+    AI_BATCH_CONCURRENCY: int = 14  # a full batch runs in one wave; lower it if OpenAI rate limits bite
+    AI_REQUESTS_PER_SECOND: float = 0.2  # per user, refill rate of the request bucket; 0 disables
+    AI_REQUEST_BURST: int = 5
+    AI_TOKEN_BUDGET_WINDOW_SECONDS: int = 86400
+    AI_TOKEN_BUDGET_REGULAR: int = 100000  # OpenAI tokens per user per window; 0 disables
+    AI_TOKEN_BUDGET_CHEF: int = 500000
+    AI_RATE_LIMIT_MAX_KEYS: int = 10000  # bound of the in-process limiter state
+    RECIPE_IMPORT_CHUNK_SIZE: int = 1000  # rows per multi-row INSERT
+    RECIPE_IMPORT_MAX_LINE_BYTES: int = 1048576
+    RECIPE_EXPORT_BATCH_SIZE: int = 500  # rows fetched per round trip of the export cursor
+    INGREDIENT_FREQUENCY_REFRESH_SECONDS: int = 3600  # how often writers re-read which ingredients are common
+    RECOMMENDATION_TOP_K: int = 10  # similar recipes stored per recipe
+    RECOMMENDATION_MAX_DF: float = 0.5  # features in a larger share of recipes carry no weight
+    RECOMMENDATION_TAG_WEIGHT: float = 0.5  # tags relative to ingredients
+    LEADERBOARD_SIZE: int = 100  # places kept per board and tag
+    LEADERBOARD_PRIOR_RATINGS: int = 10  # ratings' worth of the site-wide mean in the Bayesian average
+    LEADERBOARD_TRENDING_HALF_LIFE_HOURS: float = 48
+    LEADERBOARD_TRENDING_WINDOW_DAYS: int = 14  # older activity is not counted at all
+    LEADERBOARD_TRENDING_FAVORITE_WEIGHT: float = 2.0  # a favorite counts as this many ratings
+    LEADERBOARD_MAX_STALENESS_SECONDS: int = 900  # older boards answer 503 rather than serve stale places; 0 disables
+    METRICS_ENABLED: bool = True  # request/SQL/OpenAI metrics, Server-Timing headers and /metrics
+    METRICS_TOKEN: Optional[str] = None  # if set, /metrics requires "Authorization: Bearer <token>"
+    QUERY_DIAGNOSTICS: bool = False  # development/CI: warn about likely N+1s and log slow queries with their plans
+    QUERY_DIAGNOSTICS_REPEAT_THRESHOLD: int = 5  # more executions of one statement shape per request are a likely N+1
+    QUERY_DIAGNOSTICS_SLOW_MS: int = 200
+
     class Config:
         env_file = ".env"
         case_sensitive = True
 
 settings = Settings()
 
+# Driver selection: DATABASE_URL may name either driver, we pick the one the mode needs
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+_SYNC_DRIVERS = {"postgresql": "postgresql+psycopg2", "sqlite": "sqlite"}
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=_ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+def sync_database_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=_SYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+# Connection metrics
+class PoolMetrics:
+    """Counts physical connections opened and time spent waiting for a pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.connections_opened = 0
+            self.connect_seconds = 0.0
+            self.checkouts = 0
+            self.checkout_seconds = 0.0
+            self.checkout_seconds_max = 0.0
+
+    def record_connect(self, seconds: float) -> None:
+        with self._lock:
+            self.connections_opened += 1
+            self.connect_seconds += seconds
+
+    def record_checkout(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "strategy": settings.DB_POOL_STRATEGY,
+                "connections_opened": self.connections_opened,
+                "connect_seconds": round(self.connect_seconds, 6),
+                "checkouts": self.checkouts,
+                "checkout_seconds": round(self.checkout_seconds, 6),
+                "checkout_seconds_max": round(self.checkout_seconds_max, 6),
+            }
+
+pool_metrics = PoolMetrics()
+
+class _TimedCheckout:
+    # Covers both waiting for a free connection and opening a new one
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_checkout(time.perf_counter() - start)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
 # Database
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+POOL_STRATEGIES = ("queue", "null", "single")
+
+def pool_options(is_async: bool) -> Dict[str, Any]:
+    strategy = settings.DB_POOL_STRATEGY
+    if strategy not in POOL_STRATEGIES:
+        raise ValueError(f"DB_POOL_STRATEGY must be one of {', '.join(POOL_STRATEGIES)}")
+    if strategy == "null":
+        # Nothing is held between sessions; pairs well with an external pooler
+        return {"poolclass": TimedNullPool}
+    
+    options: Dict[str, Any] = {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+    if strategy == "single":
+        # One invocation at a time per Lambda container, so one warm connection is enough
+        options.update(pool_size=1, max_overflow=0)
+    else:
+        options.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+    return options
+
+def connect_args(url: str, is_async: bool) -> Dict[str, Any]:
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+    
+    # Sent as startup parameters rather than SET so proxies don't pin the session
+    server_settings = {"application_name": "recipehub"}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    if is_async:
+        args: Dict[str, Any] = {"server_settings": server_settings}
+        if settings.DB_PROXY:
+            # Transaction-level poolers may hand each statement to a different backend
+            args.update(statement_cache_size=0, prepared_statement_cache_size=0)
+        return args
+    return {"options": " ".join(f"-c {name}={value}" for name, value in server_settings.items())}
+
+def instrument_engine(engine: Engine) -> None:
+    @event.listens_for(engine, "do_connect")
+    def timed_connect(dialect, conn_rec, cargs, cparams):
+        start = time.perf_counter()
+        connection = dialect.connect(*cargs, **cparams)
+        pool_metrics.record_connect(time.perf_counter() - start)
+        return connection
+    
+    if settings.METRICS_ENABLED:
+        event.listen(engine, "before_cursor_execute", metrics.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", metrics.after_cursor_execute)
+    if settings.QUERY_DIAGNOSTICS:
+        query_diagnostics.instrument(engine, settings.QUERY_DIAGNOSTICS_SLOW_MS / 1000)
+
+_engine: Optional[Union[Engine, AsyncEngine]] = None
+_sessionmaker: Optional[Union[sessionmaker, async_sessionmaker]] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> Union[Engine, AsyncEngine]:
+    """Create the engine on first use so cold starts that never touch the database skip it."""
+    global _engine, _sessionmaker
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if settings.DB_ASYNC:
+                    url = async_database_url(settings.DATABASE_URL)
+                    engine = create_async_engine(url, connect_args=connect_args(url, True), **pool_options(True))
+                    instrument_engine(engine.sync_engine)
+                    _sessionmaker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+                else:
+                    url = sync_database_url(settings.DATABASE_URL)
+                    engine = create_engine(url, connect_args=connect_args(url, False), **pool_options(False))
+                    instrument_engine(engine)
+                    _sessionmaker = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+                _engine = engine
+    return _engine
+
+def get_pool_status() -> Dict[str, Any]:
+    status = pool_metrics.snapshot()
+    if _engine is not None:
+        pool: Pool = _engine.pool
+        status["pool"] = pool.status()
+    return status
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+class SyncSessionAdapter:
+    """Exposes the awaitable subset of AsyncSession used by the app over a sync Session.
+
+    Blocking calls run on the threadpool so the handlers stay the same in both modes.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance: Any) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances: Any) -> None:
+        self.sync_session.add_all(instances)
+
+    def get_bind(self, *args: Any, **kwargs: Any) -> Any:
+        return self.sync_session.get_bind(*args, **kwargs)
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def stream(self, *args: Any, **kwargs: Any) -> "SyncStreamedResult":
+        return SyncStreamedResult(await run_in_threadpool(self.sync_session.execute, *args, **kwargs))
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, *args: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.sync_session.flush, *args, **kwargs)
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+class SyncStreamedResult:
+    """The partitions()/close() subset of AsyncResult over a server-side cursor of the sync driver."""
+
+    def __init__(self, result: Any):
+        self.result = result
+
+    async def partitions(self, size: Optional[int] = None) -> AsyncIterator[Any]:
+        iterator = self.result.partitions(size)
+        while True:
+            partition = await run_in_threadpool(next, iterator, None)
+            if partition is None:
+                return
+            yield partition
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.result.close)
+
+DbSession = Union[AsyncSession, SyncSessionAdapter]
+
+def create_session() -> DbSession:
+    get_engine()
+    if settings.DB_ASYNC:
+        return _sessionmaker()
+    return SyncSessionAdapter(_sessionmaker())
+
+async def get_db() -> AsyncIterator[DbSession]:
+    db = create_session()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
@@ -1,8 +1,25 @@
-from fastapi import FastAPI
+import asyncio
+import hmac
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Response, status
 from mangum import Mangum
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.routers import auth, recipes, ai
+from app.database import get_db, get_pool_status, settings
+from app.models import Leaderboard
+from app.services.leaderboards import refresh_leaderboards
+from app.services.metrics import MetricsMiddleware, render_metrics
+from app.services.recommendations import refresh_similarities
+from app.services.query_diagnostics import QueryDiagnosticsMiddleware
+from app.services.serialization import FastJSONResponse
 
-app = FastAPI(title="Recipe Maker API", version="1.0.0")
+app = FastAPI(title="Recipe Maker API", version="1.0.0", default_response_class=FastJSONResponse)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if settings.QUERY_DIAGNOSTICS:
+    app.add_middleware(QueryDiagnosticsMiddleware, repeat_threshold=settings.QUERY_DIAGNOSTICS_REPEAT_THRESHOLD)
 
 # Note: CORS is handled by Lambda Function URL, not FastAPI
 
@@ -16,8 +33,45 @@ def root():
     return {"message": "Recipe Maker API"}
 
 
+def has_metrics_token(authorization: Optional[str]) -> bool:
+    return bool(settings.METRICS_TOKEN) and hmac.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}")
+
+
+@app.get("/health/db")
+async def db_health(authorization: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
+    """Whether the database answers; the pool details are only shown to holders of METRICS_TOKEN."""
+    try:
+        await db.execute(text("SELECT 1"))
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database unavailable")
+    if has_metrics_token(authorization):
+        return {"status": "ok", **get_pool_status()}
+    return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: Optional[str] = Header(None)):
+    """This process's metrics in the Prometheus text format."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.METRICS_TOKEN and not has_metrics_token(authorization):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(render_metrics(get_pool_status()), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Lambda handler
 handler = Mangum(app)
 
 
+def refresh_leaderboards_handler(event, context):
+    """Lambda entry point of the scheduled leaderboard refresh; see scripts/refresh_leaderboards.py."""
+    timings = asyncio.run(refresh_leaderboards(list(Leaderboard)))
+    return {board.value: seconds for board, seconds in timings.items()}
+
+
+def similar_recipes_handler(event, context):
+    """Lambda entry point of the scheduled similar-recipes jobs; see scripts/similar_recipes.py.
 
+    Folds in recent changes unless the event asks for {"command": "rebuild"}.
+    """
+    return asyncio.run(refresh_similarities(rebuild=(event or {}).get("command") == "rebuild"))
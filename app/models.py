@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Numeric, JSON
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Numeric, Float, JSON, Index, LargeBinary, UniqueConstraint
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.sql import func, false
 from sqlalchemy.orm import relationship
 import enum
 from app.database import Base
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, create_model
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Type
 from datetime import datetime
 from decimal import Decimal
 
@@ -13,6 +15,32 @@ class UserType(str, enum.Enum):
     REGULAR = "REGULAR"
     CHEF = "CHEF"
 
+class TagMatch(str, enum.Enum):
+    ALL = "all"
+    ANY = "any"
+
+class RecipeSort(str, enum.Enum):
+    NEWEST = "newest"
+    TOP_RATED = "top_rated"
+    RELEVANCE = "relevance"
+
+class RecipeView(str, enum.Enum):
+    FULL = "full"
+    SUMMARY = "summary"
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class Leaderboard(str, enum.Enum):
+    TOP_RATED = "top_rated"
+    TRENDING = "trending"
+
+class ExportKind(str, enum.Enum):
+    RECIPES = "recipes"
+    FAVORITES = "favorites"
+    RATINGS = "ratings"
+
 # --- SQLAlchemy Models ---
 class User(Base):
     __tablename__ = "users"
@@ -31,19 +59,38 @@ class Recipe(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String, nullable=False)
     description = Column(String, nullable=False)
-    ingredients = Column(JSON, nullable=False)
+    ingredients = Column(JSONB().with_variant(JSON(), "sqlite"), nullable=False)
     steps = Column(JSON, nullable=False)
     time_minutes = Column(Integer, nullable=False)
     difficulty = Column(String, nullable=False)
-    tags = Column(JSON, nullable=True)
+    tags = Column(JSONB().with_variant(JSON(), "sqlite"), nullable=True)
     source = Column(String, nullable=False)
     is_public = Column(Boolean, default=True)
+    # Canonical ingredients and their search signature (app.services.ingredients), derived on every write
+    ingredient_tokens = Column(ARRAY(String).with_variant(JSON(), "sqlite"), nullable=True)
+    ingredient_signature = Column(ARRAY(String).with_variant(JSON(), "sqlite"), nullable=True)
     avg_rating = Column(Numeric(precision=3, scale=2), nullable=True)
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", backref="recipes")
 
+    # Keyset pagination indexes, matching the ORDER BY used by list_recipes
+    __table_args__ = (
+        Index("ix_recipes_public_created_at_id", created_at.desc(), id.desc(), postgresql_where=is_public),
+        Index("ix_recipes_public_avg_rating_id", avg_rating.desc().nulls_last(), id.desc(), postgresql_where=is_public).ddl_if(dialect="postgresql"),
+        Index("ix_recipes_user_created_at_id", user_id, created_at.desc(), id.desc()),
+        # Containment (@>) lookups for tag and ingredient filters
+        Index("ix_recipes_tags", tags, postgresql_using="gin", postgresql_ops={"tags": "jsonb_path_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_recipes_ingredients", ingredients, postgresql_using="gin", postgresql_ops={"ingredients": "jsonb_path_ops"}).ddl_if(dialect="postgresql"),
+        # "What can I cook" lookups by signature key (&&)
+        Index("ix_recipes_ingredient_signature", ingredient_signature, postgresql_using="gin").ddl_if(dialect="postgresql"),
+        # Incremental fold-ins of the similar-recipe model
+        Index("ix_recipes_updated_at", updated_at),
+    )
+
 class Favorite(Base):
     __tablename__ = "favorites"
 
@@ -52,6 +99,11 @@ class Favorite(Base):
     recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Trending leaderboards read only recent activity
+        Index("ix_favorites_created_at", created_at),
+    )
+
 class Rating(Base):
     __tablename__ = "ratings"
 
@@ -61,6 +113,53 @@ class Rating(Base):
     rating = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        UniqueConstraint("user_id", "recipe_id", name="uq_ratings_user_recipe"),
+        Index("ix_ratings_created_at", created_at),
+    )
+
+class RecipeSimilarity(Base):
+    """Precomputed "more like this" neighbours of public recipes, written by the recommendation jobs."""
+    __tablename__ = "recipe_similarities"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    similar_recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Serving reads one recipe's neighbours best first
+        Index("ix_recipe_similarities_recipe_score", recipe_id, score.desc()),
+        Index("ix_recipe_similarities_similar_recipe_id", similar_recipe_id),
+    )
+
+class SimilarityModelSnapshot(Base):
+    """The similar-recipes model as of the last rebuild or fold-in, which the next fold-in starts from; a single row."""
+    __tablename__ = "similarity_models"
+
+    id = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    saved_at = Column(DateTime(timezone=True), nullable=False)
+
+class LeaderboardEntry(Base):
+    """The top recipes of a leaderboard, overall (tag "") and per tag, as of its last refresh."""
+    __tablename__ = "leaderboard_entries"
+
+    board = Column(String(20), primary_key=True)
+    tag = Column(String, primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_leaderboard_entries_recipe_id", recipe_id),
+    )
+
+class LeaderboardRefresh(Base):
+    __tablename__ = "leaderboard_refreshes"
+
+    board = Column(String(20), primary_key=True)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+
 class AIRequest(Base):
     __tablename__ = "ai_requests"
 
@@ -69,6 +168,7 @@ class AIRequest(Base):
     model = Column(String, nullable=False)
     prompt_tokens = Column(Integer, nullable=True)
     completion_tokens = Column(Integer, nullable=True)
+    cache_hit = Column(Boolean, nullable=False, default=False, server_default=false())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 # --- Pydantic Schemas ---
@@ -151,6 +251,52 @@ class RecipeResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class RecipeSummary(BaseModel):
+    """What list and grid views show; ingredients, steps and description are left out."""
+    id: int
+    title: str
+    time_minutes: int
+    difficulty: str
+    avg_rating: Optional[Decimal]
+    updated_at: Optional[datetime]
+    author: AuthorInfo
+    is_owner: Optional[bool] = None
+    is_favorite: Optional[bool] = None
+    user_rating: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class CookableRecipe(BaseModel):
+    """A "what can I cook" match: which of the recipe's ingredients the caller has and which are missing."""
+    recipe: RecipeSummary
+    matched: List[str]
+    missing: List[str]
+    coverage: float
+
+class LeaderboardItem(BaseModel):
+    """A leaderboard place: the Bayesian average rating (top_rated) or decayed recent activity (trending)."""
+    recipe: RecipeSummary
+    score: float
+
+@lru_cache(maxsize=64)
+def recipe_projection(fields: FrozenSet[str]) -> Type[BaseModel]:
+    """A RecipeResponse restricted to fields, for sparse fieldsets."""
+    return create_model(
+        "RecipeProjection",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (info.annotation, info) for name, info in RecipeResponse.model_fields.items() if name in fields}
+    )
+
+class RecipeImportError(BaseModel):
+    line: int  # line number for NDJSON, 1-based position for a JSON array
+    detail: str
+
+class RecipeImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[RecipeImportError]
+
 # Favorite Schemas
 class FavoriteResponse(BaseModel):
     id: int
@@ -180,3 +326,14 @@ class AIGenerateRequest(BaseModel):
 
 class AIGenerateResponse(BaseModel):
     recipe: RecipeResponse
+
+class AIBatchGenerateRequest(BaseModel):
+    items: List[AIGenerateRequest]
+
+class AIBatchItemResult(BaseModel):
+    index: int
+    recipe: Optional[RecipeResponse] = None
+    error: Optional[str] = None
+
+class AIBatchGenerateResponse(BaseModel):
+    results: List[AIBatchItemResult]
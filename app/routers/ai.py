@@ -1,21 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User, UserType, Recipe, AIGenerateRequest, AIGenerateResponse, RecipeResponse
-from app.services.auth import get_current_user
-from app.services.recipe_ai import generate_recipe_with_ai
-from app.routers.recipes import get_recipe_with_extras
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import create_session, get_db, settings
+from app.models import (
+    User, UserType, Recipe, AIGenerateRequest, AIGenerateResponse, RecipeResponse,
+    AIBatchGenerateRequest, AIBatchGenerateResponse, AIBatchItemResult
+)
+from app.services.auth import AuthenticatedUser, Principal, get_current_user
+from app.services.recipe_ai import (
+    GenerationFailed, GenerationRequest, StreamedGeneration, build_ai_request, fetch_generation,
+    generate_recipe_with_ai, get_generation_cache, parse_recipe, record_ai_request
+)
+from app.services.partial_json import PartialObjectParser
+from app.services.rate_limit import get_ai_rate_limiter
+from app.routers.recipes import get_recipe_with_extras, get_recipes_with_extras, invalidate_recipe_cache, load_recipes_by_ids
 
 router = APIRouter()
 
+def build_recipe(recipe_data: dict, current_user: AuthenticatedUser) -> Recipe:
+    return Recipe(
+        user_id=current_user.id,
+        title=recipe_data["title"],
+        description=recipe_data["description"],
+        ingredients=recipe_data["ingredients"],
+        steps=recipe_data["steps"],
+        time_minutes=recipe_data["time_minutes"],
+        difficulty=recipe_data["difficulty"],
+        tags=recipe_data.get("tags", []),
+        source="ai",
+        is_public=current_user.user_type == UserType.CHEF
+    )
+
+async def save_generated_recipe(db: AsyncSession, recipe_data: dict, current_user: AuthenticatedUser) -> RecipeResponse:
+    new_recipe = build_recipe(recipe_data, current_user)
+    db.add(new_recipe)
+    await db.commit()
+    await db.refresh(new_recipe)
+    await invalidate_recipe_cache(publicly_listed=new_recipe.is_public)
+    
+    return await get_recipe_with_extras(new_recipe, db, current_user, is_new=True)
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.post("/generate", response_model=AIGenerateResponse)
-def generate_recipe(
+async def generate_recipe(
     request: AIGenerateRequest,
-    db: Session = Depends(get_db),
+    fresh: bool = Query(False, description="Skip the cache and always call the model"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    await get_ai_rate_limiter().check(current_user)
+    # Give back the connection the user lookup took; the session reconnects to save the result
+    await db.commit()
     try:
-        recipe_data = generate_recipe_with_ai(
+        recipe_data = await generate_recipe_with_ai(
             ingredients=request.ingredients,
             diet=request.diet,
             cuisine=request.cuisine,
@@ -23,7 +66,8 @@ def generate_recipe(
             difficulty=request.difficulty,
             servings=request.servings,
             user_id=current_user.id,
-            db=db
+            db=db,
+            fresh=fresh
         )
     except ValueError as e:
         raise HTTPException(
@@ -31,23 +75,144 @@ def generate_recipe(
             detail=str(e)
         )
     
-    is_public = current_user.user_type == UserType.CHEF
+    return AIGenerateResponse(recipe=await save_generated_recipe(db, recipe_data, current_user))
+
+@router.post("/generate/batch", response_model=AIBatchGenerateResponse)
+async def generate_recipe_batch(
+    batch: AIBatchGenerateRequest,
+    fresh: bool = Query(False, description="Skip the cache and always call the model"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not batch.items or len(batch.items) > settings.AI_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch must contain between 1 and {settings.AI_BATCH_MAX_ITEMS} items"
+        )
+    limiter = get_ai_rate_limiter()
+    await limiter.check(current_user, cost=len(batch.items))
+    principal = Principal.from_user(current_user)
+    # Give back the connection the user lookup took: under DB_POOL_STRATEGY=single it is the
+    # container's only one, and the completions can take tens of seconds
+    await db.commit()
     
-    new_recipe = Recipe(
-        user_id=current_user.id,
-        title=recipe_data["title"],
-        description=recipe_data["description"],
-        ingredients=recipe_data["ingredients"],
-        steps=recipe_data["steps"],
-        time_minutes=recipe_data["time_minutes"],
-        difficulty=recipe_data["difficulty"],
-        tags=recipe_data.get("tags", []),
-        source="ai",
-        is_public=is_public
+    semaphore = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
+    
+    async def generate(item: AIGenerateRequest) -> Recipe:
+        request = GenerationRequest.canonical(
+            item.ingredients, item.diet, item.cuisine, item.max_time_minutes, item.difficulty, item.servings
+        )
+        try:
+            async with semaphore:
+                recipe_data, usage = await fetch_generation(request, fresh)
+        except GenerationFailed as e:
+            db.add(build_ai_request(principal.id, e.usage))
+            await limiter.charge(principal.id, e.usage)
+            raise
+        except asyncio.CancelledError:
+            db.add(build_ai_request(principal.id, None))
+            raise
+        db.add(build_ai_request(principal.id, usage, cache_hit=usage is None))
+        await limiter.charge(principal.id, usage)
+        return build_recipe(recipe_data, principal)
+    
+    # Completions run concurrently; the database is only touched once they are all in
+    outcomes = await asyncio.gather(*(generate(item) for item in batch.items), return_exceptions=True)
+    errors: Dict[int, str] = {}
+    new_recipes: List[Recipe] = []
+    for index, outcome in enumerate(outcomes):
+        # Not just Exception: an item can also end in a CancelledError
+        if isinstance(outcome, BaseException):
+            errors[index] = f"Failed to generate recipe: {str(outcome) or type(outcome).__name__}"
+        else:
+            new_recipes.append(outcome)
+    
+    db.add_all(new_recipes)
+    await db.commit()
+    if new_recipes:
+        await invalidate_recipe_cache(publicly_listed=principal.user_type == UserType.CHEF)
+    
+    # One query for the server-filled columns of every new row
+    saved = await load_recipes_by_ids(db, [recipe.id for recipe in new_recipes])
+    responses = iter(await get_recipes_with_extras(saved, db, principal, is_new=True))
+    results = [
+        AIBatchItemResult(index=index, error=errors[index]) if index in errors
+        else AIBatchItemResult(index=index, recipe=next(responses))
+        for index in range(len(batch.items))
+    ]
+    return AIBatchGenerateResponse(results=results)
+
+@router.post("/generate/stream")
+async def generate_recipe_stream(
+    request: AIGenerateRequest,
+    fresh: bool = Query(False, description="Skip the cache and always call the model"),
+    current_user: User = Depends(get_current_user)
+):
+    """Server-Sent Events: `field`/`item` events as parts of the recipe complete, then `recipe` once saved.
+
+    Failures are reported as an `error` event since the 200 status has already been sent.
+    """
+    # Checked up front so an over-limit caller gets a real 429 rather than an error event
+    await get_ai_rate_limiter().check(current_user)
+    principal = Principal.from_user(current_user)
+    generation_request = GenerationRequest.canonical(
+        request.ingredients, request.diet, request.cuisine,
+        request.max_time_minutes, request.difficulty, request.servings
     )
-    db.add(new_recipe)
-    db.commit()
-    db.refresh(new_recipe)
     
-    recipe_dict = get_recipe_with_extras(new_recipe, db, current_user)
-    return AIGenerateResponse(recipe=RecipeResponse(**recipe_dict))
+    async def replay(recipe_data: dict) -> AsyncIterator[str]:
+        yield json.dumps(recipe_data)
+    
+    async def events() -> AsyncIterator[str]:
+        # Request-scoped dependencies are torn down before the body streams, so use our own session
+        db = create_session()
+        cache = get_generation_cache()
+        cache_key = generation_request.cache_key()
+        parser = PartialObjectParser()
+        generation = None
+        recorded = False
+        try:
+            recipe_data = None if fresh else await cache.get(cache_key)
+            if recipe_data is None:
+                generation = StreamedGeneration(generation_request)
+            
+            # Cache hits replay the stored document through the same parser
+            async for delta in generation.deltas() if generation else replay(recipe_data):
+                for event in parser.feed(delta):
+                    if event.index is None:
+                        yield sse_event("field", {"field": event.field, "value": event.value})
+                    else:
+                        yield sse_event("item", {"field": event.field, "index": event.index, "value": event.value})
+            
+            if generation:
+                recipe_data = parse_recipe(generation.content)
+                await cache.set(cache_key, recipe_data)
+            
+            await record_ai_request(db, principal.id, generation.usage if generation else None, cache_hit=generation is None)
+            recorded = True
+            recipe = await save_generated_recipe(db, recipe_data, principal)
+            yield sse_event("recipe", recipe.model_dump(mode="json"))
+        except asyncio.CancelledError:
+            # Client disconnected: the completion has been stopped, but charge what it cost. The
+            # usage chunk only comes at the end, so this is usually an estimate
+            if generation and not recorded:
+                with anyio.CancelScope(shield=True):
+                    await db.rollback()
+                    await record_ai_request(db, principal.id, generation.usage_or_estimate())
+            raise
+        except Exception as e:
+            # The stream broke off or its recipe was unusable: charged all the same
+            if generation and not recorded:
+                with anyio.CancelScope(shield=True):
+                    await db.rollback()
+                    await record_ai_request(db, principal.id, generation.usage_or_estimate())
+            yield sse_event("error", {"detail": f"Failed to generate recipe: {str(e)}"})
+        finally:
+            with anyio.CancelScope(shield=True):
+                await db.close()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
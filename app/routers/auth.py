@@ -1,21 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import User, UserRegister, UserLogin, Token, UserResponse, LoginResponse
-from app.services.auth import verify_password, get_password_hash, create_access_token
+from app.services.auth import create_access_token, token_claims
+from app.services.passwords import get_password_hasher
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
+    existing_user = (await db.execute(select(User).where(User.email == user_data.email))).scalar_one_or_none()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hasher().hash(user_data.password)
     new_user = User(
         name=user_data.name,
         email=user_data.email,
@@ -23,21 +25,29 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
         user_type=user_data.user_type
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/login", response_model=LoginResponse)
-def login(login_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not verify_password(login_data.password, user.password_hash):
+async def login(login_data: UserLogin, db: AsyncSession = Depends(get_db)):
+    user = (await db.execute(select(User).where(User.email == login_data.email))).scalar_one_or_none()
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await get_password_hasher().verify_and_update(login_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": str(user.id)})
+    if new_hash:
+        # Stored with an outdated cost factor; upgrade it while we have the plaintext
+        user.password_hash = new_hash
+        await db.commit()
+    
+    access_token = create_access_token(data=token_claims(user))
     return LoginResponse(
         accessToken=access_token,
         user=user
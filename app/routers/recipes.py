@@ -1,134 +1,706 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, contains_eager, load_only
+from sqlalchemy import Select, and_, or_, select, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, Optional, Set, Tuple, Type, Union
+import anyio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-from app.database import get_db
-from app.models import User, UserType, Recipe, Favorite, Rating, RecipeCreate, RecipeUpdate, RecipeResponse, AuthorInfo, RatingCreate, RatingResponse
-from app.services.auth import get_current_user, get_current_user_optional
+from app.database import create_session, get_db, settings
+from pydantic import BaseModel
+from app.models import (
+    User, UserType, Recipe, Favorite, Rating, RecipeCreate, RecipeUpdate, RecipeResponse, RecipeSummary,
+    RatingCreate, RatingResponse, RecipeSort, RecipeView, TagMatch, RecipeImportResponse, ExportFormat, ExportKind,
+    CookableRecipe, RecipeSimilarity, Leaderboard, LeaderboardEntry, LeaderboardItem, recipe_projection
+)
+from app.services.auth import AuthenticatedUser, Principal, get_current_principal, get_current_principal_optional, get_current_user
+from app.services.pagination import encode_cursor, decode_cursor
+from app.services.search import get_search_backend, tokenize_search
+from app.services.cache import get_cache, get_or_load
+from app.services.ratings import upsert_rating
+from app.services.conditional import make_etag, etag_matches, not_modified_since, http_date, to_timestamp
+from app.services.serialization import FastJSONResponse
+from app.services.recipe_import import ImportTooLarge, RecipeImporter, iter_json_array, iter_ndjson
+from app.services.export import csv_header, csv_lines, export_rows, gzip_stream, ndjson_lines
+from app.services.ingredients import MAX_MISSING, search_cookable
+from app.services.leaderboards import ALL_TAGS, leaderboard_refreshed_at
 
 router = APIRouter()
 
-def get_recipe_with_extras(recipe: Recipe, db: Session, current_user: Optional[User] = None) -> dict:
-    result = {
-        "id": recipe.id,
-        "title": recipe.title,
-        "description": recipe.description,
-        "ingredients": recipe.ingredients,
-        "steps": recipe.steps,
-        "time_minutes": recipe.time_minutes,
-        "difficulty": recipe.difficulty,
-        "tags": recipe.tags,
-        "source": recipe.source,
-        "is_public": recipe.is_public,
-        "avg_rating": recipe.avg_rating,
-        "created_at": recipe.created_at,
-        "updated_at": recipe.updated_at,
-        "author": AuthorInfo(id=recipe.user.id, name=recipe.user.name),
-        "is_owner": False,
-        "is_favorite": False,
-        "user_rating": None
-    }
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+LIST_GENERATION_KEY = "recipes:list:generation"
+# Sent with every projection: the identity and version clients need to cache or revalidate items
+ALWAYS_INCLUDED_FIELDS = frozenset({"id", "updated_at"})
+
+async def get_viewer_state(db: AsyncSession, recipe_ids: List[int], current_user: AuthenticatedUser) -> Tuple[Set[int], Dict[int, int]]:
+    if not recipe_ids:
+        return set(), {}
+    
+    favorite_ids = set((await db.execute(
+        select(Favorite.recipe_id).where(
+            and_(Favorite.user_id == current_user.id, Favorite.recipe_id.in_(recipe_ids))
+        )
+    )).scalars())
+    user_ratings = dict((await db.execute(
+        select(Rating.recipe_id, Rating.rating).where(
+            and_(Rating.user_id == current_user.id, Rating.recipe_id.in_(recipe_ids))
+        )
+    )).tuples().all())
+    return favorite_ids, user_ratings
+
+class RecipeRow:
+    """A Recipe row plus the fields that depend on the viewer, read as attributes by RecipeResponse."""
+    
+    def __init__(self, recipe: Recipe, author: Any, is_owner: bool, is_favorite: bool, user_rating: Optional[int]):
+        # Loaded columns become plain attributes, which validate much faster than instrumented ones
+        self.__dict__.update(recipe.__dict__)
+        self.recipe = recipe
+        self.author = author
+        self.is_owner = is_owner
+        self.is_favorite = is_favorite
+        self.user_rating = user_rating
+    
+    def __getattr__(self, name: str) -> Any:
+        # Anything not loaded yet goes through the ORM as usual
+        return getattr(self.recipe, name)
+
+async def get_recipes_with_extras(
+    recipes: List[Recipe],
+    db: AsyncSession,
+    current_user: Optional[AuthenticatedUser] = None,
+    is_new: bool = False,
+    schema: Type[BaseModel] = RecipeResponse
+) -> List[BaseModel]:
+    # A freshly created recipe has no favorites or ratings, so skip the lookups
+    favorite_ids: Set[int] = set()
+    user_ratings: Dict[int, int] = {}
+    if current_user and not is_new:
+        favorite_ids, user_ratings = await get_viewer_state(db, [recipe.id for recipe in recipes], current_user)
+    
+    results = []
+    for recipe in recipes:
+        is_owner = current_user is not None and recipe.user_id == current_user.id
+        # The owner is already loaded as current_user; only other authors need recipe.user
+        author = None
+        if "author" in schema.model_fields:
+            author = current_user if is_owner else recipe.user
+        # Validated once, straight from the row; handlers render the model without re-validating it
+        results.append(schema.model_validate(
+            RecipeRow(recipe, author, is_owner, recipe.id in favorite_ids, user_ratings.get(recipe.id))
+        ))
+    
+    return results
+
+def parse_cursor(cursor: str, sort: RecipeSort) -> Tuple[Any, int]:
+    values = decode_cursor(cursor, sort.value)
+    try:
+        last_value, last_id = values
+        if sort == RecipeSort.TOP_RATED:
+            last_value = Decimal(last_value) if last_value is not None else None
+        elif sort == RecipeSort.RELEVANCE:
+            last_value = float(last_value)
+        else:
+            last_value = datetime.fromisoformat(last_value)
+        return last_value, int(last_id)
+    except (TypeError, ValueError, ArithmeticError):
+        raise ValueError("Malformed cursor")
+
+def apply_keyset(
+    query: Select,
+    sort: RecipeSort,
+    cursor: Optional[str],
+    rank: Optional[ColumnElement] = None
+) -> Select:
+    if sort == RecipeSort.RELEVANCE:
+        query = query.order_by(rank.desc(), Recipe.id.desc())
+    elif sort == RecipeSort.TOP_RATED:
+        query = query.order_by(Recipe.avg_rating.desc().nulls_last(), Recipe.id.desc())
+    else:
+        query = query.order_by(Recipe.created_at.desc(), Recipe.id.desc())
+    
+    if not cursor:
+        return query
+    
+    last_value, last_id = parse_cursor(cursor, sort)
+    if sort == RecipeSort.RELEVANCE:
+        return query.filter(tuple_(rank, Recipe.id) < tuple_(last_value, last_id))
+    if sort == RecipeSort.TOP_RATED:
+        if last_value is None:
+            # Unrated recipes sort last, ordered by id alone
+            return query.filter(and_(Recipe.avg_rating.is_(None), Recipe.id < last_id))
+        return query.filter(or_(
+            tuple_(Recipe.avg_rating, Recipe.id) < tuple_(last_value, last_id),
+            Recipe.avg_rating.is_(None)
+        ))
+    return query.filter(tuple_(Recipe.created_at, Recipe.id) < tuple_(last_value, last_id))
+
+def get_next_cursor(recipe: Recipe, sort: RecipeSort, rank: Optional[float] = None) -> str:
+    values: List[Any]
+    if sort == RecipeSort.RELEVANCE:
+        values = [rank, recipe.id]
+    elif sort == RecipeSort.TOP_RATED:
+        values = [str(recipe.avg_rating) if recipe.avg_rating is not None else None, recipe.id]
+    else:
+        values = [recipe.created_at.isoformat(), recipe.id]
+    return encode_cursor(sort.value, values)
+
+async def get_recipe_with_extras(
+    recipe: Recipe,
+    db: AsyncSession,
+    current_user: Optional[AuthenticatedUser] = None,
+    is_new: bool = False
+) -> RecipeResponse:
+    return (await get_recipes_with_extras([recipe], db, current_user, is_new=is_new))[0]
+
+async def serialize_shared(
+    recipes: List[Recipe],
+    db: AsyncSession,
+    schema: Type[BaseModel] = RecipeResponse
+) -> List[dict]:
+    # Viewer-independent, JSON-ready payloads that any cache backend can hold
+    return [recipe.model_dump(mode="json") for recipe in await get_recipes_with_extras(recipes, db, schema=schema)]
+
+def apply_viewer_state(
+    items: List[dict],
+    current_user: Optional[AuthenticatedUser],
+    viewer_state: Optional[Tuple[Set[int], Dict[int, int]]]
+) -> List[dict]:
+    if not current_user:
+        return items
+    
+    favorite_ids, user_ratings = viewer_state
+    results = []
+    for item in items:
+        viewer_fields = {
+            "is_owner": "author" in item and item["author"]["id"] == current_user.id,
+            "is_favorite": item["id"] in favorite_ids,
+            "user_rating": user_ratings.get(item["id"])
+        }
+        # Sparse fieldsets only get the viewer fields they asked for
+        results.append({**item, **{key: value for key, value in viewer_fields.items() if key in item}})
+    return results
+
+def parse_projection(view: RecipeView, fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """Fields to return for list items; None means the full RecipeResponse."""
+    if fields is None:
+        return frozenset(RecipeSummary.model_fields) if view == RecipeView.SUMMARY else None
+    if view != RecipeView.FULL:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either view or fields, not both"
+        )
     
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(RecipeResponse.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    if "is_owner" in requested:
+        # Ownership is worked out from the author, also for cached items
+        requested.add("author")
+    return frozenset(requested) | ALWAYS_INCLUDED_FIELDS
+
+def projection_schema(projection: Optional[FrozenSet[str]]) -> Type[BaseModel]:
+    if projection is None:
+        return RecipeResponse
+    if projection == frozenset(RecipeSummary.model_fields):
+        return RecipeSummary
+    return recipe_projection(projection)
+
+def projection_columns(projection: FrozenSet[str]) -> List[Any]:
+    # Keyset cursors and the ownership check need these whatever the client asked for
+    names = {"id", "user_id", "created_at", "updated_at", "avg_rating"}
+    names.update(name for name in projection if name in Recipe.__table__.columns)
+    return [getattr(Recipe, name) for name in sorted(names)]
+
+def recipe_cache_key(recipe_id: int) -> str:
+    return f"recipes:detail:{recipe_id}"
+
+async def recipe_list_cache_key(params: dict) -> str:
+    # The generation is bumped whenever a publicly listed recipe changes
+    generation = await get_cache().get(LIST_GENERATION_KEY) or 0
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"recipes:list:{generation}:{digest}"
+
+async def invalidate_recipe_cache(recipe_id: Optional[int] = None, publicly_listed: bool = False) -> None:
+    cache = get_cache()
+    if recipe_id is not None:
+        await cache.delete(recipe_cache_key(recipe_id))
+    if publicly_listed:
+        await cache.incr(LIST_GENERATION_KEY)
+
+def is_publicly_visible(is_public: Optional[bool], author_type: str) -> bool:
+    return bool(is_public) and author_type == UserType.CHEF
+
+def check_recipe_access(publicly_visible: bool, author_id: int, current_user: Optional[AuthenticatedUser]) -> None:
+    if not publicly_visible and (not current_user or author_id != current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Recipe not accessible"
+        )
+
+def build_etag(
+    kind: str,
+    versions: List[Tuple[int, Any]],
+    current_user: Optional[AuthenticatedUser],
+    viewer_state: Optional[Tuple[Set[int], Dict[int, int]]],
+    *extra: Any
+) -> str:
+    # Strong validator over (id, updated_at) plus anything else that shapes the body
+    viewer = None
     if current_user:
-        result["is_owner"] = recipe.user_id == current_user.id
-        
-        favorite = db.query(Favorite).filter(
-            and_(Favorite.user_id == current_user.id, Favorite.recipe_id == recipe.id)
-        ).first()
-        rating = db.query(Rating).filter(
-            and_(Rating.user_id == current_user.id, Rating.recipe_id == recipe.id)
-        ).first()
-        
-        result["is_favorite"] = favorite is not None
-        result["user_rating"] = rating.rating if rating else None
+        favorite_ids, user_ratings = viewer_state
+        viewer = [current_user.id, sorted(favorite_ids), sorted(user_ratings.items())]
+    return make_etag(kind, [[recipe_id, to_timestamp(updated_at)] for recipe_id, updated_at in versions], viewer, *extra)
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since when both are sent
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    return not_modified_since(request.headers.get("if-modified-since"), last_modified)
+
+def validator_headers(etag: str, last_modified: Optional[float] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Authorization"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+async def load_recipes_by_ids(
+    db: AsyncSession,
+    recipe_ids: List[int],
+    columns: Optional[List[Any]] = None
+) -> List[Recipe]:
+    if not recipe_ids:
+        return []
+    query = select(Recipe).options(joinedload(Recipe.user)).where(Recipe.id.in_(recipe_ids))
+    if columns:
+        query = query.options(load_only(*columns), joinedload(Recipe.user).load_only(User.id, User.name))
+    recipes = (await db.execute(query)).scalars().all()
+    by_id = {recipe.id: recipe for recipe in recipes}
+    return [by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in by_id]
+
+async def fetch_recipe_page(
+    db: AsyncSession,
+    owner: Optional[AuthenticatedUser],
+    search: Optional[str],
+    all_tags: List[str],
+    any_tags: List[str],
+    max_time: Optional[int],
+    limit: int,
+    cursor: Optional[str],
+    sort: Optional[RecipeSort],
+    metadata_only: bool = False,
+    columns: Optional[List[Any]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """Return one page of recipes (or id/version rows when metadata_only) and the next cursor.
+
+    columns restricts the recipe columns loaded for a projection; the author is then
+    loaded with just its id and name.
+    """
+    query = select(Recipe)
+    
+    if owner:
+        query = query.filter(Recipe.user_id == owner.id)
+        if not metadata_only:
+            author = joinedload(Recipe.user)
+            query = query.options(author.load_only(User.id, User.name) if columns else author)
+    else:
+        query = query.join(Recipe.user).filter(
+            and_(Recipe.is_public == True, User.user_type == UserType.CHEF)
+        )
+        if not metadata_only:
+            author = contains_eager(Recipe.user)
+            query = query.options(author.load_only(User.id, User.name) if columns else author)
+    
+    if columns and not metadata_only:
+        query = query.options(load_only(*columns))
+    
+    if metadata_only:
+        # Just what the validators and the next cursor need
+        query = query.with_only_columns(Recipe.id, Recipe.created_at, Recipe.updated_at, Recipe.avg_rating)
+    
+    search_backend = get_search_backend(db.get_bind().dialect.name)
+    
+    rank = None
+    if search:
+        query, rank = search_backend.apply(query, search)
+    
+    if sort is None or (sort == RecipeSort.RELEVANCE and rank is None):
+        sort = RecipeSort.RELEVANCE if rank is not None else RecipeSort.NEWEST
     
-    return result
+    query = search_backend.filter_tags(query, all_tags, any_tags)
+    
+    if max_time:
+        query = query.filter(Recipe.time_minutes <= max_time)
+    
+    try:
+        query = apply_keyset(query, sort, cursor, rank)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if sort == RecipeSort.RELEVANCE:
+        query = query.add_columns(rank.label("rank"))
+    
+    # Fetch one extra row to learn whether another page follows
+    result = await db.execute(query.limit(limit + 1))
+    if metadata_only or sort == RecipeSort.RELEVANCE:
+        rows = result.all()
+    else:
+        rows = result.scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last_rank = None
+    if sort == RecipeSort.RELEVANCE:
+        last_rank = rows[-1][-1] if rows else None
+        if not metadata_only:
+            rows = [recipe for recipe, _ in rows]
+    
+    next_cursor = get_next_cursor(rows[-1], sort, last_rank) if has_more else None
+    return rows, next_cursor
 
-@router.get("", response_model=List[RecipeResponse])
-def list_recipes(
+@router.get("", response_model=Union[List[RecipeResponse], List[RecipeSummary]])
+async def list_recipes(
+    request: Request,
     search: Optional[str] = Query(None),
     diet: Optional[str] = Query(None),
+    tag: Optional[List[str]] = Query(None),
+    tag_match: TagMatch = Query(TagMatch.ALL),
     max_time: Optional[int] = Query(None),
     mine: Optional[bool] = Query(None),
-    limit: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    sort: Optional[RecipeSort] = Query(None),
+    view: RecipeView = Query(RecipeView.FULL),
+    fields: Optional[str] = Query(None, description="Comma-separated RecipeResponse fields; id and updated_at are always included"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Principal] = Depends(get_current_principal_optional)
 ):
-    query = db.query(Recipe)
+    projection = parse_projection(view, fields)
+    schema = projection_schema(projection)
+    columns = projection_columns(projection) if projection else None
     
-    if mine:
-        if not current_user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Authentication required"
-            )
-        query = query.filter(Recipe.user_id == current_user.id)
-    else:
-        query = query.join(User).filter(
-            and_(Recipe.is_public == True, User.user_type == UserType.CHEF)
+    if mine and not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required"
         )
+    owner = current_user if mine else None
+    
+    # diet is always required; extra tags are combined according to tag_match
+    all_tags = [diet] if diet else []
+    any_tags: List[str] = []
+    if tag:
+        if tag_match == TagMatch.ALL:
+            all_tags.extend(tag)
+        else:
+            any_tags = tag
+    
+    params = {
+        "owner": owner.id if owner else None,
+        "search": " ".join(tokenize_search(search)) if search else None,
+        "all_tags": sorted(set(all_tags)),
+        "any_tags": sorted(set(any_tags)),
+        "max_time": max_time or None,
+        "limit": limit,
+        "cursor": cursor,
+        "sort": sort.value if sort else None,
+    }
+    if projection:
+        params["fields"] = sorted(projection)
     
-    if search:
-        query = query.filter(
-            or_(
-                Recipe.title.ilike(f"%{search}%"),
-                Recipe.description.ilike(f"%{search}%")
-            )
+    async def load_page() -> Tuple[dict, bool]:
+        recipes, next_cursor = await fetch_recipe_page(
+            db, owner, search, all_tags, any_tags, max_time, limit, cursor, sort, columns=columns
         )
+        return {"items": await serialize_shared(recipes, db, schema), "next_cursor": next_cursor}, True
     
-    if diet:
-        query = query.filter(Recipe.tags.contains([diet]))
+    # Only public listings are shared between viewers
+    cache_key = await recipe_list_cache_key(params) if owner is None else None
+    page = await get_cache().get(cache_key) if cache_key else None
+    viewer_state = None
     
-    if max_time:
-        query = query.filter(Recipe.time_minutes <= max_time)
-    
-    if limit:
-        query = query.limit(limit)
+    if page is None and is_conditional(request):
+        # Confirm a revalidation against ids and versions before loading full rows
+        rows, next_cursor = await fetch_recipe_page(
+            db, owner, search, all_tags, any_tags, max_time, limit, cursor, sort, metadata_only=True
+        )
+        recipe_ids = [row.id for row in rows]
+        if current_user:
+            viewer_state = await get_viewer_state(db, recipe_ids, current_user)
+        etag = build_etag("recipes", [(row.id, row.updated_at) for row in rows], current_user, viewer_state, params, next_cursor)
+        if is_not_modified(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag))
+        
+        recipes = await load_recipes_by_ids(db, recipe_ids, columns)
+        page = {"items": await serialize_shared(recipes, db, schema), "next_cursor": next_cursor}
+        if cache_key:
+            await get_cache().set(cache_key, page)
+    elif page is None:
+        page = await get_or_load(cache_key, load_page) if cache_key else (await load_page())[0]
+    
+    items = page["items"]
+    if current_user and viewer_state is None:
+        viewer_state = await get_viewer_state(db, [item["id"] for item in items], current_user)
+    
+    etag = build_etag("recipes", [(item["id"], item["updated_at"]) for item in items], current_user, viewer_state, params, page["next_cursor"])
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag))
+    
+    headers = validator_headers(etag)
+    if page["next_cursor"]:
+        headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    
+    # Cached items are already in response shape, so skip response_model validation
+    return FastJSONResponse(apply_viewer_state(items, current_user, viewer_state), headers=headers)
+
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+# Registered before /{recipe_id} so "cook" is not taken for an id
+@router.get("/cook", response_model=List[CookableRecipe])
+async def find_cookable_recipes(
+    ingredient: List[str] = Query(..., description="What the caller has, as free text: \"2 eggs\", \"spinach\""),
+    max_missing: int = Query(3, ge=0, le=MAX_MISSING),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Principal] = Depends(get_current_principal_optional)
+):
+    """Public recipes that share ingredients with the caller's, fewest missing ingredients first.
+
+    Salt, pepper and water are assumed to be on hand. Ties go to the recipe using more
+    of the caller's ingredients.
+    """
+    matches = await search_cookable(db, ingredient, limit, max_missing)
+    recipes = {recipe.id: recipe for recipe in await load_recipes_by_ids(db, [match.recipe_id for match in matches])}
+    # Unless one was deleted in between
+    matches = [match for match in matches if match.recipe_id in recipes]
+    summaries = await get_recipes_with_extras(
+        [recipes[match.recipe_id] for match in matches], db, current_user, schema=RecipeSummary
+    )
     
-    recipes = query.all()
+    return [
+        CookableRecipe(
+            recipe=summary,
+            matched=match.matched,
+            missing=match.missing,
+            coverage=round(len(match.matched) / (len(match.matched) + len(match.missing)), 3)
+        )
+        for match, summary in zip(matches, summaries)
+    ]
+
+@router.get("/leaderboards/{board}", response_model=List[LeaderboardItem])
+async def get_leaderboard(
+    board: Leaderboard,
+    tag: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=settings.LEADERBOARD_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Principal] = Depends(get_current_principal_optional)
+):
+    """Top public recipes overall or within a tag: all-time by Bayesian average rating, or trending by recent activity.
+
+    Served from the board's last scheduled refresh (scripts/refresh_leaderboards.py);
+    Last-Modified tells when it was computed. Reads never recompute a board, and refuse
+    one the job has not refreshed for LEADERBOARD_MAX_STALENESS_SECONDS.
+    """
+    refreshed_at = await leaderboard_refreshed_at(db, board)
+    max_staleness = settings.LEADERBOARD_MAX_STALENESS_SECONDS
+    if max_staleness and refreshed_at is not None and datetime.now(timezone.utc) - refreshed_at > timedelta(seconds=max_staleness):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Leaderboard is out of date"
+        )
     
-    results = []
-    for recipe in recipes:
-        recipe_dict = get_recipe_with_extras(recipe, db, current_user)
-        results.append(RecipeResponse(**recipe_dict))
+    # A primary key range scan; recipes hidden since the refresh are skipped
+    entries = (await db.execute(
+        select(LeaderboardEntry.recipe_id, LeaderboardEntry.score)
+        .join(Recipe, Recipe.id == LeaderboardEntry.recipe_id)
+        .join(Recipe.user)
+        .where(
+            LeaderboardEntry.board == board.value,
+            LeaderboardEntry.tag == (tag or ALL_TAGS),
+            Recipe.is_public == True,
+            User.user_type == UserType.CHEF
+        )
+        .order_by(LeaderboardEntry.rank)
+        .limit(limit)
+    )).tuples().all()
+    scores = dict(entries)
+    
+    recipes = await load_recipes_by_ids(db, list(scores), projection_columns(frozenset(RecipeSummary.model_fields)))
+    summaries = await get_recipes_with_extras(recipes, db, current_user, schema=RecipeSummary)
+    return FastJSONResponse(
+        [LeaderboardItem(recipe=summary, score=round(scores[summary.id], 4)) for summary in summaries],
+        # Not refreshed yet: the board is empty
+        headers={"Last-Modified": http_date(to_timestamp(refreshed_at))} if refreshed_at is not None else None
+    )
+
+# Registered before /{recipe_id} so "export" is not taken for an id
+@router.get("/export")
+async def export_recipes(
+    request: Request,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    kind: Optional[List[ExportKind]] = Query(None, description="What to export; all kinds by default (NDJSON only)"),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Stream the caller's recipes, favorites and ratings as NDJSON or CSV, gzipped if the client accepts it."""
+    kinds = list(dict.fromkeys(kind)) if kind else list(ExportKind)
+    if export_format == ExportFormat.CSV and len(kinds) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV exports one kind at a time"
+        )
     
-    return results
+    async def body() -> AsyncIterator[bytes]:
+        # Request-scoped dependencies are torn down before the body streams, so use our own session
+        db = create_session()
+        try:
+            for export_kind in kinds:
+                if export_format == ExportFormat.CSV:
+                    yield csv_header(export_kind)
+                async for rows in export_rows(db, export_kind, current_user.id, settings.RECIPE_EXPORT_BATCH_SIZE):
+                    yield csv_lines(rows) if export_format == ExportFormat.CSV else ndjson_lines(export_kind, rows)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await db.close()
+    
+    filename = f"recipehub-{kinds[0].value}.csv" if export_format == ExportFormat.CSV else "recipehub-export.ndjson"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding"
+    }
+    chunks = body()
+    if accepts_gzip(request):
+        chunks = gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+    media_type = "text/csv; charset=utf-8" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 @router.get("/{recipe_id}", response_model=RecipeResponse)
-def get_recipe(
+async def get_recipe(
     recipe_id: int,
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional)
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Principal] = Depends(get_current_principal_optional)
 ):
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
-    if not recipe:
+    async def load_recipe() -> Tuple[dict, bool]:
+        recipe = (await db.execute(
+            select(Recipe).options(joinedload(Recipe.user)).where(Recipe.id == recipe_id)
+        )).scalar_one_or_none()
+        if not recipe:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Recipe not found"
+            )
+        
+        # Only publicly visible recipes are shared through the cache
+        publicly_visible = is_publicly_visible(recipe.is_public, recipe.user.user_type)
+        check_recipe_access(publicly_visible, recipe.user_id, current_user)
+        return (await serialize_shared([recipe], db))[0], publicly_visible
+    
+    cache_key = recipe_cache_key(recipe_id)
+    item = await get_cache().get(cache_key)
+    viewer_state = None
+    if current_user:
+        viewer_state = await get_viewer_state(db, [recipe_id], current_user)
+    
+    if item is None and is_conditional(request):
+        # Metadata-only lookup: enough to authorize and validate without the full row
+        meta = (await db.execute(
+            select(Recipe.user_id, Recipe.is_public, Recipe.updated_at, User.user_type)
+            .join(Recipe.user)
+            .where(Recipe.id == recipe_id)
+        )).first()
+        if not meta:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Recipe not found"
+            )
+        check_recipe_access(is_publicly_visible(meta.is_public, meta.user_type), meta.user_id, current_user)
+        version = meta.updated_at
+    elif item is None:
+        item = await get_or_load(cache_key, load_recipe)
+        version = item["updated_at"]
+    else:
+        version = item["updated_at"]
+    
+    etag = build_etag("recipe", [(recipe_id, version)], current_user, viewer_state)
+    # Favorites and ratings change without touching updated_at, so dates only validate anonymous copies
+    last_modified = to_timestamp(version) if not current_user else None
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
+    
+    if item is None:
+        item = await get_or_load(cache_key, load_recipe)
+        etag = build_etag("recipe", [(recipe_id, item["updated_at"])], current_user, viewer_state)
+        last_modified = to_timestamp(item["updated_at"]) if not current_user else None
+    
+    return FastJSONResponse(
+        apply_viewer_state([item], current_user, viewer_state)[0],
+        headers=validator_headers(etag, last_modified)
+    )
+
+@router.get("/{recipe_id}/similar", response_model=List[RecipeSummary])
+async def get_similar_recipes(
+    recipe_id: int,
+    limit: int = Query(settings.RECOMMENDATION_TOP_K, ge=1, le=settings.RECOMMENDATION_TOP_K),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[Principal] = Depends(get_current_principal_optional)
+):
+    """Public recipes most like this one by ingredients and tags, best first.
+
+    Served from the neighbour lists the recommendation jobs precompute (scripts/similar_recipes.py):
+    private recipes have none, and new recipes get theirs at the next fold-in.
+    """
+    meta = (await db.execute(
+        select(Recipe.user_id, Recipe.is_public, User.user_type)
+        .join(Recipe.user)
+        .where(Recipe.id == recipe_id)
+    )).first()
+    if not meta:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Recipe not found"
         )
-    
-    if current_user:
-        if recipe.user_id != current_user.id:
-            if not recipe.is_public or recipe.user.user_type != UserType.CHEF:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Recipe not accessible"
-                )
-    else:
-        if not recipe.is_public or recipe.user.user_type != UserType.CHEF:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Recipe not accessible"
-            )
-    
-    recipe_dict = get_recipe_with_extras(recipe, db, current_user)
-    return RecipeResponse(**recipe_dict)
+    check_recipe_access(is_publicly_visible(meta.is_public, meta.user_type), meta.user_id, current_user)
+    
+    # A range scan of the (recipe_id, score) index; neighbours hidden since the last job run are skipped
+    similar_ids = (await db.execute(
+        select(RecipeSimilarity.similar_recipe_id)
+        .join(Recipe, Recipe.id == RecipeSimilarity.similar_recipe_id)
+        .join(Recipe.user)
+        .where(RecipeSimilarity.recipe_id == recipe_id, Recipe.is_public == True, User.user_type == UserType.CHEF)
+        .order_by(RecipeSimilarity.score.desc())
+        .limit(limit)
+    )).scalars().all()
+    
+    recipes = await load_recipes_by_ids(db, list(similar_ids), projection_columns(frozenset(RecipeSummary.model_fields)))
+    return FastJSONResponse(await get_recipes_with_extras(recipes, db, current_user, schema=RecipeSummary))
 
 @router.post("", response_model=RecipeResponse, status_code=status.HTTP_201_CREATED)
-def create_recipe(
+async def create_recipe(
     recipe_data: RecipeCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     is_public = recipe_data.is_public
@@ -148,20 +720,69 @@ def create_recipe(
         is_public=is_public
     )
     db.add(new_recipe)
-    db.commit()
-    db.refresh(new_recipe)
+    await db.commit()
+    await db.refresh(new_recipe)
+    await invalidate_recipe_cache(publicly_listed=is_public and current_user.user_type == UserType.CHEF)
     
-    recipe_dict = get_recipe_with_extras(new_recipe, db, current_user)
-    return RecipeResponse(**recipe_dict)
+    return FastJSONResponse(
+        await get_recipe_with_extras(new_recipe, db, current_user, is_new=True),
+        status_code=status.HTTP_201_CREATED
+    )
+
+@router.post("/import", response_model=RecipeImportResponse)
+async def import_recipes(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk create from an NDJSON body (one RecipeCreate per line) or a JSON array, read as it streams in.
+
+    Invalid recipes are skipped and reported; everything else is saved in one transaction.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    max_bytes = settings.RECIPE_IMPORT_MAX_LINE_BYTES
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = iter_ndjson(request.stream(), max_bytes)
+    elif content_type == "application/json":
+        items = iter_json_array(request.stream(), max_bytes)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send application/x-ndjson or a JSON array as application/json"
+        )
+    
+    importer = RecipeImporter(
+        db,
+        current_user.id,
+        allow_public=current_user.user_type != UserType.REGULAR,
+        chunk_size=settings.RECIPE_IMPORT_CHUNK_SIZE
+    )
+    try:
+        result = await importer.run(items)
+    except ImportTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Malformed upload: {str(e)}"
+        )
+    
+    await db.commit()
+    if result.imported:
+        await invalidate_recipe_cache(publicly_listed=importer.public_imported > 0)
+    return FastJSONResponse(result)
 
 @router.put("/{recipe_id}", response_model=RecipeResponse)
-def update_recipe(
+async def update_recipe(
     recipe_id: int,
     recipe_data: RecipeUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    recipe = await db.get(Recipe, recipe_id)
     if not recipe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -179,22 +800,26 @@ def update_recipe(
     if "is_public" in update_data and current_user.user_type == UserType.REGULAR:
         update_data["is_public"] = False
     
+    was_public = recipe.is_public
     for field, value in update_data.items():
         setattr(recipe, field, value)
     
-    db.commit()
-    db.refresh(recipe)
+    await db.commit()
+    await db.refresh(recipe)
+    await invalidate_recipe_cache(
+        recipe_id,
+        publicly_listed=(was_public or recipe.is_public) and current_user.user_type == UserType.CHEF
+    )
     
-    recipe_dict = get_recipe_with_extras(recipe, db, current_user)
-    return RecipeResponse(**recipe_dict)
+    return FastJSONResponse(await get_recipe_with_extras(recipe, db, current_user))
 
 @router.delete("/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_recipe(
+async def delete_recipe(
     recipe_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    recipe = await db.get(Recipe, recipe_id)
     if not recipe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -207,26 +832,28 @@ def delete_recipe(
             detail="Not authorized to delete this recipe"
         )
     
-    db.delete(recipe)
-    db.commit()
+    was_public = recipe.is_public
+    await db.delete(recipe)
+    await db.commit()
+    await invalidate_recipe_cache(recipe_id, publicly_listed=was_public and current_user.user_type == UserType.CHEF)
     return None
 
 @router.post("/{recipe_id}/favorite", status_code=status.HTTP_201_CREATED)
-def add_favorite(
+async def add_favorite(
     recipe_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
+    recipe = await db.get(Recipe, recipe_id)
     if not recipe:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Recipe not found"
         )
     
-    existing_favorite = db.query(Favorite).filter(
-        and_(Favorite.user_id == current_user.id, Favorite.recipe_id == recipe_id)
-    ).first()
+    existing_favorite = (await db.execute(
+        select(Favorite).where(and_(Favorite.user_id == current_user.id, Favorite.recipe_id == recipe_id))
+    )).scalars().first()
     
     if existing_favorite:
         raise HTTPException(
@@ -236,18 +863,18 @@ def add_favorite(
     
     favorite = Favorite(user_id=current_user.id, recipe_id=recipe_id)
     db.add(favorite)
-    db.commit()
+    await db.commit()
     return {"message": "Recipe favorited"}
 
 @router.delete("/{recipe_id}/favorite", status_code=status.HTTP_204_NO_CONTENT)
-def remove_favorite(
+async def remove_favorite(
     recipe_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    favorite = db.query(Favorite).filter(
-        and_(Favorite.user_id == current_user.id, Favorite.recipe_id == recipe_id)
-    ).first()
+    favorite = (await db.execute(
+        select(Favorite).where(and_(Favorite.user_id == current_user.id, Favorite.recipe_id == recipe_id))
+    )).scalars().first()
     
     if not favorite:
         raise HTTPException(
@@ -255,16 +882,16 @@ def remove_favorite(
             detail="Favorite not found"
         )
     
-    db.delete(favorite)
-    db.commit()
+    await db.delete(favorite)
+    await db.commit()
     return None
 
 @router.post("/{recipe_id}/rate", response_model=RatingResponse)
-def rate_recipe(
+async def rate_recipe(
     recipe_id: int,
     rating_data: RatingCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     if rating_data.rating < 1 or rating_data.rating > 5:
         raise HTTPException(
@@ -272,41 +899,15 @@ def rate_recipe(
             detail="Rating must be between 1 and 5"
         )
     
-    recipe = db.query(Recipe).filter(Recipe.id == recipe_id).first()
-    if not recipe:
+    result = await upsert_rating(db, recipe_id, current_user.id, rating_data.rating)
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Recipe not found"
         )
-    
-    existing_rating = db.query(Rating).filter(
-        and_(Rating.user_id == current_user.id, Rating.recipe_id == recipe_id)
-    ).first()
-    
-    if existing_rating:
-        existing_rating.rating = rating_data.rating
-    else:
-        new_rating = Rating(
-            user_id=current_user.id,
-            recipe_id=recipe_id,
-            rating=rating_data.rating
-        )
-        db.add(new_rating)
-    
-    db.commit()
-    
-    avg_rating_result = db.query(func.avg(Rating.rating)).filter(
-        Rating.recipe_id == recipe_id
-    ).scalar()
-    
-    recipe.avg_rating = Decimal(str(avg_rating_result)) if avg_rating_result else None
-    db.commit()
-    
-    user_rating = rating_data.rating
-    if existing_rating:
-        user_rating = existing_rating.rating
+    await invalidate_recipe_cache(recipe_id, publicly_listed=result.is_public)
     
     return RatingResponse(
-        user_rating=user_rating,
-        avg_rating=recipe.avg_rating
+        user_rating=rating_data.rating,
+        avg_rating=result.avg_rating
     )
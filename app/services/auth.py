@@ -1,25 +1,42 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import NamedTuple, Optional, Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import settings, get_db
-from app.models import User
+from app.models import User, UserType
+from app.services.cache import InMemoryLRUCache
 
 # Security Configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
-# Auth Utilities
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+class Principal(NamedTuple):
+    """The caller as asserted by a verified access token; stands in for User where the row isn't needed."""
+    id: int
+    name: str
+    user_type: UserType
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, name=user.name, user_type=UserType(user.user_type))
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+AuthenticatedUser = Union[User, Principal]
+
+# Verified principals keyed by token hash, each kept no longer than its token is valid
+_principal_cache = InMemoryLRUCache(settings.AUTH_TOKEN_CACHE_SIZE)
+
+# Auth Utilities
+def token_claims(user: User) -> dict:
+    # Everything the read paths need, so they never have to look the user up
+    return {"sub": str(user.id), "name": user.name, "user_type": UserType(user.user_type).value}
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+    
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -30,62 +47,80 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def decode_access_token(token: str) -> Optional[dict]:
+    from jose import JWTError, jwt
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
     except JWTError:
         return None
 
-# Dependencies
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    token = credentials.credentials
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
+    return (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+
+def token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def resolve_principal(token: str, db: AsyncSession) -> Optional[Principal]:
+    """Return the principal for a valid token, or None; cached tokens skip both JWT decoding and the database."""
+    cache_key = token_cache_key(token)
+    principal = _principal_cache.get(cache_key)
+    if principal is not None:
+        return principal
+    
     payload = decode_access_token(token)
     if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user_id_str = payload.get("sub")
-    if user_id_str is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        return None
     try:
-        user_id = int(user_id_str)
-    except ValueError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
+    
+    try:
+        principal = Principal(id=user_id, name=payload["name"], user_type=UserType(payload["user_type"]))
+    except (KeyError, ValueError):
+        # Tokens issued before the claims were added still resolve, once, through the database
+        user = await get_user_by_id(db, user_id)
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+    
+    ttl = payload.get("exp", 0) - time.time()
+    if ttl > 0:
+        _principal_cache.set(cache_key, principal, ttl)
+    return principal
 
-def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+def credentials_exception(detail: str = "Invalid authentication credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+# Dependencies
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    principal = await resolve_principal(credentials.credentials, db)
+    if principal is None:
+        raise credentials_exception()
+    return principal
+
+async def get_current_principal_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: AsyncSession = Depends(get_db)
+) -> Optional[Principal]:
     if credentials is None:
         return None
-    token = credentials.credentials
-    payload = decode_access_token(token)
-    if payload is None:
-        return None
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        return None
-    user = db.query(User).filter(User.id == user_id).first()
+    return await resolve_principal(credentials.credentials, db)
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Full user row, for writes that should act on the current account state rather than token claims."""
+    user = await get_user_by_id(db, principal.id)
+    if user is None:
+        raise credentials_exception("User not found")
     return user
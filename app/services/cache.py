@@ -0,0 +1,212 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.database import settings
+
+
+class CacheBackend(ABC):
+    """Minimal key-value interface shared by the in-process and external caches.
+
+    Values must be JSON-serializable so they can move between backends unchanged.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        pass
+
+
+class InMemoryLRUCache:
+    """Bounded, thread-safe LRU mapping with optional per-entry TTL."""
+
+    def __init__(self, max_entries: int, default_ttl: Optional[int] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl if ttl is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _, value = self._entries.get(key, (None, 0))
+            value += 1
+            # Counters never expire so generations only move forward
+            self._entries[key] = (None, value)
+            self._entries.move_to_end(key)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class InMemoryCache(CacheBackend):
+    """Per-process cache. Writes only invalidate the instance that served them, so other
+    instances may serve entries up to their TTL old."""
+
+    def __init__(self, max_entries: int, default_ttl: Optional[int] = None):
+        self.entries = InMemoryLRUCache(max_entries, default_ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self.entries.set(key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        self.entries.delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        return self.entries.incr(key)
+
+    async def clear(self) -> None:
+        self.entries.clear()
+
+
+class KeyValueStoreCache(CacheBackend):
+    """Cache backed by an external Redis-compatible asyncio client (get/set/delete/incr)."""
+
+    def __init__(self, client: Any, default_ttl: Optional[int] = None, prefix: str = "recipehub:"):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl if ttl is not None else self.default_ttl
+        await self.client.set(self.prefix + key, json.dumps(value, default=str), ex=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*[self.prefix + key for key in keys])
+
+    async def incr(self, key: str) -> int:
+        return int(await self.client.incr(self.prefix + key))
+
+    @classmethod
+    def from_url(cls, url: str, default_ttl: Optional[int] = None, prefix: str = "recipehub:") -> "KeyValueStoreCache":
+        import redis.asyncio  # optional dependency, only needed with the redis backend
+
+        return cls(redis.asyncio.Redis.from_url(url), default_ttl=default_ttl, prefix=prefix)
+
+
+_cache: Optional[CacheBackend] = None
+_cache_lock = threading.Lock()
+
+
+def shared_store_url() -> Optional[str]:
+    """URL of the Redis store shared by all instances, or None to keep state in process.
+
+    CACHE_BACKEND defaults to redis whenever CACHE_URL is set.
+    """
+    backend = settings.CACHE_BACKEND or ("redis" if settings.CACHE_URL else "memory")
+    if backend == "memory":
+        return None
+    if backend != "redis":
+        raise ValueError(f"Unknown cache backend '{backend}'")
+    if not settings.CACHE_URL:
+        raise ValueError("CACHE_URL is required for the redis cache backend")
+    return settings.CACHE_URL
+
+
+def create_cache(max_entries: int, default_ttl: Optional[int], namespace: str = "") -> CacheBackend:
+    """Build a cache on the configured backend; max_entries only bounds the in-process one."""
+    url = shared_store_url()
+    if url:
+        return KeyValueStoreCache.from_url(url, default_ttl=default_ttl, prefix=f"recipehub:{namespace}")
+    return InMemoryCache(max_entries, default_ttl=default_ttl)
+
+
+def get_cache() -> CacheBackend:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_cache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+    return _cache
+
+
+def set_cache(cache: Optional[CacheBackend]) -> None:
+    """Swap the process-wide cache, e.g. for a local stand-in of the external store."""
+    global _cache
+    _cache = cache
+
+
+# Stampede protection: concurrent misses on the same key wait for a single loader
+_inflight: Dict[str, asyncio.Lock] = {}
+
+
+async def get_or_load(
+    key: str,
+    loader: Callable[[], Awaitable[Tuple[Any, bool]]],
+    ttl: Optional[int] = None,
+    cache: Optional[CacheBackend] = None
+) -> Any:
+    """Return the cached value for key, or run loader once across concurrent callers.
+
+    loader returns (value, cacheable); uncacheable values are returned but not stored,
+    and callers that waited on them run their own loader.
+    """
+    cache = cache or get_cache()
+    value = await cache.get(key)
+    if value is not None:
+        return value
+
+    lock = _inflight.setdefault(key, asyncio.Lock())
+    async with lock:
+        try:
+            value = await cache.get(key)
+            if value is not None:
+                return value
+            value, cacheable = await loader()
+            if cacheable:
+                await cache.set(key, value, ttl)
+            return value
+        finally:
+            if _inflight.get(key) is lock:
+                del _inflight[key]
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, List
+from sqlalchemy import Select, select
+from app.database import DbSession
+from app.models import ExportKind, Favorite, Rating, Recipe
+from app.services.serialization import dumps
+
+# The "type" of each NDJSON record
+RECORD_TYPES = {ExportKind.RECIPES: "recipe", ExportKind.FAVORITES: "favorite", ExportKind.RATINGS: "rating"}
+
+
+def export_query(kind: ExportKind, user_id: int) -> Select:
+    # Plain columns rather than entities: rows stream through without touching the identity map
+    if kind == ExportKind.RECIPES:
+        return select(
+            Recipe.id, Recipe.title, Recipe.description, Recipe.ingredients, Recipe.steps,
+            Recipe.time_minutes, Recipe.difficulty, Recipe.tags, Recipe.source, Recipe.is_public,
+            Recipe.avg_rating, Recipe.created_at, Recipe.updated_at
+        ).where(Recipe.user_id == user_id).order_by(Recipe.id)
+    if kind == ExportKind.FAVORITES:
+        return select(
+            Favorite.recipe_id, Recipe.title, Favorite.created_at
+        ).join(Recipe, Recipe.id == Favorite.recipe_id).where(Favorite.user_id == user_id).order_by(Favorite.id)
+    return select(
+        Rating.recipe_id, Recipe.title, Rating.rating, Rating.created_at
+    ).join(Recipe, Recipe.id == Rating.recipe_id).where(Rating.user_id == user_id).order_by(Rating.id)
+
+
+async def export_rows(db: DbSession, kind: ExportKind, user_id: int, batch_size: int) -> AsyncIterator[List[Any]]:
+    """Yield the rows of one export in batches, read through a server-side cursor."""
+    result = await db.stream(export_query(kind, user_id).execution_options(yield_per=batch_size))
+    try:
+        async for rows in result.partitions():
+            yield rows
+    finally:
+        await result.close()
+
+
+def ndjson_lines(kind: ExportKind, rows: List[Any]) -> bytes:
+    record_type = RECORD_TYPES[kind]
+    return b"".join(dumps({"type": record_type, **row._mapping}) + b"\n" for row in rows)
+
+
+def csv_cell(value: Any) -> Any:
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_header(kind: ExportKind) -> bytes:
+    return csv_lines([[column.key for column in export_query(kind, 0).selected_columns]])
+
+
+def csv_lines(rows: List[Any]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([csv_cell(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream on the fly, flushing after every chunk so data keeps flowing."""
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,215 @@
+import math
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, event, func, select, text
+from sqlalchemy.orm import attributes
+from app.database import DbSession, get_engine, settings
+from app.models import Recipe, User, UserType
+
+# Letter runs only: quantities ("1 1/2", "200g", "½") fall out as non-words
+_TOKEN_RE = re.compile(r"[a-zà-ÿ]+(?:-[a-zà-ÿ]+)*|[,&()]")
+
+UNITS = frozenset({
+    "cup", "cups", "c", "tablespoon", "tablespoons", "tbsp", "tbs", "tb", "teaspoon", "teaspoons", "tsp",
+    "gram", "grams", "g", "kilogram", "kilograms", "kg", "milligram", "mg", "ounce", "ounces", "oz",
+    "pound", "pounds", "lb", "lbs", "milliliter", "milliliters", "millilitre", "ml", "liter", "liters",
+    "litre", "litres", "l", "dl", "cl", "pint", "pints", "quart", "quarts", "gallon", "pinch", "pinches",
+    "dash", "dashes", "handful", "handfuls", "clove", "cloves", "slice", "slices", "piece", "pieces",
+    "can", "cans", "tin", "tins", "jar", "jars", "package", "packages", "pkg", "packet", "bunch", "bunches",
+    "sprig", "sprigs", "stick", "sticks", "head", "heads", "stalk", "stalks", "fillet", "fillets", "drop",
+    "drops", "knob", "sheet", "sheets", "scoop", "scoops", "bag", "bags", "box", "bottle",
+})
+
+# Preparation, size and freshness words that do not change what the ingredient is
+DESCRIPTORS = frozenset({
+    "a", "an", "of", "the", "and", "or", "to", "for", "about", "approximately", "some", "few", "more", "plus",
+    "chopped", "finely", "roughly", "coarsely", "thinly", "minced", "diced", "sliced", "grated", "shredded",
+    "crushed", "ground", "peeled", "seeded", "cored", "trimmed", "halved", "quartered", "cubed", "julienned",
+    "mashed", "melted", "softened", "beaten", "whisked", "sifted", "rinsed", "drained", "washed", "toasted",
+    "cooked", "uncooked", "raw", "boiled", "fresh", "freshly", "frozen", "thawed", "dried", "large", "medium",
+    "small", "big", "whole", "optional", "taste", "room", "temperature", "cold", "warm", "hot", "ripe",
+    "boneless", "skinless", "lean", "extra", "virgin", "organic", "packed", "heaped", "heaping", "level",
+    "good", "quality", "divided", "needed", "garnish", "serving", "into", "pieces", "cut", "inch", "cm",
+    "baby", "leaf", "leaves",
+})
+
+# Assumed to be in every kitchen: they never count as missing and never drive matches
+STAPLES = frozenset({"salt", "pepper", "black pepper", "water", "ice"})
+
+# Upper bound on the missing ingredients a search may allow; sets the signature length
+MAX_MISSING = 5
+
+_INVARIANT_PLURALS = ("ss", "us", "is", "ous")
+
+
+def singularize(word: str) -> str:
+    if len(word) <= 3 or word.endswith(_INVARIANT_PLURALS):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "sses", "zes")):
+        return word[:-2]
+    if word.endswith("ves") and not word.endswith(("olives", "chives")):
+        return word[:-3] + "f"
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def _canonical(words: List[str]) -> Optional[str]:
+    if not words:
+        return None
+    return " ".join(words[:-1] + [singularize(words[-1])])
+
+
+@lru_cache(maxsize=65536)
+def ingredient_tokens(text: str) -> Tuple[str, ...]:
+    """Canonical tokens for one ingredient line: "2 cups chopped red onions" -> ("red onion",).
+
+    Quantities, units, preparation words and parentheticals are dropped. "salt and pepper"
+    names two ingredients; after a comma comes preparation ("onion, finely chopped") and
+    after "or" an alternative ("butter or margarine"), so both end the line.
+    """
+    tokens: List[str] = []
+    words: List[str] = []
+    depth = 0
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word == "(":
+            depth += 1
+        elif word == ")":
+            depth = max(depth - 1, 0)
+        elif depth:
+            continue
+        elif word in ("and", "&"):
+            tokens.append(_canonical(words))
+            words = []
+        elif word in (",", "or"):
+            break
+        elif word not in UNITS and word not in DESCRIPTORS:
+            words.append(word)
+    tokens.append(_canonical(words))
+    return tuple(token for token in tokens if token)
+
+
+def normalize_ingredients(items: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(token for item in items if isinstance(item, str) for token in ingredient_tokens(item))
+
+
+class IngredientMatch(NamedTuple):
+    recipe_id: int
+    matched: List[str]
+    missing: List[str]
+
+
+# Same visibility rule as the public recipe list
+PUBLICLY_VISIBLE = and_(Recipe.is_public == True, User.user_type == UserType.CHEF)
+
+
+def signature_key(position: int, token: str) -> str:
+    return f"{position}:{token}"
+
+
+def ingredient_columns(ingredients: Iterable[str], frequencies: Mapping[str, float]) -> Tuple[List[str], List[str]]:
+    """Recipe.ingredient_tokens and Recipe.ingredient_signature for a recipe's ingredient lines.
+
+    A recipe missing at most m ingredients must have at least one of any m + 1 of them on
+    hand, so a recipe is found by its MAX_MISSING + 1 rarest ingredients, its signature,
+    stored as "position:token" keys under a GIN index. A search allowing m missing looks up
+    the first m + 1 positions for the pantry's ingredients: every qualifying recipe is among
+    the candidates, while common ingredients (butter, onion...) that would bring in half the
+    table are usually left out. Candidates are then checked against their full ingredient
+    sets, so which ingredients count as rare only affects speed, never results.
+
+    Staples are left out of both.
+    """
+    tokens = sorted(normalize_ingredients(ingredients) - STAPLES)
+    rarest = sorted(tokens, key=lambda token: (frequencies.get(token, 0.0), token))[:MAX_MISSING + 1]
+    return tokens, [signature_key(position, token) for position, token in enumerate(rarest)]
+
+
+# The planner statistics ANALYZE keeps on the array column: its most common elements and the
+# share of rows holding each (most_common_elem_freqs has three summary values past the elements)
+_FREQUENCY_QUERY = text("""
+    SELECT common.token, common.frequency
+    FROM pg_stats, unnest(most_common_elems::text::text[], most_common_elem_freqs) AS common(token, frequency)
+    WHERE schemaname = current_schema() AND tablename = 'recipes' AND attname = 'ingredient_tokens'
+        AND common.token IS NOT NULL
+""")
+
+
+class IngredientFrequencies:
+    """How common each canonical ingredient is, for picking signatures; re-read every INGREDIENT_FREQUENCY_REFRESH_SECONDS.
+
+    Postgres maintains the numbers as part of autovacuum's ANALYZE; ingredients outside its
+    most common elements count as rare. Stale numbers only make signatures less selective.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, float] = {}
+        self.loaded_at = -math.inf
+
+    def _due(self, dialect_name: str) -> bool:
+        return dialect_name == "postgresql" and time.monotonic() - self.loaded_at >= settings.INGREDIENT_FREQUENCY_REFRESH_SECONDS
+
+    def _store(self, rows: Iterable[Tuple[str, float]]) -> Dict[str, float]:
+        self.values, self.loaded_at = dict(rows), time.monotonic()
+        return self.values
+
+    def get_sync(self, connection: Any) -> Dict[str, float]:
+        if self._due(connection.dialect.name):
+            return self._store(connection.execute(_FREQUENCY_QUERY).all())
+        return self.values
+
+    async def get(self, db: DbSession) -> Dict[str, float]:
+        if self._due(get_engine().dialect.name):
+            return self._store((await db.execute(_FREQUENCY_QUERY)).all())
+        return self.values
+
+
+ingredient_frequencies = IngredientFrequencies()
+
+
+@event.listens_for(Recipe, "before_insert")
+@event.listens_for(Recipe, "before_update")
+def index_recipe_ingredients(mapper: Any, connection: Any, recipe: Recipe) -> None:
+    # Every ORM write of a recipe; bulk Core inserts (the importer) fill the columns themselves
+    if attributes.get_history(recipe, "ingredients").has_changes():
+        recipe.ingredient_tokens, recipe.ingredient_signature = ingredient_columns(
+            recipe.ingredients, ingredient_frequencies.get_sync(connection)
+        )
+
+
+async def search_cookable(db: DbSession, pantry: Iterable[str], limit: int, max_missing: int) -> List[IngredientMatch]:
+    """Public recipes sharing at least one ingredient with pantry: fewest missing first, then most matched."""
+    if max_missing > MAX_MISSING:
+        raise ValueError(f"max_missing is at most {MAX_MISSING}")
+    have = sorted(normalize_ingredients(pantry) - STAPLES)
+    if not have:
+        return []
+    keys = [signature_key(position, token) for position in range(max_missing + 1) for token in have]
+    token = func.unnest(Recipe.ingredient_tokens).table_valued("token").render_derived()
+    matched = select(func.count()).select_from(token).where(token.c.token.in_(have)).scalar_subquery()
+    candidates = (
+        select(Recipe.id, Recipe.ingredient_tokens, matched.label("matched"))
+        .join(Recipe.user)
+        .where(PUBLICLY_VISIBLE, Recipe.ingredient_signature.overlap(keys))
+        .subquery()
+    )
+    missing = func.cardinality(candidates.c.ingredient_tokens) - candidates.c.matched
+    rows = (await db.execute(
+        select(candidates.c.id, candidates.c.ingredient_tokens)
+        .where(missing <= max_missing)
+        .order_by(missing, candidates.c.matched.desc(), candidates.c.id)
+        .limit(limit)
+    )).all()
+    have_set = frozenset(have)
+    return [
+        IngredientMatch(
+            recipe_id=recipe_id,
+            matched=[token for token in tokens if token in have_set],
+            missing=[token for token in tokens if token not in have_set],
+        )
+        for recipe_id, tokens in rows
+    ]
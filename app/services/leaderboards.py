@@ -0,0 +1,126 @@
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+from sqlalchemy import Float, Select, case, cast, delete, func, literal, select, true, union_all
+from sqlalchemy.dialects.postgresql import insert
+from app.database import DbSession, create_session, settings
+from app.models import Favorite, Leaderboard, LeaderboardEntry, LeaderboardRefresh, Rating, Recipe
+from app.services.ingredients import PUBLICLY_VISIBLE
+
+ALL_TAGS = ""  # tag of the unfiltered board
+# First key of the per-board advisory locks; the second is the board's position in Leaderboard
+LOCK_NAMESPACE = 23023
+
+
+async def top_rated_scores(db: DbSession) -> Select:
+    """Bayesian average of each rated public recipe: its ratings plus LEADERBOARD_PRIOR_RATINGS at the site-wide mean."""
+    rating_sum, rating_count = (await db.execute(
+        select(func.sum(Recipe.rating_sum), func.sum(Recipe.rating_count)).join(Recipe.user).where(PUBLICLY_VISIBLE)
+    )).one()
+    mean = float(rating_sum) / float(rating_count) if rating_count else 0.0
+    prior = settings.LEADERBOARD_PRIOR_RATINGS
+    score = (cast(Recipe.rating_sum, Float) + prior * mean) / cast(Recipe.rating_count + prior, Float)
+    return (
+        select(Recipe.id.label("recipe_id"), Recipe.tags, score.label("score"))
+        .join(Recipe.user)
+        .where(PUBLICLY_VISIBLE, Recipe.rating_count > 0)
+    )
+
+
+def trending_scores() -> Select:
+    """Recent ratings and favorites of each public recipe, each weighted down by half every half-life."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.LEADERBOARD_TRENDING_WINDOW_DAYS)
+    decay = math.log(2) / (settings.LEADERBOARD_TRENDING_HALF_LIFE_HOURS * 3600)
+
+    def activity(model, weight: float) -> Select:
+        # extract() returns numeric, whose exp() is far slower than float's
+        age = cast(func.extract("epoch", func.now() - model.created_at), Float)
+        return select(model.recipe_id, (func.exp(-decay * age) * weight).label("weight")).where(model.created_at >= cutoff)
+
+    events = union_all(
+        activity(Rating, 1.0),
+        activity(Favorite, settings.LEADERBOARD_TRENDING_FAVORITE_WEIGHT)
+    ).subquery()
+    totals = select(events.c.recipe_id, func.sum(events.c.weight).label("score")).group_by(events.c.recipe_id).subquery()
+    return (
+        select(totals.c.recipe_id, Recipe.tags, totals.c.score)
+        .join(Recipe, Recipe.id == totals.c.recipe_id)
+        .join(Recipe.user)
+        .where(PUBLICLY_VISIBLE)
+    )
+
+
+def ranked_entries(board: Leaderboard, scores: Select) -> Select:
+    """The top LEADERBOARD_SIZE of scores (recipe_id, tags, score) overall and within each tag, as leaderboard_entries rows."""
+    # A CTE so the scores are computed once for both the overall and the per-tag rows
+    scores = scores.cte("scores")
+    # tags can be SQL NULL or a JSON null, and expanding anything but an array is an error
+    tags = case((func.jsonb_typeof(scores.c.tags) == "array", scores.c.tags))
+    tag = func.jsonb_array_elements_text(tags).table_valued("value")
+    recipe_tags = select(tag.c.value.label("tag")).distinct().lateral("recipe_tags")
+    tagged = union_all(
+        select(scores.c.recipe_id, scores.c.score, literal(ALL_TAGS).label("tag")),
+        select(scores.c.recipe_id, scores.c.score, recipe_tags.c.tag).join(recipe_tags, true())
+    ).subquery()
+    # Ties go to the newer recipe
+    rank = func.row_number().over(
+        partition_by=tagged.c.tag,
+        order_by=(tagged.c.score.desc(), tagged.c.recipe_id.desc())
+    )
+    ranked = select(tagged.c.tag, tagged.c.recipe_id, tagged.c.score, rank.label("rank")).subquery()
+    return (
+        select(literal(board.value), ranked.c.tag, ranked.c.rank, ranked.c.recipe_id, ranked.c.score)
+        .where(ranked.c.rank <= settings.LEADERBOARD_SIZE)
+    )
+
+
+async def leaderboard_refreshed_at(db: DbSession, board: Leaderboard) -> Optional[datetime]:
+    return (await db.execute(
+        select(LeaderboardRefresh.refreshed_at).where(LeaderboardRefresh.board == board.value)
+    )).scalar()
+
+
+async def refresh_leaderboard(db: DbSession, board: Leaderboard) -> bool:
+    """Recompute a board in one transaction; readers keep seeing the previous entries until it commits.
+
+    Refreshes of a board are serialized by an advisory lock. Returns False without refreshing
+    if another refresh holds it.
+    """
+    key = (LOCK_NAMESPACE, list(Leaderboard).index(board))
+    if not (await db.execute(select(func.pg_try_advisory_xact_lock(*key)))).scalar():
+        await db.rollback()
+        return False
+
+    scores = await top_rated_scores(db) if board == Leaderboard.TOP_RATED else trending_scores()
+    await db.execute(delete(LeaderboardEntry).where(LeaderboardEntry.board == board.value))
+    await db.execute(
+        insert(LeaderboardEntry).from_select(
+            ["board", "tag", "rank", "recipe_id", "score"], ranked_entries(board, scores)
+        )
+    )
+    await db.execute(
+        insert(LeaderboardRefresh)
+        .values(board=board.value, refreshed_at=func.now())
+        .on_conflict_do_update(index_elements=[LeaderboardRefresh.board], set_={"refreshed_at": func.now()})
+    )
+    await db.commit()
+    return True
+
+
+async def refresh_leaderboards(boards: Iterable[Leaderboard]) -> Dict[Leaderboard, Optional[float]]:
+    """The scheduled job, and the only writer of the boards: refresh each in turn.
+
+    Returns the seconds each refresh took, or None for a board skipped because an
+    overlapping run was still refreshing it.
+    """
+    timings: Dict[Leaderboard, Optional[float]] = {}
+    db = create_session()
+    try:
+        for board in boards:
+            start = time.perf_counter()
+            refreshed = await refresh_leaderboard(db, board)
+            timings[board] = time.perf_counter() - start if refreshed else None
+    finally:
+        await db.close()
+    return timings
@@ -0,0 +1,240 @@
+"""In-process request, database and OpenAI metrics, exposed in the Prometheus text format.
+
+Stdlib only, so importing it costs nothing at cold start. Series live in the process
+(one Lambda container) and start empty with it.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+OPENAI_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+UNMATCHED_ROUTE = "unmatched"  # one label for every 404 path, so scanners can't explode the series
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and a locked increment."""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label_names = labels
+        # Per label set: a count per bucket (the last one is +Inf, not cumulative) and the sum
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+http_requests = Counter("http_requests_total", "Requests served.", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to its last body chunk.",
+    LATENCY_BUCKETS, ("method", "route")
+)
+http_response_size = Histogram(
+    "http_response_size_bytes", "Response body size as sent, after compression.", SIZE_BUCKETS, ("method", "route")
+)
+http_request_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per request.", QUERY_COUNT_BUCKETS, ("method", "route")
+)
+http_request_db_duration = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS, ("method", "route")
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Execution time of each SQL statement, requests and jobs alike.", QUERY_LATENCY_BUCKETS
+)
+openai_requests = Counter("openai_requests_total", "Chat completion calls.", ("model", "mode", "outcome"))
+openai_request_duration = Histogram(
+    "openai_request_duration_seconds", "Chat completion time, to the last chunk for streams.",
+    OPENAI_LATENCY_BUCKETS, ("model", "mode")
+)
+openai_first_token = Histogram(
+    "openai_stream_first_token_seconds", "Time to the first content chunk of a streamed completion.",
+    OPENAI_LATENCY_BUCKETS, ("model",)
+)
+openai_tokens = Counter("openai_tokens_total", "Tokens billed by OpenAI.", ("model", "type"))
+
+REGISTRY = (
+    http_requests, http_request_duration, http_response_size, http_request_queries, http_request_db_duration,
+    db_query_duration, openai_requests, openai_request_duration, openai_first_token, openai_tokens,
+)
+
+
+class RequestStats:
+    """What the current request has spent so far, for its Server-Timing header and per-request histograms."""
+    __slots__ = ("queries", "db_seconds", "openai_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.openai_seconds = 0.0
+
+    def server_timing(self, total_seconds: float) -> str:
+        timing = f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} {"query" if self.queries == 1 else "queries"}"'
+        if self.openai_seconds:
+            timing += f", openai;dur={self.openai_seconds * 1000:.1f}"
+        return timing + f", app;dur={total_seconds * 1000:.1f}"
+
+
+# Set by the middleware; copied into threadpool calls and SQLAlchemy's greenlets with the context
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+# SQLAlchemy cursor events, registered on each engine by app.database.instrument_engine
+def before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    context._metrics_started = time.perf_counter()
+
+
+def after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    elapsed = time.perf_counter() - context._metrics_started
+    db_query_duration.observe((), elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def record_openai_call(model: str, mode: str, seconds: float, usage: Optional[Any], outcome: str = "ok") -> None:
+    """Outcome is "ok", "error", or "aborted" for a stream closed before its end (e.g. the client left)."""
+    openai_requests.inc((model, mode, outcome))
+    openai_request_duration.observe((model, mode), seconds)
+    if usage is not None:
+        openai_tokens.inc((model, "prompt"), usage.prompt_tokens)
+        openai_tokens.inc((model, "completion"), usage.completion_tokens)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.openai_seconds += seconds
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each request by route template and adding a Server-Timing header.
+
+    Server-Timing is computed when the headers go out, so for streamed bodies it covers
+    the time to the first byte.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = stats.server_timing(time.perf_counter() - start)
+                message = {**message, "headers": [*message.get("headers", ()), (b"server-timing", timing.encode())]}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            # The router leaves the matched route in the scope; its path is the template, not the URL
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else UNMATCHED_ROUTE)
+            http_requests.inc((*labels, str(status)))
+            http_request_duration.observe(labels, elapsed)
+            http_response_size.observe(labels, size)
+            http_request_queries.observe(labels, stats.queries)
+            http_request_db_duration.observe(labels, stats.db_seconds)
+
+
+def _pool_lines(pool: Dict[str, Any]) -> Iterator[str]:
+    for name, key, kind, documentation in (
+        ("db_connections_opened_total", "connections_opened", "counter", "Physical database connections opened."),
+        ("db_connect_seconds_total", "connect_seconds", "counter", "Time spent opening database connections."),
+        ("db_pool_checkouts_total", "checkouts", "counter", "Connections taken from the pool."),
+        ("db_pool_checkout_seconds_total", "checkout_seconds", "counter", "Time spent waiting for pooled connections."),
+        ("db_pool_checkout_seconds_max", "checkout_seconds_max", "gauge", "Longest wait for a pooled connection."),
+    ):
+        yield f"# HELP {name} {documentation}"
+        yield f"# TYPE {name} {kind}"
+        yield f"{name} {_number(pool[key])}"
+
+
+def render_metrics(pool: Optional[Dict[str, Any]] = None) -> str:
+    """Every series in the Prometheus text exposition format, plus the connection pool counters if given."""
+    lines = [line for metric in REGISTRY for line in metric.render()]
+    if pool is not None:
+        lines.extend(_pool_lines(pool))
+    return "\n".join(lines) + "\n"
@@ -1,13 +1,17 @@
-from openai import OpenAI
 from app.database import settings
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-_client: Optional[OpenAI] = None
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-def get_openai_client() -> OpenAI:
+_client: Optional["AsyncOpenAI"] = None
+
+def get_openai_client() -> "AsyncOpenAI":
     global _client
     if _client is None:
         if not settings.OPENAI_API_KEY:
             raise ValueError("OpenAI API key not configured")
-        _client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # The SDK (and httpx under it) is only imported once an AI route needs it
+        from openai import AsyncOpenAI
+        _client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
     return _client
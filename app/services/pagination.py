@@ -0,0 +1,20 @@
+import base64
+import json
+from typing import Any, List
+
+
+def encode_cursor(sort: str, values: List[Any]) -> str:
+    payload = json.dumps({"s": sort, "v": values}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["v"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Malformed cursor")
+    if payload.get("s") != sort or not isinstance(values, list):
+        raise ValueError("Cursor does not match the requested sort order")
+    return values
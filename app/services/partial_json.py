@@ -0,0 +1,158 @@
+import json
+from typing import Any, List, NamedTuple, Optional
+
+
+class FieldEvent(NamedTuple):
+    field: str
+    index: Optional[int]  # position within an array field, None for scalar fields
+    value: Any
+
+
+class PartialObjectParser:
+    """Incrementally parses a streamed JSON object, reporting each top-level field once it is complete.
+
+    Array fields are reported element by element, so a list of ingredients or steps shows up
+    as soon as each entry closes. Malformed input simply stops producing events; the caller
+    validates the full document once the stream ends.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.key: Optional[str] = None
+        self.index = 0
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk: str) -> List[FieldEvent]:
+        self.buffer += chunk
+        events: List[FieldEvent] = []
+        while self.state != "done":
+            self._skip_whitespace()
+            if self.pos >= len(self.buffer):
+                break
+            char = self.buffer[self.pos]
+
+            if self.state == "start":
+                if char != "{":
+                    self.state = "done"
+                    break
+                self.pos += 1
+                self.state = "key"
+            elif self.state == "key":
+                if char == "}":
+                    self.pos += 1
+                    self.state = "done"
+                elif char == ",":
+                    self.pos += 1
+                else:
+                    key = self._decode()
+                    if key is None:
+                        break
+                    self.key = key
+                    self.state = "colon"
+            elif self.state == "colon":
+                if char != ":":
+                    self.state = "done"
+                    break
+                self.pos += 1
+                self.state = "value"
+            elif self.state == "value":
+                if char == "[":
+                    self.pos += 1
+                    self.index = 0
+                    self.state = "array"
+                else:
+                    value = self._decode()
+                    if value is None:
+                        break
+                    events.append(FieldEvent(self.key, None, value))
+                    self.state = "key"
+            elif self.state == "array":
+                if char == "]":
+                    self.pos += 1
+                    self.state = "key"
+                elif char == ",":
+                    self.pos += 1
+                else:
+                    value = self._decode()
+                    if value is None:
+                        break
+                    events.append(FieldEvent(self.key, self.index, value))
+                    self.index += 1
+        return events
+
+    def _skip_whitespace(self) -> None:
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+            self.pos += 1
+
+    def _decode(self) -> Optional[Any]:
+        """Decode the value at pos if it is complete; None means wait for more input."""
+        try:
+            value, end = self._decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            return None
+        # Numbers and literals have no closing delimiter: "4" may still become "45"
+        if end >= len(self.buffer) and self.buffer[self.pos] not in "\"[{":
+            return None
+        self.pos = end
+        return value
+
+
+class PartialArrayParser:
+    """Incrementally parses a streamed top-level JSON array, returning each element once it is complete.
+
+    Consumed input is dropped as it goes, so memory is bounded by the largest element
+    rather than the whole document. Malformed input raises ValueError. The source length of
+    each element returned by the last feed is kept in item_sizes.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.item_sizes: List[int] = []
+        self.state = "start"
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk: str) -> List[Any]:
+        self.buffer += chunk
+        items: List[Any] = []
+        self.item_sizes = []
+        pos = 0
+        while self.state != "done":
+            while pos < len(self.buffer) and self.buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos >= len(self.buffer):
+                break
+            char = self.buffer[pos]
+
+            if self.state == "start":
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                pos += 1
+                self.state = "first"
+            elif char == "]" and self.state in ("first", "separator"):
+                pos += 1
+                self.state = "done"
+            elif self.state == "separator":
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' but found {char!r}")
+                pos += 1
+                self.state = "item"
+            else:
+                try:
+                    value, end = self._decoder.raw_decode(self.buffer, pos)
+                except json.JSONDecodeError:
+                    break  # incomplete element, wait for more input
+                # Numbers and literals have no closing delimiter: "4" may still become "45"
+                if end >= len(self.buffer) and char not in "\"[{":
+                    break
+                items.append(value)
+                self.item_sizes.append(end - pos)
+                pos = end
+                self.state = "separator"
+        self.buffer = self.buffer[pos:]
+        return items
+
+    def close(self) -> None:
+        if self.state != "done":
+            raise ValueError("Unexpected end of JSON array")
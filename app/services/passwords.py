@@ -0,0 +1,85 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Optional, Tuple
+from fastapi import HTTPException, status
+from app.database import settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+class PasswordHasher:
+    """bcrypt on a dedicated, bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so threads run in parallel without the
+    process-pool start-up cost (and /dev/shm, which Lambda lacks). At most max_pending
+    jobs may be queued or running; callers beyond that are turned away with a 503
+    instead of piling up behind the pool.
+    """
+
+    def __init__(self, rounds: int, workers: int, max_pending: int):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._context: Optional["CryptContext"] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def context(self) -> "CryptContext":
+        # passlib/bcrypt are only needed by register and login, so load them on first use
+        if self._context is None:
+            from passlib.context import CryptContext
+            # Hashes below the configured cost are upgraded on login; stronger ones are left alone
+            self._context = CryptContext(
+                schemes=["bcrypt"],
+                deprecated="auto",
+                bcrypt__default_rounds=self.rounds,
+                bcrypt__min_rounds=self.rounds,
+                bcrypt__max_rounds=31,
+            )
+        return self._context
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in requests, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Return whether the password matches and, if its hash is outdated, a replacement hash."""
+        return await self._run(self.context.verify_and_update, password, password_hash)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_hasher: Optional[PasswordHasher] = None
+
+def get_password_hasher() -> PasswordHasher:
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(
+            rounds=settings.BCRYPT_ROUNDS,
+            workers=settings.PASSWORD_HASH_WORKERS,
+            max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+        )
+    return _hasher
@@ -0,0 +1,245 @@
+"""Development and CI diagnostics for SQL: N+1 detection, a slow-query log with plans, and query budgets.
+
+Statements are grouped by shape (the SQL with literals, parameters and IN lists blanked out)
+within each request. A shape executed more than the repeat threshold in one request is
+reported as a likely N+1, with the route and the app code that issued it; a statement
+slower than the slow-query threshold is logged with its EXPLAIN plan. Both are logged as
+warnings on this module's logger. Walking the stack for a call site is slow, so it is only
+done for statements that get reported.
+"""
+import asyncio
+import logging
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_SQL = 500  # characters of a statement shape in N+1 warnings and budget failures
+_APP_DIR = Path(__file__).resolve().parent.parent
+_PROJECT_ROOT = str(_APP_DIR.parent)
+# None of these issue statements of their own: the session adapters and the middlewares around every request
+_SKIPPED_FILES = tuple(str(_APP_DIR / name) for name in ("database.py", "services/metrics.py", "services/query_diagnostics.py"))
+
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_REPEATED_GROUP = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """The statement with every value replaced by ?, so executions differing only in values compare equal."""
+    shape = _STRING.sub("?", statement)
+    shape = _PARAMETER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _VALUE_LIST.sub("(?, ...)", shape)
+    shape = _REPEATED_GROUP.sub(r"\1, ...", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _truncated(sql: str) -> str:
+    return sql if len(sql) <= MAX_LOGGED_SQL else sql[:MAX_LOGGED_SQL] + "..."
+
+
+def _coroutine_frames(awaitable: Any) -> List[Any]:
+    # A suspended task's frames aren't linked by f_back; follow what each coroutine awaits instead
+    frames = []
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(awaitable, "ag_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) or getattr(awaitable, "ag_await", None)
+    return frames[::-1]
+
+
+def _caller_frames(task: Any = None) -> Iterator[Any]:
+    """The frames that led to the current statement, innermost first.
+
+    Under asyncio, SQLAlchemy runs the statement in a greenlet whose stack ends at
+    greenlet_spawn; the rest is on the parent greenlet. Under the sync driver, the statement
+    runs on a threadpool thread and the rest is the request's task, suspended on it.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+    greenlet = sys.modules.get("greenlet")
+    parent = greenlet.getcurrent().parent if greenlet is not None else None
+    if parent is not None and parent.gr_frame is not None:
+        frame = parent.gr_frame
+        while frame is not None:
+            yield frame
+            frame = frame.f_back
+    elif task is not None and not task.done():
+        yield from _coroutine_frames(task.get_coro())
+
+
+def call_site(task: Any = None) -> str:
+    """The innermost line of project code behind the current statement, e.g. "app/routers/recipes.py:120 in list_recipes"."""
+    for frame in _caller_frames(task):
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_ROOT) and filename not in _SKIPPED_FILES and "site-packages" not in filename:
+            return f"{filename[len(_PROJECT_ROOT) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}"
+    return "unknown"
+
+
+class ShapeStats:
+    __slots__ = ("count", "seconds", "call_site")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.call_site: Optional[str] = None
+
+
+class RequestQueries:
+    """Statements of one request, by shape."""
+
+    def __init__(self, scope: Dict[str, Any], repeat_threshold: int, task: Any = None):
+        self.scope = scope
+        self.repeat_threshold = repeat_threshold
+        self.task = task
+        self.shapes: Dict[str, ShapeStats] = {}
+
+    @property
+    def route(self) -> str:
+        # Set by the router once the request is matched
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {route.path if route is not None else self.scope['path']}"
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        stats = self.shapes.get(shape)
+        if stats is None:
+            stats = self.shapes[shape] = ShapeStats()
+        stats.count += 1
+        stats.seconds += seconds
+        # Where the repeats start, so the reported site is the loop rather than a first, legitimate query
+        if stats.count == self.repeat_threshold + 1:
+            stats.call_site = call_site(self.task)
+
+    def report(self) -> None:
+        for shape, stats in self.shapes.items():
+            if stats.count > self.repeat_threshold:
+                logger.warning(
+                    "Likely N+1 in %s: %d executions of one statement (%.1f ms) at %s: %s",
+                    self.route, stats.count, stats.seconds * 1000, stats.call_site, _truncated(shape)
+                )
+
+
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def _explain(conn: Any, statement: str, parameters: Any) -> Optional[str]:
+    """The plan of a statement from a separate cursor, inside a savepoint so a failed EXPLAIN can't abort the transaction."""
+    if conn.dialect.name != "postgresql" or not _EXPLAINABLE.match(statement):
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT query_diagnostics")
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT query_diagnostics")
+            raise
+        cursor.execute("RELEASE SAVEPOINT query_diagnostics")
+        return plan
+    except Exception as exc:
+        return f"(EXPLAIN failed: {exc})"
+    finally:
+        cursor.close()
+
+
+def instrument(engine: Engine, slow_query_seconds: float) -> None:
+    """Group this engine's statements by request and log those slower than slow_query_seconds with their plans."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._diagnostics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._diagnostics_started
+        queries = _request_queries.get()
+        # Batches of an executemany (e.g. chunked bulk inserts) are what an N+1 should be turned into
+        if queries is not None and not executemany:
+            queries.record(statement, elapsed)
+        if elapsed >= slow_query_seconds:
+            # A server-side cursor is still open on the connection, and executemany has no single plan
+            plan = None if executemany or context._is_server_side else _explain(conn, statement, parameters)
+            logger.warning(
+                "Slow query (%.1f ms) in %s at %s: %s\n%s",
+                elapsed * 1000, queries.route if queries is not None else "background work",
+                call_site(queries.task if queries is not None else None), statement, plan or "(no plan)"
+            )
+
+
+class QueryDiagnosticsMiddleware:
+    """Pure ASGI middleware collecting each request's statements and warning about likely N+1s when it ends."""
+
+    def __init__(self, app: Any, repeat_threshold: int):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope, self.repeat_threshold, asyncio.current_task())
+        token = _request_queries.set(queries)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_queries.reset(token)
+            queries.report()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, engine: Any = None) -> Iterator[List[str]]:
+    """Fail with QueryBudgetExceeded if more than max_queries statements run on the engine inside the block.
+
+    Works whether or not QUERY_DIAGNOSTICS is on, and counts statements from any thread, so
+    requests made through a TestClient are included. Yields the executed statements.
+
+        for limit in (1, 20, 100):
+            with assert_max_queries(3):
+                client.get(f"/api/recipes?limit={limit}")
+    """
+    if engine is None:
+        from app.database import get_engine
+        engine = get_engine()
+    engine = getattr(engine, "sync_engine", engine)
+    statements: List[str] = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "after_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "after_cursor_execute", count)
+    if len(statements) > max_queries:
+        shapes: Dict[str, int] = {}
+        for statement in statements:
+            shape = statement_shape(statement)
+            shapes[shape] = shapes.get(shape, 0) + 1
+        listing = "\n".join(f"  {count} x {_truncated(shape)}" for shape, count in shapes.items())
+        raise QueryBudgetExceeded(f"{len(statements)} queries, budget {max_queries}:\n{listing}")
@@ -0,0 +1,193 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from app.database import settings
+from app.models import UserType
+from app.services.cache import InMemoryLRUCache, shared_store_url
+
+
+class RateLimitStore(ABC):
+    """Atomic primitives the limiter needs, shared by the in-process and external stores."""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int, cost: int) -> float:
+        """Take cost tokens from the bucket at key; return 0 on success, else seconds until they would be available.
+
+        A cost above burst waits for a full bucket and leaves it in debt, so it is paid off
+        at the same rate as any other request.
+        """
+
+    @abstractmethod
+    async def add(self, key: str, amount: int, ttl: int) -> None:
+        pass
+
+    @abstractmethod
+    async def get_many(self, *keys: str) -> List[int]:
+        pass
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Per-process state; each Lambda instance enforces the limits on its own."""
+
+    def __init__(self, max_entries: int):
+        self.entries = InMemoryLRUCache(max_entries)
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int, cost: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self.entries.get(key) or (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            needed = min(cost, burst)
+            wait = 0.0
+            if tokens >= needed:
+                tokens -= cost
+            else:
+                wait = (needed - tokens) / rate
+            # Kept until it has refilled, debt included
+            self.entries.set(key, (tokens, now), ttl=math.ceil((burst - tokens) / rate) + 1)
+        return wait
+
+    async def add(self, key: str, amount: int, ttl: int) -> None:
+        with self._lock:
+            self.entries.set(key, (self.entries.get(key) or 0) + amount, ttl=ttl)
+
+    async def get_many(self, *keys: str) -> List[int]:
+        return [self.entries.get(key) or 0 for key in keys]
+
+
+# Refill and take in one round trip so concurrent instances can't both spend the last token
+_TAKE_SCRIPT = """
+local rate, burst, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local needed = math.min(cost, burst)
+local wait = 0
+if tokens >= needed then tokens = tokens - cost else wait = (needed - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+return tostring(wait)
+"""
+
+
+class KeyValueRateLimitStore(RateLimitStore):
+    """State shared by all instances in an external Redis-compatible store."""
+
+    def __init__(self, client: Any, prefix: str = "recipehub:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, rate: float, burst: int, cost: int) -> float:
+        wait = await self.client.eval(_TAKE_SCRIPT, 1, self.prefix + key, rate, burst, cost, time.time())
+        return float(wait)
+
+    async def add(self, key: str, amount: int, ttl: int) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.incrby(self.prefix + key, amount)
+            pipe.expire(self.prefix + key, ttl)
+            await pipe.execute()
+
+    async def get_many(self, *keys: str) -> List[int]:
+        values = await self.client.mget([self.prefix + key for key in keys])
+        return [int(value or 0) for value in values]
+
+    @classmethod
+    def from_url(cls, url: str) -> "KeyValueRateLimitStore":
+        import redis.asyncio  # optional dependency, only needed with the redis backend
+
+        return cls(redis.asyncio.Redis.from_url(url))
+
+
+class AIRateLimiter:
+    """Per-user request bucket plus a rolling OpenAI token budget that depends on the user type.
+
+    Token usage is added to a counter for the current fixed window when a request is
+    recorded. The rolling total is the current window plus the part of the previous one
+    still inside the sliding window, so a check is two counter reads rather than a SUM over ai_requests.
+    """
+
+    def __init__(self, store: RateLimitStore, rate: float, burst: int, window: int, budgets: Dict[UserType, int]):
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.budgets = budgets
+
+    def _window_keys(self, user_id: int, now: float) -> Tuple[str, str, float]:
+        index, elapsed = divmod(now, self.window)
+        return f"budget:{user_id}:{int(index)}", f"budget:{user_id}:{int(index) - 1}", elapsed
+
+    async def budget_retry_after(self, user_id: int, user_type: UserType, now: float) -> float:
+        """Seconds until the user's rolling usage drops below their budget; 0 if it already is."""
+        budget = self.budgets.get(user_type, 0)
+        if budget <= 0:
+            return 0
+        current_key, previous_key, elapsed = self._window_keys(user_id, now)
+        current, previous = await self.store.get_many(current_key, previous_key)
+        if current + previous * (1 - elapsed / self.window) < budget:
+            return 0
+        if current >= budget:
+            # Not before the window rolls over and enough of it has slid out
+            return (self.window - elapsed) + self.window * (1 - budget / current)
+        return self.window * (1 - (budget - current) / previous) - elapsed
+
+    async def check(self, user: Any, cost: int = 1) -> None:
+        """Raise a 429 if user may not start cost more generations right now."""
+        user_type = UserType(user.user_type)
+        retry_after = await self.budget_retry_after(user.id, user_type, time.time())
+        if retry_after > 0:
+            raise rate_limit_exception("AI token budget exhausted", retry_after)
+        
+        if self.rate > 0:
+            # A batch is charged per item, even beyond the burst: the bucket then goes into debt
+            retry_after = await self.store.take(f"bucket:{user.id}", self.rate, self.burst, cost)
+            if retry_after > 0:
+                raise rate_limit_exception("Too many AI requests", retry_after)
+
+    async def charge(self, user_id: int, usage: Optional[Any]) -> None:
+        if usage is None:
+            return
+        tokens = (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+        if tokens:
+            current_key, _, _ = self._window_keys(user_id, time.time())
+            # Kept for two windows: it is the previous window's count for the whole next one
+            await self.store.add(current_key, tokens, ttl=2 * self.window)
+
+
+def rate_limit_exception(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+_limiter: Optional[AIRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_ai_rate_limiter() -> AIRateLimiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                url = shared_store_url()
+                if url:
+                    store: RateLimitStore = KeyValueRateLimitStore.from_url(url)
+                else:
+                    store = InMemoryRateLimitStore(settings.AI_RATE_LIMIT_MAX_KEYS)
+                _limiter = AIRateLimiter(
+                    store,
+                    rate=settings.AI_REQUESTS_PER_SECOND,
+                    burst=settings.AI_REQUEST_BURST,
+                    window=settings.AI_TOKEN_BUDGET_WINDOW_SECONDS,
+                    budgets={
+                        UserType.REGULAR: settings.AI_TOKEN_BUDGET_REGULAR,
+                        UserType.CHEF: settings.AI_TOKEN_BUDGET_CHEF,
+                    },
+                )
+    return _limiter
@@ -0,0 +1,52 @@
+from decimal import Decimal
+from typing import NamedTuple, Optional
+from sqlalchemy import Numeric, case, cast, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Recipe, Rating
+
+
+class RatingResult(NamedTuple):
+    avg_rating: Decimal
+    is_public: bool
+
+
+async def upsert_rating(db: AsyncSession, recipe_id: int, user_id: int, rating: int) -> Optional[RatingResult]:
+    """Store a user's rating and adjust the recipe's aggregates; returns None if the recipe does not exist."""
+    # Serialize raters of this recipe so the previous-rating read below can't go stale
+    locked = (await db.execute(
+        select(Recipe.id, Recipe.is_public).where(Recipe.id == recipe_id).with_for_update()
+    )).first()
+    if locked is None:
+        return None
+
+    upserted = (
+        insert(Rating)
+        .values(user_id=user_id, recipe_id=recipe_id, rating=rating)
+        .on_conflict_do_update(constraint="uq_ratings_user_recipe", set_={"rating": rating})
+        .returning(Rating.recipe_id)
+        .cte("upserted")
+    )
+    # Evaluated against the statement snapshot, i.e. before the upsert above
+    previous = (
+        select(Rating.rating)
+        .where(Rating.user_id == user_id, Rating.recipe_id == recipe_id)
+        .scalar_subquery()
+    )
+    rating_count = Recipe.rating_count + case((previous.is_(None), 1), else_=0)
+    rating_sum = Recipe.rating_sum + rating - func.coalesce(previous, 0)
+
+    avg_rating = (await db.execute(
+        update(Recipe)
+        .where(Recipe.id == select(upserted.c.recipe_id).scalar_subquery())
+        .values(
+            rating_count=rating_count,
+            rating_sum=rating_sum,
+            avg_rating=cast(rating_sum, Numeric) / rating_count
+        )
+        .returning(Recipe.avg_rating)
+        .execution_options(synchronize_session=False)
+    )).scalar_one()
+    await db.commit()
+
+    return RatingResult(avg_rating=avg_rating, is_public=bool(locked.is_public))
@@ -1,33 +1,89 @@
-from typing import List, Optional
+import hashlib
+import json
+import math
+import threading
+import time
+from typing import Any, AsyncIterator, List, NamedTuple, Optional, Tuple
+import anyio
+from app.database import settings
 from app.services.openai import get_openai_client
-from app.models import AIRequest
-from sqlalchemy.orm import Session
+from app.services.cache import CacheBackend, create_cache, get_or_load
+from app.services.rate_limit import get_ai_rate_limiter
+from app.services.metrics import openai_first_token, record_openai_call
+from app.models import AIRequest, RecipeCreate
+from sqlalchemy.ext.asyncio import AsyncSession
 
+MODEL = "gpt-4o-mini"
+# Rough size of a token in English and JSON, for streams cut off before OpenAI reports their usage
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators of each chat message
 
-def generate_recipe_with_ai(
-    ingredients: List[str],
-    diet: Optional[str],
-    cuisine: Optional[str],
-    max_time_minutes: int,
-    difficulty: str,
-    servings: int,
-    user_id: int,
-    db: Session
-) -> dict:
-    client = get_openai_client()
+
+class GenerationRequest(NamedTuple):
+    """A generation request reduced to what changes the prompt, so equivalent requests compare equal."""
+    ingredients: Tuple[str, ...]
+    diet: Optional[str]
+    cuisine: Optional[str]
+    max_time_minutes: int
+    difficulty: str
+    servings: int
+    
+    @classmethod
+    def canonical(
+        cls,
+        ingredients: List[str],
+        diet: Optional[str],
+        cuisine: Optional[str],
+        max_time_minutes: int,
+        difficulty: str,
+        servings: int
+    ) -> "GenerationRequest":
+        def clean(value: Optional[str]) -> Optional[str]:
+            value = " ".join((value or "").split()).casefold()
+            return value or None
     
-    ingredients_str = ", ".join(ingredients)
+        return cls(
+            ingredients=tuple(sorted({item for item in map(clean, ingredients) if item})),
+            diet=clean(diet),
+            cuisine=clean(cuisine),
+            max_time_minutes=max_time_minutes,
+            difficulty=(clean(difficulty) or "easy").title(),
+            servings=servings,
+        )
+    
+    def cache_key(self) -> str:
+        # The model is part of the key so switching models never serves stale output
+        digest = hashlib.sha256(json.dumps([MODEL, *self]).encode()).hexdigest()
+        return f"ai:generate:{digest}"
+
+
+_generation_cache: Optional[CacheBackend] = None
+_generation_cache_lock = threading.Lock()
+
+def get_generation_cache() -> CacheBackend:
+    global _generation_cache
+    if _generation_cache is None:
+        with _generation_cache_lock:
+            if _generation_cache is None:
+                _generation_cache = create_cache(
+                    settings.AI_CACHE_MAX_ENTRIES, settings.AI_CACHE_TTL_SECONDS, namespace="ai:"
+                )
+    return _generation_cache
+
+
+def build_prompt(request: GenerationRequest) -> str:
+    ingredients_str = ", ".join(request.ingredients)
     
     prompt = f"""Create a detailed recipe with the following requirements:
 - Ingredients: {ingredients_str}
-- Servings: {servings}
-- Maximum time: {max_time_minutes} minutes
-- Difficulty: {difficulty}"""
+- Servings: {request.servings}
+- Maximum time: {request.max_time_minutes} minutes
+- Difficulty: {request.difficulty}"""
     
-    if diet:
-        prompt += f"\n- Dietary preference: {diet}"
-    if cuisine:
-        prompt += f"\n- Cuisine style: {cuisine}"
+    if request.diet:
+        prompt += f"\n- Dietary preference: {request.diet}"
+    if request.cuisine:
+        prompt += f"\n- Cuisine style: {request.cuisine}"
     
     prompt += """
 
@@ -43,32 +99,178 @@ Please provide the recipe in the following JSON format:
 }
 
 Make sure the recipe uses the provided ingredients and follows all the constraints."""
+    return prompt
+
+
+def chat_messages(request: GenerationRequest) -> List[dict]:
+    return [
+        {"role": "system", "content": "You are a professional chef. Create detailed, accurate recipes in JSON format."},
+        {"role": "user", "content": build_prompt(request)}
+    ]
+
+
+def parse_recipe(content: str) -> dict:
+    """The model's JSON checked against RecipeCreate; raises ValueError when it is not a usable recipe."""
+    # pydantic's ValidationError is a ValueError, also for content that is not JSON at all
+    recipe = RecipeCreate.model_validate_json(content)
+    return {**recipe.model_dump(exclude={"is_public"}), "tags": recipe.tags or []}
+
+
+class GenerationFailed(Exception):
+    """A generation that produced no recipe; usage is what the failed call cost, if OpenAI answered at all."""
+    
+    def __init__(self, message: str, usage: Optional[Any] = None):
+        super().__init__(message)
+        self.usage = usage
+
+
+class EstimatedUsage(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+
+
+def build_ai_request(user_id: int, usage: Optional[Any], cache_hit: bool = False) -> AIRequest:
+    """Usage is None for cache hits (no tokens spent) and for failed calls (unknown)."""
+    return AIRequest(
+        user_id=user_id,
+        model=MODEL,
+        prompt_tokens=usage.prompt_tokens if usage else (0 if cache_hit else None),
+        completion_tokens=usage.completion_tokens if usage else (0 if cache_hit else None),
+        cache_hit=cache_hit
+    )
+
 
+async def record_ai_request(db: AsyncSession, user_id: int, usage: Optional[Any], cache_hit: bool = False) -> None:
+    db.add(build_ai_request(user_id, usage, cache_hit))
+    await db.commit()
+    await get_ai_rate_limiter().charge(user_id, usage)
+
+
+class StreamedGeneration:
+    """One streamed completion: iterate deltas(), then read content and usage."""
+    
+    def __init__(self, request: GenerationRequest):
+        self.request = request
+        self.parts: List[str] = []
+        self.usage: Optional[Any] = None
+        self.opened = False
+    
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+    
+    def usage_or_estimate(self) -> Optional[Any]:
+        """The reported usage, or for a stream stopped before the final usage chunk, an estimate of what it cost.
+
+        None if the model was never reached.
+        """
+        if self.usage is not None:
+            return self.usage
+        if not self.opened:
+            return None
+        messages = chat_messages(self.request)
+        prompt_tokens = sum(math.ceil(len(message["content"]) / CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+        return EstimatedUsage(prompt_tokens, math.ceil(len(self.content) / CHARS_PER_TOKEN))
+    
+    async def deltas(self) -> AsyncIterator[str]:
+        client = get_openai_client()
+        start = time.perf_counter()
+        try:
+            stream = await client.chat.completions.create(
+                model=MODEL,
+                messages=chat_messages(self.request),
+                temperature=0.7,
+                response_format={"type": "json_object"},
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        except Exception:
+            record_openai_call(MODEL, "stream", time.perf_counter() - start, None, outcome="error")
+            raise
+        self.opened = True
+        outcome = "aborted"
+        try:
+            async for chunk in stream:
+                if chunk.usage:
+                    # Sent as a final chunk with no choices
+                    self.usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not self.parts:
+                        openai_first_token.observe((MODEL,), time.perf_counter() - start)
+                    self.parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            outcome = "ok"
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            # Closing the HTTP stream stops generation (and billing) when the client went away
+            with anyio.CancelScope(shield=True):
+                await stream.close()
+            record_openai_call(MODEL, "stream", time.perf_counter() - start, self.usage, outcome=outcome)
+
+
+async def fetch_generation(request: GenerationRequest, fresh: bool = False) -> Tuple[dict, Optional[Any]]:
+    """Return (recipe_data, usage) without touching the database; usage is None when served from the cache.
+
+    Raises GenerationFailed, carrying the usage of a completion that came back unusable.
+    """
+    cache_key = request.cache_key()
+    cache = get_generation_cache()
+    usage = None
+    
+    async def complete() -> Tuple[dict, bool]:
+        nonlocal usage
+        client = get_openai_client()
+        start = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(
+                model=MODEL,
+                messages=chat_messages(request),
+                temperature=0.7,
+                response_format={"type": "json_object"}
+            )
+        except Exception:
+            record_openai_call(MODEL, "complete", time.perf_counter() - start, None, outcome="error")
+            raise
+        usage = response.usage
+        record_openai_call(MODEL, "complete", time.perf_counter() - start, usage)
+        # Raising here keeps an unusable completion out of the cache
+        return parse_recipe(response.choices[0].message.content), True
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a professional chef. Create detailed, accurate recipes in JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            response_format={"type": "json_object"}
-        )
-        
-        import json
-        recipe_data = json.loads(response.choices[0].message.content)
-        
-        ai_request = AIRequest(
-            user_id=user_id,
-            model="gpt-4o-mini",
-            prompt_tokens=response.usage.prompt_tokens,
-            completion_tokens=response.usage.completion_tokens
-        )
-        db.add(ai_request)
-        db.commit()
-        
-        return recipe_data
+        if fresh:
+            recipe_data, _ = await complete()
+            await cache.set(cache_key, recipe_data)
+        else:
+            # Identical requests that arrive together share a single completion
+            recipe_data = await get_or_load(cache_key, complete, cache=cache)
     except Exception as e:
-        raise ValueError(f"Failed to generate recipe: {str(e)}")
+        # usage is only set for the caller whose completion ran, so a shared failure is charged once
+        raise GenerationFailed(str(e), usage) from e
+    return recipe_data, usage
 
 
+async def generate_recipe_with_ai(
+    ingredients: List[str],
+    diet: Optional[str],
+    cuisine: Optional[str],
+    max_time_minutes: int,
+    difficulty: str,
+    servings: int,
+    user_id: int,
+    db: AsyncSession,
+    fresh: bool = False
+) -> dict:
+    """Generate a recipe, reusing a cached result for an equivalent request unless fresh is set."""
+    request = GenerationRequest.canonical(ingredients, diet, cuisine, max_time_minutes, difficulty, servings)
+    try:
+        try:
+            recipe_data, usage = await fetch_generation(request, fresh)
+        except GenerationFailed as e:
+            await record_ai_request(db, user_id, e.usage)
+            raise
+        await record_ai_request(db, user_id, usage, cache_hit=usage is None)
+        return recipe_data
+    except Exception as e:
+        raise ValueError(f"Failed to generate recipe: {str(e)}")
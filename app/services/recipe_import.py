@@ -0,0 +1,134 @@
+import codecs
+from typing import Any, AsyncIterator, List, Mapping, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Recipe, RecipeCreate, RecipeImportError, RecipeImportResponse
+from app.services.ingredients import ingredient_columns, ingredient_frequencies
+from app.services.partial_json import PartialArrayParser
+
+# Counts stay exact; only the first errors are reported individually
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportTooLarge(ValueError):
+    pass
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, raw line) for each non-blank line of a streamed NDJSON body."""
+    pending = b""
+    line_number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                raise ImportTooLarge(f"Line {line_number} is longer than {max_line_bytes} bytes")
+            if line.strip():
+                yield line_number, line
+        if len(pending) > max_line_bytes:
+            raise ImportTooLarge(f"Line {line_number + 1} is longer than {max_line_bytes} bytes")
+    if pending.strip():
+        yield line_number + 1, pending
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], max_item_bytes: int) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (position, decoded element) for each element of a streamed JSON array body."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parser = PartialArrayParser()
+    position = 0
+
+    def checked(items):
+        nonlocal position
+        for item, size in zip(items, parser.item_sizes):
+            position += 1
+            if size > max_item_bytes:
+                raise ImportTooLarge(f"Item {position} is larger than {max_item_bytes} bytes")
+            yield position, item
+
+    async for chunk in chunks:
+        for numbered in checked(parser.feed(decoder.decode(chunk))):
+            yield numbered
+        if len(parser.buffer) > max_item_bytes:
+            raise ImportTooLarge(f"Item {position + 1} is larger than {max_item_bytes} bytes")
+    for numbered in checked(parser.feed(decoder.decode(b"", final=True))):
+        yield numbered
+    parser.close()
+
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" if detail["loc"] else detail["msg"]
+        for detail in error.errors()
+    )
+
+
+class RecipeImporter:
+    """Validates recipes one at a time and inserts them in multi-row batches.
+
+    Nothing is committed here; the caller commits once the whole upload has been read,
+    so a malformed stream or database error leaves no partial import behind.
+    """
+
+    def __init__(self, db: AsyncSession, user_id: int, allow_public: bool, chunk_size: int):
+        self.db = db
+        self.user_id = user_id
+        self.allow_public = allow_public
+        self.chunk_size = chunk_size
+        self.rows: List[dict] = []
+        self.imported = 0
+        self.public_imported = 0
+        self.failed = 0
+        self.errors: List[RecipeImportError] = []
+        # Core INSERTs skip the mapper events that fill the ingredient columns, so add() does it
+        self.frequencies: Mapping[str, float] = {}
+
+    async def add(self, line: int, raw: Any) -> None:
+        try:
+            if isinstance(raw, bytes):
+                recipe = RecipeCreate.model_validate_json(raw)
+            else:
+                recipe = RecipeCreate.model_validate(raw)
+        except ValidationError as e:
+            self.failed += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append(RecipeImportError(line=line, detail=describe_validation_error(e)))
+            return
+
+        # Same visibility rule as create_recipe
+        is_public = recipe.is_public and self.allow_public
+        ingredient_tokens, ingredient_signature = ingredient_columns(recipe.ingredients, self.frequencies)
+        self.rows.append({
+            "user_id": self.user_id,
+            "title": recipe.title,
+            "description": recipe.description,
+            "ingredients": recipe.ingredients,
+            "steps": recipe.steps,
+            "time_minutes": recipe.time_minutes,
+            "difficulty": recipe.difficulty,
+            "tags": recipe.tags or [],
+            "source": "import",
+            "is_public": is_public,
+            "ingredient_tokens": ingredient_tokens,
+            "ingredient_signature": ingredient_signature
+        })
+        if len(self.rows) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.rows:
+            return
+        # One executemany per chunk; the driver batches it into multi-row INSERTs
+        await self.db.execute(insert(Recipe), self.rows)
+        self.public_imported += sum(1 for row in self.rows if row["is_public"])
+        self.imported += len(self.rows)
+        self.rows = []
+
+    async def run(self, items: AsyncIterator[Tuple[int, Any]]) -> RecipeImportResponse:
+        self.frequencies = await ingredient_frequencies.get(self.db)
+        async for line, raw in items:
+            await self.add(line, raw)
+        await self.flush()
+        return RecipeImportResponse(imported=self.imported, failed=self.failed, errors=self.errors)
@@ -0,0 +1,397 @@
+import io
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.database import DbSession, create_session, settings
+from app.models import Recipe, RecipeSimilarity, SimilarityModelSnapshot
+from app.services.ingredients import PUBLICLY_VISIBLE, STAPLES, normalize_ingredients
+
+# NumPy and SciPy are only imported by the batch jobs, never on the request path
+if TYPE_CHECKING:
+    import numpy as np
+    from scipy import sparse
+
+# Fold-ins re-read this much history before the watermark: updated_at is the writing
+# transaction's start time, so a slow transaction can commit rows dated in the past
+REFRESH_OVERLAP = timedelta(minutes=5)
+# A feature shared by this many recipes is never considered too common, whatever max_df says
+MAX_DF_FLOOR = 50
+# Source rows per sparse product when computing neighbours
+NEIGHBOUR_BATCH_SIZE = 1000
+LOAD_BATCH_SIZE = 2000
+WRITE_BATCH_SIZE = 5000
+# Key of the advisory lock that keeps rebuilds and fold-ins from overlapping
+LOCK_KEY = (23024, 0)
+SNAPSHOT_ID = 1
+
+RecipeFeatures = Tuple[int, List[str]]
+
+
+def recipe_features(ingredients: Iterable[str], tags: Optional[Iterable[str]]) -> List[str]:
+    """Ingredient tokens and tags of a recipe, prefixed so the two never collide."""
+    features = [f"i:{token}" for token in normalize_ingredients(ingredients) - STAPLES]
+    features.extend(sorted({f"t:{tag.strip().lower()}" for tag in tags or () if isinstance(tag, str) and tag.strip()}))
+    return features
+
+
+class SimilarityModel:
+    """TF-IDF vectors of public recipes and each recipe's top-k most similar ones.
+
+    Rows are L2-normalized, so a dot product is the cosine similarity. Features found in
+    more than max_df of the recipes get no weight: they say little about similarity
+    and would make nearly every pair a candidate. Vocabulary and weights are fixed at
+    build time and fold_in vectorizes changed recipes with them, so features first
+    seen after the build are ignored until the next rebuild.
+
+    neighbours holds recipe ids (-1 pads short lists) and scores their similarity,
+    best first.
+    """
+
+    def __init__(
+        self,
+        ids: "np.ndarray",
+        matrix: "sparse.csr_matrix",
+        vocabulary: Dict[str, int],
+        weights: "np.ndarray",
+        neighbours: "np.ndarray",
+        scores: "np.ndarray",
+        watermark: Optional[datetime] = None
+    ):
+        self.ids = ids
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.weights = weights
+        self.neighbours = neighbours
+        self.scores = scores
+        self.watermark = watermark
+
+    @property
+    def top_k(self) -> int:
+        return self.neighbours.shape[1]
+
+    @classmethod
+    def build(
+        cls,
+        recipes: Sequence[RecipeFeatures],
+        top_k: int,
+        max_df: float,
+        tag_weight: float,
+        watermark: Optional[datetime] = None
+    ) -> "SimilarityModel":
+        import numpy as np
+        from scipy import sparse
+
+        vocabulary: Dict[str, int] = {}
+        indices = array("q")
+        indptr = array("q", [0])
+        for _, features in recipes:
+            indices.extend(vocabulary.setdefault(feature, len(vocabulary)) for feature in features)
+            indptr.append(len(indices))
+        indices_np = np.frombuffer(indices, dtype=np.int64).astype(np.int32)
+
+        count = len(recipes)
+        df = np.bincount(indices_np, minlength=len(vocabulary))
+        # Smoothed idf, as in scikit-learn; features shared by fewer than two recipes cannot relate any
+        weights = np.log((1 + count) / (1 + df)) + 1
+        weights[(df < 2) | (df > max(max_df * count, MAX_DF_FLOOR))] = 0
+        is_tag = np.fromiter((feature.startswith("t:") for feature in vocabulary), dtype=bool, count=len(vocabulary))
+        weights[is_tag] *= tag_weight
+
+        binary = sparse.csr_matrix(
+            (np.ones(len(indices_np), dtype=np.float32), indices_np, np.frombuffer(indptr, dtype=np.int64)),
+            shape=(count, len(vocabulary))
+        )
+        model = cls(
+            ids=np.fromiter((recipe_id for recipe_id, _ in recipes), dtype=np.int64, count=count),
+            matrix=cls._weigh(binary, weights),
+            vocabulary=vocabulary,
+            weights=weights.astype(np.float32),
+            neighbours=np.full((count, top_k), -1, dtype=np.int64),
+            scores=np.zeros((count, top_k), dtype=np.float32),
+            watermark=watermark
+        )
+        model._compute_neighbours(np.arange(count))
+        return model
+
+    @staticmethod
+    def _weigh(binary: "sparse.csr_matrix", weights: "np.ndarray") -> "sparse.csr_matrix":
+        import numpy as np
+        from scipy import sparse
+
+        weighted = sparse.csr_matrix(binary, dtype=np.float32, copy=True)
+        weighted.data *= weights[weighted.indices]
+        weighted.eliminate_zeros()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        weighted.data /= np.repeat(norms, np.diff(weighted.indptr)).astype(np.float32)
+        return weighted
+
+    def vectorize(self, feature_lists: Sequence[List[str]]) -> "sparse.csr_matrix":
+        import numpy as np
+        from scipy import sparse
+
+        indices: List[int] = []
+        indptr = [0]
+        for features in feature_lists:
+            indices.extend(self.vocabulary[feature] for feature in features if feature in self.vocabulary)
+            indptr.append(len(indices))
+        binary = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(len(feature_lists), len(self.vocabulary))
+        )
+        return self._weigh(binary, self.weights)
+
+    def _compute_neighbours(self, rows: "np.ndarray") -> None:
+        """Recompute the neighbour lists of the given row positions, a batch of rows per sparse product."""
+        import numpy as np
+
+        transposed = self.matrix.T.tocsr()
+        top_k = self.top_k
+        for start in range(0, len(rows), NEIGHBOUR_BATCH_SIZE):
+            block = rows[start:start + NEIGHBOUR_BATCH_SIZE]
+            product = (self.matrix[block] @ transposed).tocsr()
+            # Each recipe matches itself best; score that 0 so it never makes the list
+            row_of = np.repeat(np.arange(len(block)), np.diff(product.indptr))
+            product.data[product.indices == block[row_of]] = 0
+
+            self.neighbours[block] = -1
+            self.scores[block] = 0
+            for position, row in enumerate(block):
+                begin, end = product.indptr[position], product.indptr[position + 1]
+                columns, data = product.indices[begin:end], product.data[begin:end]
+                if end - begin > top_k:
+                    # Partial selection first: rows can have thousands of candidates
+                    best = np.argpartition(data, -top_k)[-top_k:]
+                    columns, data = columns[best], data[best]
+                # Best first, ties broken by position so results are stable
+                order = np.lexsort((columns, -data))
+                order = order[data[order] > 0]
+                self.neighbours[row, :len(order)] = self.ids[columns[order]]
+                self.scores[row, :len(order)] = data[order]
+
+    def fold_in(self, changed: Sequence[RecipeFeatures], removed: Iterable[int]) -> "np.ndarray":
+        """Apply new, edited and removed recipes; return the ids whose neighbour lists changed.
+
+        Only lists that can change are recomputed: the changed recipes' own, those that
+        listed a changed or removed recipe, and those a changed recipe now beats the
+        last entry of.
+        """
+        import numpy as np
+        from scipy import sparse
+
+        changed_ids = np.array([recipe_id for recipe_id, _ in changed], dtype=np.int64)
+        gone = np.union1d(changed_ids, np.fromiter(removed, dtype=np.int64))
+        kept = ~np.isin(self.ids, gone)
+        stale = np.isin(self.neighbours[kept], gone).any(axis=1)
+
+        added = self.vectorize([features for _, features in changed])
+        self.ids = np.concatenate([self.ids[kept], changed_ids])
+        self.matrix = sparse.vstack([self.matrix[kept], added], format="csr")
+        self.neighbours = np.concatenate([self.neighbours[kept], np.full((len(changed), self.top_k), -1, dtype=np.int64)])
+        self.scores = np.concatenate([self.scores[kept], np.zeros((len(changed), self.top_k), dtype=np.float32)])
+        stale = np.concatenate([stale, np.ones(len(changed), dtype=bool)])
+
+        if len(changed):
+            best = np.asarray((self.matrix @ added.T).max(axis=1).todense()).ravel()
+            stale |= best > self.scores[:, -1]
+
+        rows = np.flatnonzero(stale)
+        self._compute_neighbours(rows)
+        return self.ids[rows]
+
+    def to_bytes(self) -> bytes:
+        import numpy as np
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            ids=self.ids,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+            vocabulary=np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=str),
+            weights=self.weights,
+            neighbours=self.neighbours,
+            scores=self.scores,
+            watermark=np.array(self.watermark.timestamp() if self.watermark else np.nan)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SimilarityModel":
+        import numpy as np
+        from scipy import sparse
+
+        with np.load(io.BytesIO(data)) as saved:
+            watermark = float(saved["watermark"])
+            return cls(
+                ids=saved["ids"],
+                matrix=sparse.csr_matrix((saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"])),
+                vocabulary={feature: index for index, feature in enumerate(saved["vocabulary"].tolist())},
+                weights=saved["weights"],
+                neighbours=saved["neighbours"],
+                scores=saved["scores"],
+                watermark=None if np.isnan(watermark) else datetime.fromtimestamp(watermark, tz=timezone.utc)
+            )
+
+
+async def load_model(db: DbSession) -> Optional[SimilarityModel]:
+    data = (await db.execute(
+        select(SimilarityModelSnapshot.data).where(SimilarityModelSnapshot.id == SNAPSHOT_ID)
+    )).scalar()
+    return SimilarityModel.from_bytes(data) if data is not None else None
+
+
+async def save_model(db: DbSession, model: SimilarityModel) -> None:
+    """Store the model for the next fold-in. The caller commits, together with the lists it produced."""
+    data = model.to_bytes()
+    await db.execute(
+        pg_insert(SimilarityModelSnapshot)
+        .values(id=SNAPSHOT_ID, data=data, saved_at=func.now())
+        .on_conflict_do_update(index_elements=[SimilarityModelSnapshot.id], set_={"data": data, "saved_at": func.now()})
+    )
+
+
+def _latest(watermark: Optional[datetime], updated_at: Optional[datetime]) -> Optional[datetime]:
+    if updated_at is None:
+        return watermark
+    return max(watermark, updated_at) if watermark else updated_at
+
+
+async def load_public_features(db: DbSession) -> Tuple[List[RecipeFeatures], Optional[datetime]]:
+    """Features of every publicly visible recipe, read in batches, and the latest updated_at seen."""
+    recipes: List[RecipeFeatures] = []
+    watermark = None
+    query = (
+        select(Recipe.id, Recipe.ingredients, Recipe.tags, Recipe.updated_at)
+        .join(Recipe.user)
+        .where(PUBLICLY_VISIBLE)
+        .order_by(Recipe.id)
+        .execution_options(yield_per=LOAD_BATCH_SIZE)
+    )
+    result = await db.stream(query)
+    try:
+        async for rows in result.partitions():
+            for recipe_id, ingredients, tags, updated_at in rows:
+                recipes.append((recipe_id, recipe_features(ingredients, tags)))
+                watermark = _latest(watermark, updated_at)
+    finally:
+        await result.close()
+    return recipes, watermark
+
+
+async def load_changes(db: DbSession, model: SimilarityModel) -> Tuple[List[RecipeFeatures], Set[int], Optional[datetime]]:
+    """Recipes changed since the model's watermark: (public ones to fold in, ids to drop, new watermark)."""
+    import numpy as np
+
+    query = select(Recipe.id, Recipe.ingredients, Recipe.tags, Recipe.updated_at, PUBLICLY_VISIBLE).join(Recipe.user)
+    if model.watermark is not None:
+        # updated_at is the writing transaction's start time, so re-read a margin before the watermark
+        query = query.where(Recipe.updated_at > model.watermark - REFRESH_OVERLAP)
+    changed: List[RecipeFeatures] = []
+    removed: Set[int] = set()
+    watermark = model.watermark
+    for recipe_id, ingredients, tags, updated_at, visible in (await db.execute(query)).all():
+        if visible:
+            changed.append((recipe_id, recipe_features(ingredients, tags)))
+        else:
+            removed.add(recipe_id)
+        watermark = _latest(watermark, updated_at)
+
+    # Deleted recipes leave nothing to find by updated_at; diff the visible ids instead
+    visible_ids = np.fromiter(
+        (await db.execute(select(Recipe.id).join(Recipe.user).where(PUBLICLY_VISIBLE))).scalars(), dtype=np.int64
+    )
+    removed.update(model.ids[~np.isin(model.ids, visible_ids)].tolist())
+    return changed, removed, watermark
+
+
+async def write_neighbours(db: DbSession, model: SimilarityModel, recipe_ids: Optional["np.ndarray"] = None) -> int:
+    """Replace the stored neighbour lists of recipe_ids (all of them when None). The caller commits."""
+    import numpy as np
+
+    if recipe_ids is None:
+        await db.execute(delete(RecipeSimilarity))
+        rows = np.arange(len(model.ids))
+    else:
+        for start in range(0, len(recipe_ids), WRITE_BATCH_SIZE):
+            chunk = recipe_ids[start:start + WRITE_BATCH_SIZE].tolist()
+            await db.execute(delete(RecipeSimilarity).where(RecipeSimilarity.recipe_id.in_(chunk)))
+        rows = np.flatnonzero(np.isin(model.ids, recipe_ids))
+
+    # Recipes deleted since they were read would fail the foreign keys
+    existing_ids = np.fromiter((await db.execute(select(Recipe.id))).scalars(), dtype=np.int64)
+    existing = np.zeros(max(existing_ids.max(initial=0), model.ids.max(initial=0)) + 1, dtype=bool)
+    existing[existing_ids] = True
+    written = 0
+    per_batch = max(WRITE_BATCH_SIZE // model.top_k, 1)
+    for start in range(0, len(rows), per_batch):
+        block = rows[start:start + per_batch]
+        sources = np.repeat(model.ids[block], model.top_k)
+        targets = model.neighbours[block].ravel()
+        scores = model.scores[block].ravel()
+        valid = existing[sources] & (targets >= 0) & existing[np.maximum(targets, 0)]
+        batch: List[Dict[str, Any]] = [
+            {"recipe_id": source, "similar_recipe_id": target, "score": score}
+            for source, target, score in zip(
+                sources[valid].tolist(), targets[valid].tolist(), scores[valid].tolist()
+            )
+        ]
+        if batch:
+            await db.execute(insert(RecipeSimilarity), batch)
+            written += len(batch)
+    return written
+
+
+async def rebuild_similarities(db: DbSession, top_k: int, max_df: float, tag_weight: float) -> Tuple[SimilarityModel, int]:
+    """Build the model from scratch, replace every stored neighbour list and save the model; commits."""
+    recipes, watermark = await load_public_features(db)
+    model = SimilarityModel.build(recipes, top_k, max_df, tag_weight, watermark)
+    written = await write_neighbours(db, model)
+    await save_model(db, model)
+    await db.commit()
+    return model, written
+
+
+async def fold_in_similarities(db: DbSession, model: SimilarityModel) -> Tuple[int, int]:
+    """Fold recipes changed since the model's watermark into it, the stored lists and the saved model; commits.
+
+    Returns how many recipes were folded in or dropped, and how many lists were rewritten.
+    """
+    import numpy as np
+
+    changed, removed, watermark = await load_changes(db, model)
+    recipe_ids = model.fold_in(changed, removed)
+    model.watermark = watermark
+    # Dropped recipes are no longer in the model, so this only deletes their lists
+    await write_neighbours(db, model, np.union1d(recipe_ids, np.fromiter(removed, dtype=np.int64)))
+    await save_model(db, model)
+    await db.commit()
+    return len(changed) + len(removed), len(recipe_ids)
+
+
+async def refresh_similarities(rebuild: bool = False) -> Optional[Dict[str, Any]]:
+    """The scheduled job: fold recent changes into the saved model, or rebuild it when asked or when there is none.
+
+    Returns what was done, or None if another run holds the lock.
+    """
+    db = create_session()
+    try:
+        if not (await db.execute(select(func.pg_try_advisory_xact_lock(*LOCK_KEY)))).scalar():
+            await db.rollback()
+            return None
+        start = time.perf_counter()
+        model = None if rebuild else await load_model(db)
+        if model is None:
+            model, written = await rebuild_similarities(
+                db, settings.RECOMMENDATION_TOP_K, settings.RECOMMENDATION_MAX_DF, settings.RECOMMENDATION_TAG_WEIGHT
+            )
+            return {"command": "rebuild", "recipes": len(model.ids), "neighbours": written, "seconds": time.perf_counter() - start}
+        applied, rewritten = await fold_in_similarities(db, model)
+        return {"command": "fold-in", "recipes": applied, "rewritten": rewritten, "seconds": time.perf_counter() - start}
+    finally:
+        await db.close()
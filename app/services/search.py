@@ -0,0 +1,131 @@
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import DDL, Float, Select, cast, event, and_, or_, exists, select, false, func, literal, literal_column, table, column, text
+from sqlalchemy.sql.elements import ColumnElement
+from app.models import Recipe
+
+# Must match the text search configuration used by the search_vector migration
+SEARCH_CONFIG = "english"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize_search(term: str) -> List[str]:
+    return _TOKEN_RE.findall(term.lower())
+
+
+class SearchBackend(ABC):
+    @abstractmethod
+    def apply(self, query: Select, term: str) -> Tuple[Select, ColumnElement]:
+        """Filter query to recipes matching term and return a rank expression (higher is better)."""
+
+    @abstractmethod
+    def tag_condition(self, tag: str) -> ColumnElement:
+        pass
+
+    def no_match(self, query: Select) -> Tuple[Select, ColumnElement]:
+        # A term without words ("-", "'") matches nothing. The rank is cast so ORDER BY sees an
+        # expression: a bare 0 is a column position, and psycopg2 inlines bound values
+        return query.filter(false()), cast(literal(0.0), Float)
+
+    def all_tags_condition(self, tags: List[str]) -> ColumnElement:
+        return and_(*[self.tag_condition(tag) for tag in tags])
+
+    def filter_tags(
+        self,
+        query: Select,
+        all_tags: Optional[List[str]] = None,
+        any_tags: Optional[List[str]] = None
+    ) -> Select:
+        if all_tags:
+            query = query.filter(self.all_tags_condition(all_tags))
+        if any_tags:
+            query = query.filter(or_(*[self.tag_condition(tag) for tag in any_tags]))
+        return query
+
+
+class PostgresSearchBackend(SearchBackend):
+    # Generated tsvector column (title, description, tags, ingredients) backed by a GIN index.
+    # It is not mapped on Recipe so metadata.create_all keeps working on other dialects.
+    search_vector = literal_column("recipes.search_vector")
+
+    def build_tsquery(self, tokens: List[str]) -> str:
+        # Complete words match on their stem; the last word is a prefix for type-ahead
+        parts = list(tokens[:-1]) + [f"{tokens[-1]}:*"]
+        return " & ".join(parts)
+
+    def apply(self, query: Select, term: str) -> Tuple[Select, ColumnElement]:
+        tokens = tokenize_search(term)
+        if not tokens:
+            return self.no_match(query)
+        tsquery = func.to_tsquery(SEARCH_CONFIG, self.build_tsquery(tokens))
+        # ts_rank is float4; widen it so cursor values round-trip exactly on every driver
+        rank = cast(func.ts_rank(self.search_vector, tsquery), Float)
+        return query.filter(self.search_vector.op("@@")(tsquery)), rank
+
+    # Both forms compile to jsonb @> and are answered by the jsonb_path_ops GIN index;
+    # OR-ed containments become a BitmapOr over the same index.
+    def tag_condition(self, tag: str) -> ColumnElement:
+        return Recipe.tags.contains([tag])
+
+    def all_tags_condition(self, tags: List[str]) -> ColumnElement:
+        return Recipe.tags.contains(tags)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    # FTS5 index over the same columns, kept in sync by triggers (see below)
+    fts = table("recipes_fts", column("rowid"), column("recipes_fts"))
+
+    def build_match(self, tokens: List[str]) -> str:
+        parts = [f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*']
+        return " ".join(parts)
+
+    def apply(self, query: Select, term: str) -> Tuple[Select, ColumnElement]:
+        tokens = tokenize_search(term)
+        if not tokens:
+            return self.no_match(query)
+        query = query.join(self.fts, self.fts.c.rowid == Recipe.id).filter(
+            self.fts.c.recipes_fts.op("MATCH")(self.build_match(tokens))
+        )
+        # bm25() is lower-is-better, so negate it to share the ranking direction. The column
+        # weights are ts_rank's for the A/C/B/C weights of the Postgres search vector
+        return query, -func.bm25(text("recipes_fts"), *_FTS_WEIGHTS)
+
+    def tag_condition(self, tag: str) -> ColumnElement:
+        tag_values = func.json_each(Recipe.tags).table_valued("value")
+        return exists(select(1).select_from(tag_values).where(tag_values.c.value == tag))
+
+
+_backends: Dict[str, SearchBackend] = {
+    "postgresql": PostgresSearchBackend(),
+    "sqlite": SQLiteSearchBackend(),
+}
+
+
+def get_search_backend(dialect_name: str) -> SearchBackend:
+    try:
+        return _backends[dialect_name]
+    except KeyError:
+        raise ValueError(f"No search backend for dialect '{dialect_name}'")
+
+
+_FTS_COLUMNS = "title, description, tags, ingredients"
+_FTS_WEIGHTS = (1.0, 0.2, 0.4, 0.2)
+
+for _statement in (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5({_FTS_COLUMNS}, "
+    "content='recipes', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN "
+    f"INSERT INTO recipes_fts(rowid, {_FTS_COLUMNS}) "
+    "VALUES (new.id, new.title, new.description, new.tags, new.ingredients); END",
+    f"CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN "
+    f"INSERT INTO recipes_fts(recipes_fts, rowid, {_FTS_COLUMNS}) "
+    "VALUES ('delete', old.id, old.title, old.description, old.tags, old.ingredients); END",
+    f"CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE ON recipes BEGIN "
+    f"INSERT INTO recipes_fts(recipes_fts, rowid, {_FTS_COLUMNS}) "
+    "VALUES ('delete', old.id, old.title, old.description, old.tags, old.ingredients); "
+    f"INSERT INTO recipes_fts(rowid, {_FTS_COLUMNS}) "
+    "VALUES (new.id, new.title, new.description, new.tags, new.ingredients); END",
+):
+    event.listen(Recipe.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,30 @@
+from decimal import Decimal
+from typing import Any
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON rendered by orjson, byte-compatible with pydantic's JSON mode.
+
+    Content is encoded as is: handlers that return this directly skip FastAPI's
+    response_model validation and jsonable_encoder pass, so the content must already
+    have the response schema's shape (validated models or their JSON-mode dumps).
+    UTC datetimes end in "Z" and Decimals are strings, as pydantic renders them.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
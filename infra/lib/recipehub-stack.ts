@@ -2,6 +2,8 @@ import * as cdk from "aws-cdk-lib";
 import * as lambda from "aws-cdk-lib/aws-lambda";
 import * as ec2 from "aws-cdk-lib/aws-ec2";
 import * as rds from "aws-cdk-lib/aws-rds";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
 import * as path from "path";
 import { Construct } from "constructs";
 
@@ -73,6 +75,10 @@ export class RecipehubStack extends cdk.Stack {
     // Build DATABASE_URL from RDS instance
     const dbUrl = `postgresql://postgres:${database.secret?.secretValueFromJson("password").unsafeUnwrap()}@${database.instanceEndpoint.hostname}:5432/recipehub`;
 
+    // How often the scheduled job refreshes the leaderboards (context in cdk.json, or -c leaderboardRefreshMinutes=10);
+    // the API refuses boards that missed three refreshes in a row
+    const leaderboardRefreshMinutes = Number(this.node.tryGetContext("leaderboardRefreshMinutes") ?? 5);
+
     // Create Lambda function from Docker image
     const backendFunction = new lambda.DockerImageFunction(
       this,
@@ -88,11 +94,78 @@ export class RecipehubStack extends cdk.Stack {
           DATABASE_URL: dbUrl,
           SECRET_KEY: props.secretKey,
           OPENAI_API_KEY: props.openaiApiKey,
+          // One request per container at a time: keep a single warm connection
+          DB_POOL_STRATEGY: "single",
+          LEADERBOARD_MAX_STALENESS_SECONDS: String(leaderboardRefreshMinutes * 3 * 60),
         },
         architecture: lambda.Architecture.X86_64,
       }
     );
 
+    // Same image, scheduled: the only writer of the leaderboards, which reads just serve
+    const leaderboardFunction = new lambda.DockerImageFunction(
+      this,
+      "RecipehubLeaderboardFunction",
+      {
+        functionName: "recipehub-refresh-leaderboards",
+        code: lambda.DockerImageCode.fromImageAsset(path.join(__dirname, "../.."), {
+          cmd: ["app.main.refresh_leaderboards_handler"],
+        }),
+        memorySize: 512,
+        timeout: cdk.Duration.minutes(5),
+        environment: {
+          DATABASE_URL: dbUrl,
+          SECRET_KEY: props.secretKey,
+          // A run every few minutes: connect per run rather than hold a connection
+          DB_POOL_STRATEGY: "null",
+          DB_STATEMENT_TIMEOUT_MS: "240000",
+        },
+        architecture: lambda.Architecture.X86_64,
+      }
+    );
+
+    new events.Rule(this, "RefreshLeaderboardsSchedule", {
+      schedule: events.Schedule.rate(cdk.Duration.minutes(leaderboardRefreshMinutes)),
+      targets: [new targets.LambdaFunction(leaderboardFunction, { retryAttempts: 0 })],
+    });
+
+    // Same image again, with NumPy/SciPy doing the work: folds recent changes into the
+    // similar-recipes model, and rebuilds it nightly. The model is kept in the database.
+    const similarRecipesFunction = new lambda.DockerImageFunction(
+      this,
+      "RecipehubSimilarRecipesFunction",
+      {
+        functionName: "recipehub-similar-recipes",
+        code: lambda.DockerImageCode.fromImageAsset(path.join(__dirname, "../.."), {
+          cmd: ["app.main.similar_recipes_handler"],
+        }),
+        memorySize: 2048,
+        timeout: cdk.Duration.minutes(15),
+        environment: {
+          DATABASE_URL: dbUrl,
+          SECRET_KEY: props.secretKey,
+          DB_POOL_STRATEGY: "null",
+          DB_STATEMENT_TIMEOUT_MS: "840000",
+        },
+        architecture: lambda.Architecture.X86_64,
+      }
+    );
+
+    new events.Rule(this, "FoldInSimilarRecipesSchedule", {
+      schedule: events.Schedule.rate(cdk.Duration.minutes(10)),
+      targets: [new targets.LambdaFunction(similarRecipesFunction, { retryAttempts: 0 })],
+    });
+
+    new events.Rule(this, "RebuildSimilarRecipesSchedule", {
+      schedule: events.Schedule.cron({ minute: "0", hour: "3" }),
+      targets: [
+        new targets.LambdaFunction(similarRecipesFunction, {
+          event: events.RuleTargetInput.fromObject({ command: "rebuild" }),
+          retryAttempts: 0,
+        }),
+      ],
+    });
+
     // Add Function URL for public HTTP access
     const functionUrl = backendFunction.addFunctionUrl({
       authType: lambda.FunctionUrlAuthType.NONE,
@@ -100,6 +173,7 @@ export class RecipehubStack extends cdk.Stack {
         allowedOrigins: ["*"],
         allowedMethods: [lambda.HttpMethod.ALL],
         allowedHeaders: ["*"],
+        exposedHeaders: ["X-Next-Cursor", "ETag"],
         allowCredentials: true,
       },
     });
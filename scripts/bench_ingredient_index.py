@@ -0,0 +1,113 @@
+"""Query cost of the ingredient search behind GET /api/recipes/cook.
+
+Inserts synthetic public recipes whose ingredients follow a Zipf-like distribution over a
+vocabulary, so a few ingredients (butter, garlic, onion...) appear in a large share of
+recipes as they do in real data, then times pantry searches against the GIN-indexed
+signatures. Everything runs in one transaction that is rolled back at the end, so point
+DATABASE_URL at a migrated development database.
+
+    python scripts/bench_ingredient_index.py --recipes 100000 --pantry 5 10 20
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import insert, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import create_session  # noqa: E402
+from app.models import Recipe, User, UserType  # noqa: E402
+from app.services.ingredients import MAX_MISSING, STAPLES, ingredient_columns, normalize_ingredients, search_cookable  # noqa: E402
+
+INSERT_BATCH_SIZE = 5000
+QUANTITIES = ["1", "2", "1/2", "3 tbsp", "200g", "1 cup chopped", "2 large", "a pinch of"]
+
+
+def make_vocabulary(size: int) -> List[str]:
+    # Letters only: digits would be stripped as quantities
+    def name(n: int) -> str:
+        letters = ""
+        while True:
+            n, digit = divmod(n, 26)
+            letters += chr(ord("a") + digit)
+            if not n:
+                return f"ingredient {letters}"
+    return [name(n) for n in range(size)]
+
+
+async def bench(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary)
+    # Flattened at the head so the commonest ingredient is in about a third of recipes
+    weights = [1 / (rank + 10) for rank in range(len(vocabulary))]
+
+    recipes = [
+        [f"{rng.choice(QUANTITIES)} {name}" for name in set(rng.choices(vocabulary, weights, k=rng.randint(3, 2 * args.ingredients - 3)))]
+        for _ in range(args.recipes)
+    ]
+    counts = Counter(token for ingredients in recipes for token in normalize_ingredients(ingredients) - STAPLES)
+    frequencies = {token: count / len(recipes) for token, count in counts.items()}
+
+    db = create_session()
+    try:
+        user_id = (await db.execute(
+            insert(User).values(name="bench", email="bench@example.invalid", password_hash="-", user_type=UserType.CHEF.value)
+            .returning(User.id)
+        )).scalar_one()
+        start = time.perf_counter()
+        for offset in range(0, len(recipes), INSERT_BATCH_SIZE):
+            rows = []
+            for ingredients in recipes[offset:offset + INSERT_BATCH_SIZE]:
+                tokens, signature = ingredient_columns(ingredients, frequencies)
+                rows.append({
+                    "user_id": user_id, "title": "bench", "description": "", "ingredients": ingredients, "steps": ["-"],
+                    "time_minutes": 30, "difficulty": "easy", "source": "bench",
+                    "tags": [], "is_public": True, "ingredient_tokens": tokens, "ingredient_signature": signature
+                })
+            await db.execute(insert(Recipe), rows)
+        await db.execute(text("ANALYZE recipes"))
+        print(f"inserted {len(recipes)} recipes, {len(counts)} ingredients in {time.perf_counter() - start:.1f}s")
+        print(f"commonest ingredient is in {counts.most_common(1)[0][1]} recipes")
+
+        print(f"{'pantry':>8} {'missing':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'results':>8}")
+        for size in args.pantry:
+            for max_missing in args.max_missing:
+                timings = []
+                results = 0
+                for _ in range(args.queries):
+                    pantry = list(set(rng.choices(vocabulary, weights, k=size)))
+                    start = time.perf_counter()
+                    results += len(await search_cookable(db, pantry, 20, max_missing))
+                    timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                print(
+                    f"{size:>8} {max_missing:>8} {statistics.median(timings):>8.2f} {p95:>8.2f} {timings[-1]:>8.2f}"
+                    f" {results / args.queries:>8.1f}"
+                )
+    finally:
+        await db.rollback()
+        await db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--ingredients", type=int, default=10, help="average ingredients per recipe")
+    parser.add_argument("--pantry", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-missing", type=int, nargs="+", default=[0, 3, MAX_MISSING])
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
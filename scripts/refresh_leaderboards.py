@@ -0,0 +1,34 @@
+"""Refresh the leaderboards behind GET /api/recipes/leaderboards/{board}.
+
+This is the only writer of the boards; reads serve whatever it last computed. Deployed,
+an EventBridge rule runs the same job every few minutes (app.main.refresh_leaderboards_handler).
+Elsewhere, run it from cron, well within LEADERBOARD_MAX_STALENESS_SECONDS. A board another
+run is still refreshing is skipped.
+
+    python scripts/refresh_leaderboards.py              # all boards
+    python scripts/refresh_leaderboards.py trending
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import Leaderboard  # noqa: E402
+from app.services.leaderboards import refresh_leaderboards  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("board", nargs="*", type=Leaderboard, help=", ".join(board.value for board in Leaderboard))
+    args = parser.parse_args()
+    for board, seconds in asyncio.run(refresh_leaderboards(args.board or list(Leaderboard))).items():
+        if seconds is None:
+            print(f"skipped {board.value}: another refresh is running")
+        else:
+            print(f"refreshed {board.value} in {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
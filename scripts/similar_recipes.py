@@ -0,0 +1,38 @@
+"""Maintain the similar-recipes table behind GET /api/recipes/{id}/similar.
+
+`rebuild` builds the TF-IDF model over every public recipe, recomputes all neighbour
+lists and saves the model in the database. `fold-in` loads that model and applies only
+the recipes created, edited, hidden or deleted since the last run, so it can run every
+few minutes; it rebuilds when there is no saved model yet. Rebuild periodically (e.g.
+nightly) to pick up new ingredients and refresh the idf weights. Deployed, EventBridge
+rules run both (app.main.similar_recipes_handler). A run that finds another one still
+going does nothing.
+
+    python scripts/similar_recipes.py rebuild
+    python scripts/similar_recipes.py fold-in
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.recommendations import refresh_similarities  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "fold-in"])
+    args = parser.parse_args()
+    result = asyncio.run(refresh_similarities(rebuild=args.command == "rebuild"))
+    if result is None:
+        print("skipped: another run is in progress")
+    elif result["command"] == "rebuild":
+        print(f"rebuilt {result['recipes']} recipes, {result['neighbours']} neighbours in {result['seconds']:.1f}s")
+    else:
+        print(f"folded in {result['recipes']} recipes, rewrote {result['rewritten']} lists in {result['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Shared fixtures. The tests need PostgreSQL (JSONB, arrays, advisory locks), not SQLite.
+
+Point TEST_DATABASE_URL at a disposable database: it is dropped back to an empty schema
+and migrated at the start of the run, and its tables are emptied before every test.
+Without it every test is skipped.
+"""
+import asyncio
+import json
+import os
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+# Settings are read when app.database is first imported, so this must come first
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ.setdefault("DATABASE_URL", "postgresql://postgres@localhost:5432/recipehub_test")
+os.environ.setdefault("SECRET_KEY", "test")
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+from app.database import sync_database_url  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import rate_limit, recipe_ai  # noqa: E402
+from app.services.cache import set_cache  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "password123"
+GENERATED_RECIPE = {
+    "title": "Tomato omelette",
+    "description": "Eggs folded over tomatoes",
+    "ingredients": ["2 eggs", "1 tomato"],
+    "steps": ["Beat the eggs", "Cook with the tomato"],
+    "time_minutes": 10,
+    "difficulty": "Easy",
+    "tags": ["breakfast"]
+}
+
+
+@pytest.fixture(scope="session")
+def database() -> Iterator[Any]:
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(sync_database_url(TEST_DATABASE_URL))
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    # Without alembic.ini, whose logging setup would disable the app's loggers
+    config = Config()
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.upgrade(config, "head")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def app_client(database: Any) -> Iterator[TestClient]:
+    # One client for the whole run: the app's async engine is bound to its event loop
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(app_client: TestClient, database: Any) -> TestClient:
+    with database.begin() as conn:
+        tables = conn.execute(text("SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename <> 'alembic_version'")).scalars()
+        # Ids keep counting across tests, so tokens cached by id never point at another test's user
+        conn.execute(text(f"TRUNCATE {', '.join(tables)} CASCADE"))
+    set_cache(None)
+    return app_client
+
+
+@pytest.fixture
+def make_user(client: TestClient) -> Callable[..., Dict[str, str]]:
+    """Register a user and return the Authorization header for them."""
+
+    def make(user_type: str = "REGULAR") -> Dict[str, str]:
+        email = f"{uuid.uuid4().hex[:12]}@example.com"
+        response = client.post("/api/auth/register", json={"name": "Test", "email": email, "password": PASSWORD, "user_type": user_type})
+        assert response.status_code == 201, response.text
+        token = client.post("/api/auth/login", json={"email": email, "password": PASSWORD}).json()["accessToken"]
+        return {"Authorization": f"Bearer {token}"}
+
+    return make
+
+
+@pytest.fixture
+def make_recipe(client: TestClient) -> Callable[..., int]:
+    """Create a recipe as the given user and return its id."""
+
+    def make(headers: Dict[str, str], **fields: Any) -> int:
+        recipe = {
+            "title": "Test recipe",
+            "description": "A recipe",
+            "ingredients": ["2 eggs", "butter"],
+            "steps": ["Cook"],
+            "time_minutes": 10,
+            "difficulty": "Easy",
+            "tags": [],
+            "is_public": True,
+            **fields
+        }
+        response = client.post("/api/recipes", headers=headers, json=recipe)
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    return make
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions; replies are returned in order, then recipe.
+
+    A reply may be a string of content or an exception to raise from create().
+    """
+
+    def __init__(self) -> None:
+        self.recipe = dict(GENERATED_RECIPE)
+        self.replies: List[Any] = []
+        self.calls = 0
+        self.usage = SimpleNamespace(prompt_tokens=120, completion_tokens=80)
+        self.delay = 0.0
+        self.in_flight = self.max_in_flight = 0
+
+    async def create(self, stream: bool = False, **kwargs: Any) -> Any:
+        self.calls += 1
+        reply = self.replies.pop(0) if self.replies else json.dumps(self.recipe)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if isinstance(reply, BaseException):
+            raise reply
+        if stream:
+            return FakeStream(reply, self.usage)
+        return SimpleNamespace(usage=self.usage, choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+class FakeStream:
+    def __init__(self, content: str, usage: Any) -> None:
+        pieces = [content[start:start + 8] for start in range(0, len(content), 8)]
+        self.chunks = [SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))]) for piece in pieces]
+        # As with stream_options={"include_usage": True}
+        self.chunks.append(SimpleNamespace(usage=usage, choices=[]))
+        self.closed = False
+
+    def __aiter__(self) -> Any:
+        return self._iterate()
+
+    async def _iterate(self) -> Any:
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def fake_openai(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> FakeCompletions:
+    """Answer OpenAI calls locally, with a fresh generation cache and rate limiter."""
+    completions = FakeCompletions()
+    monkeypatch.setattr(recipe_ai, "get_openai_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(recipe_ai, "_generation_cache", None)
+    monkeypatch.setattr(rate_limit, "_limiter", None)
+    return completions
@@ -0,0 +1,146 @@
+import json
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app.database import settings
+from app.services import rate_limit
+from app.services.auth import decode_access_token
+
+REQUEST = {"ingredients": ["Eggs", " tomato "], "max_time_minutes": 15}
+# The same prompt: ingredients are compared case-, order- and whitespace-insensitively
+EQUIVALENT_REQUEST = {"ingredients": ["tomato", "eggs"], "max_time_minutes": 15}
+
+
+def ai_requests(database):
+    with database.connect() as conn:
+        return [tuple(row) for row in conn.execute(
+            text("SELECT prompt_tokens, completion_tokens, cache_hit FROM ai_requests ORDER BY id")
+        )]
+
+
+def events(response):
+    assert response.status_code == 200, response.text
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+@pytest.fixture
+def chef(make_user):
+    return make_user("CHEF")
+
+
+def test_equivalent_requests_share_one_completion(client, database, fake_openai, chef):
+    first = client.post("/api/ai/recipes/generate", headers=chef, json=REQUEST)
+    second = client.post("/api/ai/recipes/generate", headers=chef, json=EQUIVALENT_REQUEST)
+    assert first.status_code == second.status_code == 200
+    assert first.json()["recipe"]["title"] == second.json()["recipe"]["title"] == "Tomato omelette"
+    assert fake_openai.calls == 1
+    assert ai_requests(database) == [(120, 80, False), (0, 0, True)]
+
+    assert client.post("/api/ai/recipes/generate", headers=chef, params={"fresh": True}, json=REQUEST).status_code == 200
+    assert fake_openai.calls == 2
+
+
+@pytest.mark.parametrize("content", ["not json", json.dumps({"title": "Soup"}), json.dumps({"title": "Soup", "steps": "stir"})])
+def test_unusable_completions_are_charged_but_not_cached(client, database, fake_openai, chef, content):
+    fake_openai.replies = [content]
+    response = client.post("/api/ai/recipes/generate", headers=chef, json=REQUEST)
+    assert response.status_code == 500
+    assert ai_requests(database) == [(120, 80, False)]
+
+    # The next request calls the model again instead of replaying the bad output
+    assert client.post("/api/ai/recipes/generate", headers=chef, json=REQUEST).status_code == 200
+    assert fake_openai.calls == 2
+
+
+def test_stream_does_not_cache_unusable_completions(client, fake_openai, chef):
+    fake_openai.replies = [json.dumps({"title": "Soup"})]
+    streamed = events(client.post("/api/ai/recipes/generate/stream", headers=chef, json=REQUEST))
+    assert streamed[0] == ("field", {"field": "title", "value": "Soup"})
+    assert streamed[-1][0] == "error"
+
+    streamed = events(client.post("/api/ai/recipes/generate/stream", headers=chef, json=REQUEST))
+    assert streamed[-1][0] == "recipe"
+    assert fake_openai.calls == 2
+
+
+def test_stream_replays_cached_generations(client, database, fake_openai, chef):
+    assert client.post("/api/ai/recipes/generate", headers=chef, json=REQUEST).status_code == 200
+    streamed = events(client.post("/api/ai/recipes/generate/stream", headers=chef, json=EQUIVALENT_REQUEST))
+    assert ("field", {"field": "title", "value": "Tomato omelette"}) in streamed
+    assert streamed[-1][0] == "recipe"
+    assert streamed[-1][1]["tags"] == ["breakfast"]
+    assert fake_openai.calls == 1
+    assert ai_requests(database)[-1] == (0, 0, True)
+
+
+def budget_spent(client, headers):
+    limiter = rate_limit.get_ai_rate_limiter()
+    user_id = int(decode_access_token(headers["Authorization"].split()[1])["sub"])
+    current_key, _, _ = limiter._window_keys(user_id, time.time())
+    return client.portal.call(limiter.store.get_many, current_key)[0]
+
+
+def test_failed_streams_are_charged_for_what_they_used(client, database, fake_openai, chef):
+    fake_openai.replies = [json.dumps({"title": "Soup"})]
+    assert events(client.post("/api/ai/recipes/generate/stream", headers=chef, json=REQUEST))[-1][0] == "error"
+    assert ai_requests(database) == [(120, 80, False)]
+    assert budget_spent(client, chef) == 200
+
+
+def test_streams_that_never_reached_the_model_cost_nothing(client, database, fake_openai, chef):
+    fake_openai.replies = [ConnectionError("OpenAI unreachable")]
+    streamed = events(client.post("/api/ai/recipes/generate/stream", headers=chef, json=REQUEST))
+    assert streamed == [("error", {"detail": "Failed to generate recipe: OpenAI unreachable"})]
+    assert ai_requests(database) == [(None, None, False)]
+    assert budget_spent(client, chef) == 0
+
+
+def batch_item(n):
+    return {"ingredients": [f"ingredient {n}"]}
+
+
+def test_batch_reports_each_item_in_order(client, database, fake_openai, chef, monkeypatch):
+    monkeypatch.setattr(settings, "AI_BATCH_CONCURRENCY", 1)
+    fake_openai.replies = [json.dumps(fake_openai.recipe), "not json", json.dumps({**fake_openai.recipe, "title": "Shakshuka"})]
+    response = client.post("/api/ai/recipes/generate/batch", headers=chef, json={"items": [batch_item(n) for n in range(3)]})
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["recipe"]["title"] == "Tomato omelette"
+    assert results[1]["recipe"] is None and results[1]["error"].startswith("Failed to generate recipe")
+    assert results[2]["recipe"]["title"] == "Shakshuka"
+    assert results[2]["recipe"]["is_owner"] is True
+    # Every completion is charged, the unusable one included
+    assert ai_requests(database) == [(120, 80, False)] * 3
+
+    titles = [item["title"] for item in client.get("/api/recipes", headers=chef, params={"mine": True}).json()]
+    assert sorted(titles) == ["Shakshuka", "Tomato omelette"]
+
+
+def test_batch_completions_run_with_bounded_concurrency(client, fake_openai, chef, monkeypatch):
+    monkeypatch.setattr(settings, "AI_BATCH_CONCURRENCY", 2)
+    fake_openai.delay = 0.05
+    response = client.post("/api/ai/recipes/generate/batch", headers=chef, json={"items": [batch_item(n) for n in range(5)]})
+    assert response.status_code == 200
+    assert fake_openai.max_in_flight == 2
+
+
+def test_equivalent_batch_items_share_one_completion(client, database, fake_openai, chef):
+    fake_openai.delay = 0.05
+    response = client.post("/api/ai/recipes/generate/batch", headers=chef, json={"items": [REQUEST, EQUIVALENT_REQUEST, REQUEST]})
+    assert all(result["recipe"] for result in response.json()["results"])
+    assert fake_openai.calls == 1
+    assert sorted(ai_requests(database)) == [(0, 0, True), (0, 0, True), (120, 80, False)]
+
+
+@pytest.mark.parametrize("size", [0, settings.AI_BATCH_MAX_ITEMS + 1])
+def test_batch_size_is_bounded(client, fake_openai, chef, size):
+    response = client.post("/api/ai/recipes/generate/batch", headers=chef, json={"items": [batch_item(n) for n in range(size)]})
+    assert response.status_code == 400
+    assert fake_openai.calls == 0
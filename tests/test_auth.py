@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from app.services import auth
+from app.services.auth import create_access_token, decode_access_token
+from app.services.query_diagnostics import assert_max_queries
+
+
+def user_id(headers):
+    return int(decode_access_token(headers["Authorization"].split()[1])["sub"])
+
+
+def reads_users(statements):
+    return any("FROM users" in statement for statement in statements)
+
+
+def test_reads_take_the_caller_from_token_claims(client, make_user):
+    headers = make_user()
+    auth._principal_cache.clear()
+    with assert_max_queries(1) as statements:
+        response = client.delete("/api/recipes/1/favorite", headers=headers)
+    assert response.status_code == 404
+    assert not reads_users(statements)
+
+
+def test_tokens_without_claims_resolve_through_the_database(client, make_user):
+    token = create_access_token({"sub": str(user_id(make_user("CHEF")))})
+    with assert_max_queries(2) as statements:
+        response = client.delete("/api/recipes/1/favorite", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 404
+    assert reads_users(statements)
+
+
+def test_invalid_and_expired_tokens_are_rejected(client, make_user):
+    claims = decode_access_token(make_user()["Authorization"].split()[1])
+    expired = create_access_token({key: claims[key] for key in ("sub", "name", "user_type")}, timedelta(seconds=-1))
+    for token in ("not-a-token", expired, create_access_token({"sub": "nobody"})):
+        response = client.delete("/api/recipes/1/favorite", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+        assert response.headers["www-authenticate"] == "Bearer"
+
+
+def test_writes_check_the_account_still_exists(client, database, make_user):
+    headers = make_user("CHEF")
+    with database.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM users WHERE id = %s", (user_id(headers),))
+    response = client.post("/api/recipes", headers=headers, json={
+        "title": "Soup", "description": "-", "ingredients": ["water"], "steps": ["Boil"], "time_minutes": 5, "difficulty": "Easy"
+    })
+    assert response.status_code == 401
+    assert response.json()["detail"] == "User not found"
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.database import settings
+from app.services import cache as cache_module
+from app.services.cache import CacheBackend, InMemoryCache, InMemoryLRUCache, create_cache, get_or_load, set_cache
+
+
+@pytest.fixture
+def counting_cache(client):
+    """An in-process cache that counts the reads it answered."""
+
+    class CountingCache(InMemoryCache):
+        hits = 0
+
+        async def get(self, key):
+            value = await super().get(key)
+            self.hits += value is not None
+            return value
+
+    cache = CountingCache(100, default_ttl=60)
+    set_cache(cache)
+    return cache
+
+
+def test_public_detail_is_cached_until_the_recipe_changes(client, make_user, make_recipe, counting_cache):
+    chef = make_user("CHEF")
+    recipe_id = make_recipe(chef, title="Soup")
+    assert client.get(f"/api/recipes/{recipe_id}").json()["title"] == "Soup"
+    assert client.get(f"/api/recipes/{recipe_id}").json()["title"] == "Soup"
+    assert counting_cache.hits == 1
+
+    client.put(f"/api/recipes/{recipe_id}", headers=chef, json={"title": "Stew"})
+    assert client.get(f"/api/recipes/{recipe_id}").json()["title"] == "Stew"
+
+
+def test_public_list_is_invalidated_by_new_recipes(client, make_user, make_recipe, counting_cache):
+    chef = make_user("CHEF")
+    make_recipe(chef, title="Soup")
+    client.get("/api/recipes")
+    hits = counting_cache.hits
+    assert [item["title"] for item in client.get("/api/recipes").json()] == ["Soup"]
+    assert counting_cache.hits > hits
+
+    make_recipe(chef, title="Stew")
+    assert [item["title"] for item in client.get("/api/recipes").json()] == ["Stew", "Soup"]
+
+
+def test_private_recipes_are_not_shared(client, make_user, make_recipe, counting_cache):
+    owner = make_user()
+    recipe_id = make_recipe(owner, is_public=True)
+    assert client.get(f"/api/recipes/{recipe_id}", headers=owner).status_code == 200
+    assert client.get(f"/api/recipes/{recipe_id}").status_code == 403
+
+
+def test_concurrent_misses_run_one_loader():
+    cache = InMemoryCache(10)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value", True
+
+    async def main():
+        return await asyncio.gather(*[get_or_load("key", loader, cache=cache) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_lru_evicts_the_least_recently_used_and_expires_entries(monkeypatch):
+    entries = InMemoryLRUCache(2)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+    assert (entries.get("a"), entries.get("b"), entries.get("c")) == (1, None, 3)
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    entries.set("d", 4, ttl=5)
+    now[0] += 5
+    assert entries.get("d") is None
+
+
+def test_shared_store_is_the_default_once_configured(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_BACKEND", None)
+    monkeypatch.setattr(settings, "CACHE_URL", None)
+    assert isinstance(create_cache(10, 60), InMemoryCache)
+
+    opened = []
+    monkeypatch.setattr(settings, "CACHE_URL", "redis://cache:6379/0")
+    monkeypatch.setattr(cache_module.KeyValueStoreCache, "from_url", classmethod(lambda cls, url, **options: opened.append(url)))
+    create_cache(10, 60)
+    assert opened == ["redis://cache:6379/0"]
+
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "memory")
+    assert isinstance(create_cache(10, 60), InMemoryCache)
+
+
+def test_cache_backends_must_implement_the_interface():
+    class Incomplete(CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
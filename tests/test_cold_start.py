@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only needed by AI, sign-in and recommendation-job code paths
+DEFERRED = ("openai", "passlib", "jose", "numpy", "scipy")
+
+
+def loaded_after(code):
+    probe = f"import sys; {code}; print(' '.join(sorted(name for name in {DEFERRED!r} if name in sys.modules)))"
+    env = {**os.environ, "DATABASE_URL": "postgresql://nobody@unreachable:5432/none", "SECRET_KEY": "test", "OPENAI_API_KEY": "test"}
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return result.stdout.split()
+
+
+def test_importing_the_app_defers_heavy_dependencies():
+    assert loaded_after("import app.main") == []
+
+
+@pytest.mark.parametrize("code, dependency", [
+    ("from app.services.openai import get_openai_client; get_openai_client()", "openai"),
+    ("from app.services.passwords import get_password_hasher; get_password_hasher().context", "passlib"),
+    ("from app.services.auth import decode_access_token; decode_access_token('x')", "jose"),
+])
+def test_dependencies_load_on_first_use(code, dependency):
+    assert dependency in loaded_after(code)
@@ -0,0 +1,66 @@
+import pytest
+
+from app.services.conditional import etag_matches, not_modified_since
+
+
+@pytest.fixture
+def recipe(make_user, make_recipe):
+    chef = make_user("CHEF")
+    return chef, make_recipe(chef, title="Soup")
+
+
+def test_list_revalidates_until_a_recipe_changes(client, recipe):
+    chef, recipe_id = recipe
+    etag = client.get("/api/recipes").headers["etag"]
+    response = client.get("/api/recipes", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    client.put(f"/api/recipes/{recipe_id}", headers=chef, json={"title": "Stew"})
+    response = client.get("/api/recipes", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "Stew"
+
+
+def test_etag_depends_on_the_viewers_state(client, recipe, make_user):
+    _, recipe_id = recipe
+    viewer = make_user()
+    etag = client.get("/api/recipes", headers=viewer).headers["etag"]
+    assert client.get("/api/recipes").headers["etag"] != etag
+
+    client.post(f"/api/recipes/{recipe_id}/favorite", headers=viewer)
+    response = client.get("/api/recipes", headers={**viewer, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["is_favorite"] is True
+
+
+def test_anonymous_detail_revalidates_by_date(client, recipe, make_user):
+    _, recipe_id = recipe
+    response = client.get(f"/api/recipes/{recipe_id}")
+    last_modified = response.headers["last-modified"]
+    assert client.get(f"/api/recipes/{recipe_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(f"/api/recipes/{recipe_id}", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    # If-None-Match wins over a date that would match
+    headers = {"If-None-Match": '"stale"', "If-Modified-Since": last_modified}
+    assert client.get(f"/api/recipes/{recipe_id}", headers=headers).status_code == 200
+
+    # Viewer state changes without touching updated_at, so signed-in copies are validated by ETag only
+    assert "last-modified" not in client.get(f"/api/recipes/{recipe_id}", headers=make_user()).headers
+
+
+def test_conditional_detail_still_checks_access(client, make_user, make_recipe):
+    owner = make_user()
+    recipe_id = make_recipe(owner)
+    etag = client.get(f"/api/recipes/{recipe_id}", headers=owner).headers["etag"]
+    assert client.get(f"/api/recipes/{recipe_id}", headers={"If-None-Match": etag}).status_code == 403
+    assert client.get("/api/recipes/999999", headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_validator_helpers():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abc"', '"def"')
+    assert not_modified_since("Sat, 17 Oct 2026 10:00:00 GMT", 1792231200.9)
+    assert not not_modified_since("Sat, 17 Oct 2026 10:00:00 GMT", 1792231201.0)
+    assert not not_modified_since("yesterday", 0)
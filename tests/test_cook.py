@@ -0,0 +1,80 @@
+import os
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+
+from app.services.ingredients import ingredient_tokens, MAX_MISSING
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cook(client, *ingredients, **params):
+    response = client.get("/api/recipes/cook", params={"ingredient": list(ingredients), **params})
+    assert response.status_code == 200, response.text
+    return [(match["recipe"]["title"], match["matched"], match["missing"]) for match in response.json()]
+
+
+@pytest.mark.parametrize("line, tokens", [
+    ("2 cups chopped red onions", ("red onion",)),
+    ("Salt and pepper", ("salt", "pepper")),
+    ("1 onion, finely chopped", ("onion",)),
+    ("butter or margarine", ("butter",)),
+    ("3 tomatoes (ripe, about 400g)", ("tomato",)),
+    ("a handful of fresh basil leaves", ("basil",)),
+])
+def test_ingredient_lines_are_normalized(line, tokens):
+    assert ingredient_tokens(line) == tokens
+
+
+def test_recipes_are_ranked_by_what_is_missing(client, make_user, make_recipe):
+    chef = make_user("CHEF")
+    make_recipe(chef, title="Omelette", ingredients=["3 eggs", "1 tbsp butter", "salt and pepper"])
+    make_recipe(chef, title="Shakshuka", ingredients=["4 eggs", "2 tomatoes", "1 onion, diced", "cumin"])
+    make_recipe(chef, title="Tomato salad", ingredients=["tomatoes", "red onion", "olive oil"])
+    make_recipe(chef, title="Pancakes", ingredients=["flour", "milk", "egg", "sugar", "baking powder", "butter"])
+
+    # Pancakes miss four, one more than allowed by default
+    assert cook(client, "Eggs", "2 tomatoes", "butter") == [
+        ("Omelette", ["butter", "egg"], []),
+        ("Shakshuka", ["egg", "tomato"], ["cumin", "onion"]),
+        ("Tomato salad", ["tomato"], ["olive oil", "red onion"]),
+    ]
+    assert cook(client, "eggs", "butter", "flour", "milk", max_missing=5)[1][0] == "Pancakes"
+    assert cook(client, "eggs", max_missing=0) == []
+    assert [title for title, _, _ in cook(client, "eggs", "butter", max_missing=0)] == ["Omelette"]
+
+
+def test_only_public_chef_recipes_are_found(client, make_user, make_recipe):
+    make_recipe(make_user("CHEF"), title="Hidden", ingredients=["eggs"], is_public=False)
+    make_recipe(make_user(), title="Home cooking", ingredients=["eggs"])
+    assert cook(client, "eggs") == []
+
+
+def test_edited_ingredients_are_reindexed(client, make_user, make_recipe):
+    chef = make_user("CHEF")
+    recipe_id = make_recipe(chef, title="Soup", ingredients=["leeks"])
+    client.put(f"/api/recipes/{recipe_id}", headers=chef, json={"ingredients": ["potatoes"]})
+    assert cook(client, "leek") == []
+    assert cook(client, "potato") == [("Soup", ["potato"], [])]
+
+
+@pytest.mark.parametrize("params", [{}, {"ingredient": "eggs", "max_missing": MAX_MISSING + 1}])
+def test_bad_searches_are_rejected(client, params):
+    assert client.get("/api/recipes/cook", params=params).status_code == 422
+
+
+def test_migration_backfills_existing_recipes(client, database, make_user, make_recipe):
+    chef = make_user("CHEF")
+    make_recipe(chef, title="Shakshuka", ingredients=["4 eggs", "2 tomatoes", "1 onion, diced"])
+    config = Config()
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.downgrade(config, "c5f19a7e3b28")
+    command.upgrade(config, "head")
+
+    with database.connect() as conn:
+        row = conn.execute(text("SELECT ingredient_tokens, ingredient_signature FROM recipes")).one()
+    assert row.ingredient_tokens == ["egg", "onion", "tomato"]
+    assert sorted(row.ingredient_signature) == ["0:egg", "1:onion", "2:tomato"]
+    assert cook(client, "eggs") == [("Shakshuka", ["egg"], ["onion", "tomato"])]
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import (
+    SyncSessionAdapter, TimedAsyncAdaptedQueuePool, TimedNullPool, TimedQueuePool, async_database_url, connect_args,
+    create_session, pool_options, settings, sync_database_url
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_database_url_names_the_driver_of_the_mode():
+    url = "postgresql://user:secret@db:5432/recipehub"
+    assert async_database_url(url) == "postgresql+asyncpg://user:secret@db:5432/recipehub"
+    assert sync_database_url("postgresql+asyncpg://user:secret@db:5432/recipehub") == "postgresql+psycopg2://user:secret@db:5432/recipehub"
+    assert async_database_url("sqlite:///local.db") == "sqlite+aiosqlite:///local.db"
+
+
+def test_sessions_match_the_configured_mode(client):
+    db = create_session()
+    try:
+        assert isinstance(db, AsyncSession if settings.DB_ASYNC else SyncSessionAdapter)
+    finally:
+        client.portal.call(db.close)
+
+
+def test_queries_do_not_block_the_event_loop(client):
+    async def sleep():
+        db = create_session()
+        try:
+            await db.execute(text("SELECT pg_sleep(0.3)"))
+        finally:
+            await db.close()
+
+    async def concurrently():
+        start = time.perf_counter()
+        await asyncio.gather(sleep(), sleep(), sleep())
+        return time.perf_counter() - start
+
+    assert client.portal.call(concurrently) < 0.6
+
+
+def test_sync_adapter_streams_in_partitions(client, database):
+    async def stream():
+        db = SyncSessionAdapter(sessionmaker(bind=database)())
+        try:
+            result = await db.stream(text("SELECT generate_series(1, 5)").execution_options(yield_per=2))
+            return [[row[0] for row in partition] async for partition in result.partitions(2)]
+        finally:
+            await db.close()
+
+    assert client.portal.call(stream) == [[1, 2], [3, 4], [5]]
+
+
+@pytest.mark.parametrize("strategy, poolclass, size", [("queue", TimedQueuePool, 5), ("single", TimedQueuePool, 1), ("null", TimedNullPool, None)])
+def test_pool_strategies(monkeypatch, strategy, poolclass, size):
+    monkeypatch.setattr(settings, "DB_POOL_STRATEGY", strategy)
+    options = pool_options(is_async=False)
+    assert options["poolclass"] is poolclass
+    assert options.get("pool_size") == size
+    assert pool_options(is_async=True)["poolclass"] is (TimedNullPool if strategy == "null" else TimedAsyncAdaptedQueuePool)
+
+
+def test_unknown_pool_strategy_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_STRATEGY", "lambda")
+    with pytest.raises(ValueError):
+        pool_options(is_async=True)
+
+
+def test_connect_args_set_the_timeout_at_startup(monkeypatch):
+    monkeypatch.setattr(settings, "DB_STATEMENT_TIMEOUT_MS", 1500)
+    monkeypatch.setattr(settings, "DB_PROXY", True)
+    url = "postgresql://db/recipehub"
+    assert connect_args(url, is_async=False) == {"options": "-c application_name=recipehub -c statement_timeout=1500"}
+    async_args = connect_args(url, is_async=True)
+    assert async_args["server_settings"]["statement_timeout"] == "1500"
+    assert async_args["statement_cache_size"] == async_args["prepared_statement_cache_size"] == 0
+
+
+def test_importing_the_app_does_not_create_the_engine():
+    code = "import app.main, app.database as database; assert database._engine is None"
+    env = {**os.environ, "DATABASE_URL": "postgresql://nobody@unreachable:5432/none", "SECRET_KEY": "test"}
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+
+
+def test_health_shows_pool_details_only_with_the_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    assert client.get("/health/db").json() == {"status": "ok"}
+    details = client.get("/health/db", headers={"Authorization": "Bearer secret"}).json()
+    assert details["status"] == "ok"
+    assert details["strategy"] == settings.DB_POOL_STRATEGY
+    assert details["checkouts"] > 0
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.database import settings
+
+
+@pytest.fixture
+def chef(client, make_user, make_recipe):
+    chef = make_user("CHEF")
+    other = make_user("CHEF")
+    mine = [make_recipe(chef, title=f"Recipe {n}", tags=["soup"]) for n in range(3)]
+    theirs = make_recipe(other, title="Their recipe")
+    client.post(f"/api/recipes/{theirs}/favorite", headers=chef)
+    client.post(f"/api/recipes/{theirs}/rate", headers=chef, json={"rating": 5})
+    client.post(f"/api/recipes/{mine[0]}/rate", headers=other, json={"rating": 2})
+    return chef
+
+
+def export(client, headers, **params):
+    response = client.get("/api/recipes/export", headers={**headers, "Accept-Encoding": "identity"}, params=params)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_ndjson_export_streams_everything_of_the_caller(client, chef, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_EXPORT_BATCH_SIZE", 2)
+    response = export(client, chef)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["cache-control"] == "no-store"
+    assert "content-encoding" not in response.headers
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [(record["type"], record["title"]) for record in records] == [
+        ("recipe", "Recipe 0"), ("recipe", "Recipe 1"), ("recipe", "Recipe 2"),
+        ("favorite", "Their recipe"), ("rating", "Their recipe"),
+    ]
+    assert records[0]["tags"] == ["soup"]
+    assert records[0]["avg_rating"] == "2.00"
+    assert records[-1]["rating"] == 5
+
+
+def test_kinds_can_be_picked(client, chef):
+    records = [json.loads(line) for line in export(client, chef, kind=["ratings", "favorites"]).text.splitlines()]
+    assert [record["type"] for record in records] == ["rating", "favorite"]
+
+
+def test_csv_export_has_a_header_row(client, chef):
+    response = export(client, chef, format="csv", kind="recipes")
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"] == 'attachment; filename="recipehub-recipes.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["Recipe 0", "Recipe 1", "Recipe 2"]
+    assert json.loads(rows[0]["tags"]) == ["soup"]
+
+
+@pytest.mark.parametrize("params", [{"format": "csv"}, {"format": "csv", "kind": ["recipes", "ratings"]}])
+def test_csv_exports_one_kind_at_a_time(client, chef, params):
+    response = client.get("/api/recipes/export", headers=chef, params=params)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "CSV exports one kind at a time"
+
+
+def test_export_is_gzipped_when_accepted(client, chef):
+    response = client.get("/api/recipes/export", headers={**chef, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    # httpx decompresses transparently
+    assert response.text == export(client, chef).text
+
+
+def test_export_needs_a_user(client):
+    assert client.get("/api/recipes/export").status_code == 403
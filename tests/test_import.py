@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from app.database import settings
+
+
+def recipe(title, **fields):
+    return {
+        "title": title, "description": "Imported", "ingredients": ["rice", "2 eggs"], "steps": ["Fry"],
+        "time_minutes": 15, "difficulty": "Easy", "tags": ["quick"], **fields
+    }
+
+
+def ndjson(*items):
+    return "".join((item if isinstance(item, str) else json.dumps(item)) + "\n" for item in items).encode()
+
+
+def upload(client, headers, body, content_type="application/x-ndjson"):
+    return client.post("/api/recipes/import", headers={**headers, "Content-Type": content_type}, content=body)
+
+
+def my_titles(client, headers):
+    return sorted(item["title"] for item in client.get("/api/recipes", headers=headers, params={"mine": True}).json())
+
+
+def test_ndjson_import_saves_valid_lines_and_reports_the_rest(client, make_user):
+    chef = make_user("CHEF")
+    body = ndjson(recipe("Fried rice"), "", '{"title": "Broken"', recipe("Rice bowl", time_minutes="soon"), recipe("Congee"))
+    response = upload(client, chef, body)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 2)
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+    assert result["errors"][1]["detail"].startswith("time_minutes: ")
+
+    assert my_titles(client, chef) == ["Congee", "Fried rice"]
+    # Public straight away, and found by what they are made of
+    assert [item["title"] for item in client.get("/api/recipes", params={"search": "congee"}).json()] == ["Congee"]
+    cookable = client.get("/api/recipes/cook", params={"ingredient": ["rice", "eggs"]}).json()
+    assert sorted(match["recipe"]["title"] for match in cookable) == ["Congee", "Fried rice"]
+
+
+def test_json_array_import_streams_in_chunks(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "RECIPE_IMPORT_CHUNK_SIZE", 2)
+    chef = make_user("CHEF")
+    body = json.dumps([recipe(f"Recipe {n}") for n in range(5)] + [{"title": 1}]).encode()
+    result = upload(client, chef, body, "application/json").json()
+    assert (result["imported"], result["failed"]) == (5, 1)
+    assert result["errors"][0]["line"] == 6
+    assert len(my_titles(client, chef)) == 5
+
+
+def test_regular_users_import_private_recipes(client, make_user):
+    regular = make_user()
+    assert upload(client, regular, ndjson(recipe("Secret rice", is_public=True))).json()["imported"] == 1
+    assert my_titles(client, regular) == ["Secret rice"]
+    assert client.get("/api/recipes").json() == []
+
+
+def test_malformed_arrays_import_nothing(client, make_user):
+    chef = make_user("CHEF")
+    body = json.dumps([recipe("Kept out")]).encode()[:-1] + b', {"title": '
+    response = upload(client, chef, body, "application/json")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Malformed upload: Unexpected end of JSON array"
+    assert my_titles(client, chef) == []
+
+
+def test_other_content_types_are_refused(client, make_user):
+    assert upload(client, make_user("CHEF"), b"title: Soup", "text/plain").status_code == 415
+
+
+@pytest.mark.parametrize("content_type", ["application/x-ndjson", "application/json"])
+def test_overlong_items_are_refused(client, make_user, monkeypatch, content_type):
+    monkeypatch.setattr(settings, "RECIPE_IMPORT_MAX_LINE_BYTES", 1000)
+    chef = make_user("CHEF")
+    items = [recipe("Fine"), recipe("Long", description="x" * 2000)]
+    body = ndjson(*items) if content_type == "application/x-ndjson" else json.dumps(items).encode()
+    response = upload(client, chef, body, content_type)
+    assert response.status_code == 413
+    assert my_titles(client, chef) == []
@@ -0,0 +1,79 @@
+from sqlalchemy import func, select, text
+
+from app.database import settings
+from app.models import Leaderboard
+from app.services.leaderboards import LOCK_NAMESPACE, refresh_leaderboards
+
+
+def refresh(client, *boards):
+    # On the app's event loop, where its engine's connections live
+    return client.portal.call(refresh_leaderboards, list(boards or Leaderboard))
+
+
+def titles(client, board, **params):
+    response = client.get(f"/api/recipes/leaderboards/{board}", params=params)
+    assert response.status_code == 200, response.text
+    return [item["recipe"]["title"] for item in response.json()]
+
+
+def test_reads_serve_the_last_refresh(client, make_user, make_recipe):
+    chef, rater = make_user("CHEF"), make_user()
+    recipe_id = make_recipe(chef, title="Soup")
+    client.post(f"/api/recipes/{recipe_id}/rate", headers=rater, json={"rating": 5})
+
+    response = client.get("/api/recipes/leaderboards/top_rated")
+    assert response.json() == []
+    assert "last-modified" not in response.headers
+
+    refresh(client)
+    assert titles(client, "top_rated") == ["Soup"]
+    assert titles(client, "trending") == ["Soup"]
+
+    # Not until the next refresh
+    make_recipe(chef, title="Stew")
+    client.post(f"/api/recipes/{recipe_id}/favorite", headers=rater)
+    assert titles(client, "top_rated") == ["Soup"]
+
+
+def test_recipes_without_a_tag_list_are_ranked(client, make_user, make_recipe):
+    chef, rater = make_user("CHEF"), make_user()
+    tagged = make_recipe(chef, title="Tagged", tags=["soup", "soup"])
+    untagged = make_recipe(chef, title="Untagged", tags=["soup"])
+    # Stores JSON null rather than a list
+    assert client.put(f"/api/recipes/{untagged}", headers=chef, json={"tags": None}).status_code == 200
+    for recipe_id, rating in ((tagged, 4), (untagged, 5)):
+        client.post(f"/api/recipes/{recipe_id}/rate", headers=rater, json={"rating": rating})
+
+    timings = refresh(client)
+    assert all(seconds is not None for seconds in timings.values())
+    assert titles(client, "top_rated") == ["Untagged", "Tagged"]
+    assert titles(client, "top_rated", tag="soup") == ["Tagged"]
+    assert titles(client, "trending", tag="soup") == ["Tagged"]
+
+
+def test_boards_the_job_stopped_refreshing_are_refused(client, database, make_user, make_recipe, monkeypatch):
+    chef, rater = make_user("CHEF"), make_user()
+    client.post(f"/api/recipes/{make_recipe(chef, title='Soup')}/rate", headers=rater, json={"rating": 5})
+    refresh(client)
+    with database.begin() as conn:
+        conn.execute(text("UPDATE leaderboard_refreshes SET refreshed_at = now() - interval '1 hour' WHERE board = 'trending'"))
+
+    response = client.get("/api/recipes/leaderboards/trending")
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Leaderboard is out of date"
+    assert titles(client, "top_rated") == ["Soup"]
+
+    monkeypatch.setattr(settings, "LEADERBOARD_MAX_STALENESS_SECONDS", 0)
+    assert titles(client, "trending") == ["Soup"]
+
+
+def test_overlapping_refreshes_skip_the_locked_board(client, database):
+    key = (LOCK_NAMESPACE, list(Leaderboard).index(Leaderboard.TRENDING))
+    with database.connect() as conn:
+        assert conn.execute(select(func.pg_try_advisory_lock(*key))).scalar()
+        try:
+            timings = refresh(client)
+        finally:
+            conn.execute(select(func.pg_advisory_unlock(*key)))
+    assert timings[Leaderboard.TRENDING] is None
+    assert timings[Leaderboard.TOP_RATED] is not None
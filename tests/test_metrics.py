@@ -0,0 +1,84 @@
+import re
+
+from app.database import settings
+from app.services.metrics import Counter, Histogram
+
+PARTS = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?')
+
+
+def sample(client, series):
+    """The value of one series on /metrics, 0 if it has not been recorded yet."""
+    for line in client.get("/metrics").text.splitlines():
+        name, _, value = line.rpartition(" ")
+        if name == series:
+            return float(value)
+    return 0.0
+
+
+def test_histograms_render_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test.", (0.1, 1.0), ("route",))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(("/a",), value)
+    assert list(histogram.render()) == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a",le="0.1"} 1',
+        'test_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_seconds_sum{route="/a"} 4.05',
+        'test_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("test_total", "Test.", ("path",))
+    counter.inc(('say "hi"\\\n',), 2)
+    assert list(counter.render())[-1] == 'test_total{path="say \\"hi\\"\\\\\\n"} 2'
+
+
+def test_responses_carry_server_timing(client, make_user, make_recipe):
+    recipe_id = make_recipe(make_user("CHEF"))
+    response = client.get(f"/api/recipes/{recipe_id}")
+    parts = {name: (float(duration), description) for name, duration, description in PARTS.findall(response.headers["server-timing"])}
+    assert set(parts) == {"db", "app"}
+    queries = int(parts["db"][1].split()[0])
+    assert queries >= 1
+    assert parts["db"][0] <= parts["app"][0]
+
+
+def test_requests_are_counted_by_route_template(client, make_user, make_recipe):
+    recipe_id = make_recipe(make_user("CHEF"))
+    ok = 'http_requests_total{method="GET",route="/api/recipes/{recipe_id}",status="200"}'
+    unmatched = 'http_requests_total{method="GET",route="unmatched",status="404"}'
+    before = sample(client, ok), sample(client, unmatched)
+    client.get(f"/api/recipes/{recipe_id}")
+    client.get(f"/api/nothing/{recipe_id}")
+    assert (sample(client, ok), sample(client, unmatched)) == (before[0] + 1, before[1] + 1)
+
+    queries = 'http_request_db_queries_count{method="GET",route="/api/recipes/{recipe_id}"}'
+    assert sample(client, queries) >= 1
+
+
+def test_openai_calls_and_tokens_are_counted(client, fake_openai, make_user):
+    calls = 'openai_requests_total{model="gpt-4o-mini",mode="complete",outcome="ok"}'
+    prompt_tokens = 'openai_tokens_total{model="gpt-4o-mini",type="prompt"}'
+    before = sample(client, calls), sample(client, prompt_tokens)
+    response = client.post("/api/ai/recipes/generate", headers=make_user("CHEF"), json={"ingredients": ["eggs"]})
+    assert response.status_code == 200
+    assert "openai;dur=" in response.headers["server-timing"]
+    assert (sample(client, calls), sample(client, prompt_tokens)) == (before[0] + 1, before[1] + 120)
+
+
+def test_metrics_token_guards_the_endpoint(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert "# TYPE db_pool_checkouts_total counter" in response.text
+
+
+def test_metrics_can_be_turned_off(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert client.get("/metrics").status_code == 404
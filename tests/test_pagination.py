@@ -0,0 +1,67 @@
+import pytest
+
+from app.services.pagination import decode_cursor, encode_cursor
+
+
+def pages(client, **params):
+    """Follow X-Next-Cursor to the end and return the titles of each page."""
+    result = []
+    cursor = None
+    while True:
+        response = client.get("/api/recipes", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        result.append([item["title"] for item in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return result
+
+
+@pytest.fixture
+def chef(make_user, make_recipe):
+    chef = make_user("CHEF")
+    for n in range(7):
+        make_recipe(chef, title=f"Recipe {n}")
+    return chef
+
+
+def test_newest_pages_cover_every_recipe_once(client, chef):
+    assert pages(client, limit=3) == [
+        ["Recipe 6", "Recipe 5", "Recipe 4"],
+        ["Recipe 3", "Recipe 2", "Recipe 1"],
+        ["Recipe 0"],
+    ]
+
+
+def test_pages_do_not_shift_when_recipes_are_added(client, chef, make_recipe):
+    first = client.get("/api/recipes", params={"limit": 3})
+    make_recipe(chef, title="Recipe 7")
+    second = client.get("/api/recipes", params={"limit": 3, "cursor": first.headers["x-next-cursor"]})
+    assert [item["title"] for item in second.json()] == ["Recipe 3", "Recipe 2", "Recipe 1"]
+
+
+def test_top_rated_pages_end_with_unrated_recipes(client, chef, make_user):
+    rater = make_user()
+    ids = {item["title"]: item["id"] for item in client.get("/api/recipes").json()}
+    for title, rating in (("Recipe 1", 5), ("Recipe 4", 3), ("Recipe 5", 3)):
+        client.post(f"/api/recipes/{ids[title]}/rate", headers=rater, json={"rating": rating})
+
+    assert pages(client, sort="top_rated", limit=2) == [
+        ["Recipe 1", "Recipe 5"],
+        ["Recipe 4", "Recipe 6"],
+        ["Recipe 3", "Recipe 2"],
+        ["Recipe 0"],
+    ]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor("top_rated", ["4.5", 1]), encode_cursor("newest", ["yesterday", 1])])
+def test_bad_cursors_are_rejected(client, chef, cursor):
+    response = client.get("/api/recipes", params={"sort": "newest", "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_cursor_round_trips_its_sort_and_values():
+    cursor = encode_cursor("newest", ["2026-01-01T00:00:00", 42])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "newest") == ["2026-01-01T00:00:00", 42]
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "top_rated")
@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from app.database import settings
+from app.services.passwords import PasswordHasher
+
+PASSWORD = "password123"
+
+
+def register(client):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = client.post("/api/auth/register", json={"name": "Test", "email": email, "password": PASSWORD, "user_type": "REGULAR"})
+    assert response.status_code == 201, response.text
+    return email
+
+
+def stored_hash(database, email):
+    with database.connect() as conn:
+        return conn.execute(text("SELECT password_hash FROM users WHERE email = :email"), {"email": email}).scalar_one()
+
+
+def test_login_upgrades_hashes_below_the_configured_cost(client, database):
+    email = register(client)
+    weak = PasswordHasher(rounds=4, workers=1, max_pending=1).context.hash(PASSWORD)
+    with database.begin() as conn:
+        conn.execute(text("UPDATE users SET password_hash = :hash WHERE email = :email"), {"hash": weak, "email": email})
+
+    assert client.post("/api/auth/login", json={"email": email, "password": PASSWORD}).status_code == 200
+    assert stored_hash(database, email).startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+
+def test_wrong_passwords_and_unknown_emails_look_alike(client):
+    email = register(client)
+    for credentials in ({"email": email, "password": "wrong-password"}, {"email": "nobody@example.com", "password": PASSWORD}):
+        response = client.post("/api/auth/login", json=credentials)
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Incorrect email or password"
+
+
+def test_hashes_beyond_the_queue_bound_are_turned_away():
+    hasher = PasswordHasher(rounds=10, workers=1, max_pending=2)
+
+    async def main():
+        return await asyncio.gather(*[hasher.hash(PASSWORD) for _ in range(3)], return_exceptions=True)
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        hasher.shutdown()
+    assert [isinstance(result, str) for result in results] == [True, True, False]
+    assert isinstance(results[2], HTTPException) and results[2].status_code == 503
+    assert hasher.pending == 0
+
+
+def test_hashes_verify_and_stronger_ones_are_kept():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1)
+    strong = PasswordHasher(rounds=5, workers=1, max_pending=1).context.hash(PASSWORD)
+    try:
+        assert asyncio.run(hasher.verify_and_update(PASSWORD, strong)) == (True, None)
+        assert asyncio.run(hasher.verify_and_update("wrong-password", strong)) == (False, None)
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,50 @@
+import pytest
+
+from app.models import RecipeSummary
+
+
+@pytest.fixture
+def chef(client, make_user, make_recipe):
+    chef = make_user("CHEF")
+    for n in range(3):
+        make_recipe(chef, title=f"Recipe {n}", tags=["soup"])
+    return chef
+
+
+def test_summary_view_leaves_out_the_long_fields(client, chef):
+    items = client.get("/api/recipes", params={"view": "summary"}).json()
+    assert len(items) == 3
+    assert all(set(item) == set(RecipeSummary.model_fields) for item in items)
+    assert items[0]["author"]["name"] == "Test"
+
+
+def test_sparse_fieldsets_return_what_was_asked_plus_identity(client, chef, make_user):
+    viewer = make_user()
+    recipe_id = client.get("/api/recipes").json()[0]["id"]
+    client.post(f"/api/recipes/{recipe_id}/favorite", headers=viewer)
+
+    items = client.get("/api/recipes", headers=viewer, params={"fields": "title, tags,is_favorite"}).json()
+    assert all(set(item) == {"id", "updated_at", "title", "tags", "is_favorite"} for item in items)
+    assert [item["is_favorite"] for item in items] == [True, False, False]
+    assert items[0]["tags"] == ["soup"]
+
+    # Ownership is worked out from the author, so asking for it brings the author along
+    owned = client.get("/api/recipes", headers=chef, params={"fields": "is_owner", "limit": 1}).json()
+    assert owned[0]["is_owner"] is True
+    assert set(owned[0]) == {"id", "updated_at", "author", "is_owner"}
+
+
+def test_projections_page_like_full_lists(client, chef):
+    first = client.get("/api/recipes", params={"view": "summary", "limit": 2})
+    second = client.get("/api/recipes", params={"view": "summary", "limit": 2, "cursor": first.headers["x-next-cursor"]})
+    assert [item["title"] for item in first.json() + second.json()] == ["Recipe 2", "Recipe 1", "Recipe 0"]
+
+
+@pytest.mark.parametrize("params, detail", [
+    ({"fields": "title,secret"}, "Unknown fields: secret"),
+    ({"fields": "title", "view": "summary"}, "Use either view or fields, not both"),
+])
+def test_bad_projections_are_rejected(client, chef, params, detail):
+    response = client.get("/api/recipes", params=params)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from app.database import create_session
+from app.services.query_diagnostics import QueryBudgetExceeded, RequestQueries, assert_max_queries, statement_shape
+
+LIMITS = (1, 20, 100)
+# The page, its authors and the viewer's favorites and ratings
+MAX_LIST_QUERIES = 3
+
+
+@pytest.fixture
+def viewer(client, make_user, make_recipe):
+    """Headers of a user who favorited and rated some of 120 public recipes by two chefs."""
+    chefs = [make_user("CHEF"), make_user("CHEF")]
+    viewer, rater = make_user(), make_user()
+    for n in range(120):
+        recipe_id = make_recipe(chefs[n % 2], title=f"Recipe {n}", tags=["dinner"] if n % 3 else ["soup", "dinner"])
+        if n % 2:
+            assert client.post(f"/api/recipes/{recipe_id}/favorite", headers=viewer).status_code == 201
+        if n % 3:
+            client.post(f"/api/recipes/{recipe_id}/rate", headers=viewer, json={"rating": n % 5 + 1})
+        client.post(f"/api/recipes/{recipe_id}/rate", headers=rater, json={"rating": 5 - n % 5})
+    # Caches the viewer's token, as on any request after the first
+    client.get("/api/recipes", headers=viewer, params={"limit": 1})
+    return viewer
+
+
+@pytest.mark.parametrize("params", [{"sort": "newest"}, {"sort": "top_rated"}, {"view": "summary"}])
+def test_recipe_list_queries_do_not_grow_with_the_page(client, viewer, params):
+    for limit in LIMITS:
+        with assert_max_queries(MAX_LIST_QUERIES):
+            response = client.get("/api/recipes", headers=viewer, params={**params, "limit": limit})
+        assert response.status_code == 200, response.text
+        items = response.json()
+        assert len(items) == limit
+        assert any(item["is_favorite"] for item in items) or limit == 1
+
+
+def test_query_budget_reports_statements_by_shape(client):
+    with pytest.raises(QueryBudgetExceeded, match=r"3 queries, budget 2:\n  3 x SELECT \?"):
+        with assert_max_queries(2) as statements:
+            for n in range(3):
+                client.portal.call(_select, n)
+    assert len(statements) == 3
+
+
+async def _select(n):
+    db = create_session()
+    try:
+        await db.execute(text(f"SELECT {n}"))
+    finally:
+        await db.close()
+
+
+def test_statement_shape_blanks_out_values():
+    assert statement_shape("SELECT * FROM recipes WHERE id = 7 AND title = 'Soup'") == "SELECT * FROM recipes WHERE id = ? AND title = ?"
+    assert statement_shape("SELECT * FROM recipes WHERE id IN ($1, $2, $3)") == statement_shape("SELECT * FROM recipes WHERE id IN ($1, $2)")
+
+
+def test_repeated_statement_shape_is_reported_as_n_plus_one(caplog):
+    queries = RequestQueries({"method": "GET", "path": "/api/recipes"}, repeat_threshold=3)
+    for recipe_id in range(4):
+        queries.record(f"SELECT * FROM ratings WHERE recipe_id = {recipe_id}", 0.001)
+    queries.record("SELECT * FROM recipes", 0.001)
+
+    with caplog.at_level(logging.WARNING, logger="app.services.query_diagnostics"):
+        queries.report()
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert message.startswith("Likely N+1 in GET /api/recipes: 4 executions of one statement")
+    assert "SELECT * FROM ratings WHERE recipe_id = ?" in message
+    # Where the repeats started: this test
+    assert "tests/test_query_budget.py" in message
+
+
+def test_statements_under_the_threshold_are_not_reported(caplog):
+    queries = RequestQueries({"method": "GET", "path": "/api/recipes"}, repeat_threshold=3)
+    for recipe_id in range(3):
+        queries.record(f"SELECT * FROM ratings WHERE recipe_id = {recipe_id}", 0.001)
+
+    with caplog.at_level(logging.WARNING, logger="app.services.query_diagnostics"):
+        queries.report()
+
+    assert caplog.records == []
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.database import settings
+from app.services import rate_limit
+from app.services.rate_limit import InMemoryRateLimitStore, RateLimitStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def take(store, cost, burst=5, rate=1.0):
+    return asyncio.run(store.take("bucket", rate, burst, cost))
+
+
+def test_bucket_refills_at_the_rate(clock):
+    store = InMemoryRateLimitStore(10)
+    assert [take(store, 1) for _ in range(5)] == [0] * 5
+    assert take(store, 1) == 1.0
+    clock[0] += 2
+    assert take(store, 2) == 0
+    assert take(store, 1) == 1.0
+
+
+def test_costs_beyond_the_burst_leave_the_bucket_in_debt(clock):
+    store = InMemoryRateLimitStore(10)
+    take(store, 1)
+    # Needs a full bucket first
+    assert take(store, 14) == 1.0
+    clock[0] += 1
+    assert take(store, 14) == 0
+    # Nine in debt: the next request waits for ten tokens' worth of refill
+    assert take(store, 1) == 10.0
+    clock[0] += 10
+    assert take(store, 1) == 0
+
+
+def test_large_batches_are_charged_in_full(client, fake_openai, make_user):
+    chef = make_user("CHEF")
+    items = [{"ingredients": [f"ingredient {n}"]} for n in range(settings.AI_BATCH_MAX_ITEMS)]
+    assert client.post("/api/ai/recipes/generate/batch", headers=chef, json={"items": items}).status_code == 200
+
+    response = client.post("/api/ai/recipes/generate", headers=chef, json={"ingredients": ["eggs"]})
+    assert response.status_code == 429
+    assert response.json()["detail"] == "Too many AI requests"
+    debt = settings.AI_BATCH_MAX_ITEMS - settings.AI_REQUEST_BURST
+    assert int(response.headers["retry-after"]) >= (debt + 1) / settings.AI_REQUESTS_PER_SECOND - 1
+    assert fake_openai.calls == settings.AI_BATCH_MAX_ITEMS
+
+
+def test_token_budget_stops_generation_once_spent(client, fake_openai, make_user, monkeypatch):
+    # One completion of the fake client uses 200 tokens
+    monkeypatch.setattr(settings, "AI_TOKEN_BUDGET_REGULAR", 300)
+    regular = make_user()
+    for _ in range(2):
+        assert client.post("/api/ai/recipes/generate", headers=regular, params={"fresh": True}, json={"ingredients": ["eggs"]}).status_code == 200
+    response = client.post("/api/ai/recipes/generate", headers=regular, json={"ingredients": ["rice"]})
+    assert response.status_code == 429
+    assert response.json()["detail"] == "AI token budget exhausted"
+    assert fake_openai.calls == 2
+    # Budgets are per user type
+    assert client.post("/api/ai/recipes/generate", headers=make_user("CHEF"), json={"ingredients": ["rice"]}).status_code == 200
+
+
+def test_rate_limit_stores_must_implement_the_interface():
+    class Incomplete(RateLimitStore):
+        async def take(self, key, rate, burst, cost):
+            return 0
+
+    with pytest.raises(TypeError):
+        Incomplete()
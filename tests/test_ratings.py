@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+
+def aggregates(database, recipe_id):
+    with database.connect() as conn:
+        return tuple(conn.execute(
+            text("SELECT rating_count, rating_sum, avg_rating FROM recipes WHERE id = :id"), {"id": recipe_id}
+        ).one())
+
+
+@pytest.fixture
+def recipe_id(make_user, make_recipe):
+    return make_recipe(make_user("CHEF"))
+
+
+def rate(client, headers, recipe_id, rating):
+    return client.post(f"/api/recipes/{recipe_id}/rate", headers=headers, json={"rating": rating})
+
+
+def test_rerating_replaces_the_previous_rating(client, database, make_user, recipe_id):
+    first, second = make_user(), make_user()
+    assert rate(client, first, recipe_id, 5).json() == {"user_rating": 5, "avg_rating": "5.00"}
+    assert rate(client, second, recipe_id, 2).json()["avg_rating"] == "3.50"
+    assert rate(client, first, recipe_id, 3).json()["avg_rating"] == "2.50"
+    assert aggregates(database, recipe_id) == (2, 5, Decimal("2.50"))
+
+
+def test_concurrent_ratings_are_all_counted(client, database, make_user, recipe_id):
+    raters = [make_user() for _ in range(8)]
+    with ThreadPoolExecutor(len(raters)) as pool:
+        responses = list(pool.map(lambda n: rate(client, raters[n], recipe_id, n % 5 + 1), range(len(raters))))
+    assert all(response.status_code == 200 for response in responses)
+    assert aggregates(database, recipe_id) == (8, 21, Decimal("2.63"))
+
+
+def test_rating_unknown_or_out_of_range(client, make_user, recipe_id):
+    rater = make_user()
+    assert rate(client, rater, recipe_id + 1000, 4).status_code == 404
+    assert rate(client, rater, recipe_id, 6).status_code == 400
+    assert rate(client, rater, recipe_id, 0).status_code == 400
@@ -0,0 +1,124 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Recipe, User, UserType
+from app.services.search import SQLiteSearchBackend, SearchBackend, tokenize_search
+
+
+def titles(response):
+    assert response.status_code == 200, response.text
+    return [item["title"] for item in response.json()]
+
+
+@pytest.fixture
+def chef(make_user, make_recipe):
+    chef = make_user("CHEF")
+    make_recipe(chef, title="Tomato soup", description="A warm bowl", tags=["soup"])
+    make_recipe(chef, title="Chicken curry", description="Spiced with tomatoes and chicken thighs", ingredients=["chicken", "tomato"])
+    make_recipe(chef, title="Chocolate cake", description="Rich and dark")
+    return chef
+
+
+def test_search_matches_stems_and_ranks_by_relevance(client, chef):
+    # "tomatoes" and "tomato" share a stem; the title match ranks first
+    assert titles(client.get("/api/recipes", params={"search": "tomatoes"})) == ["Tomato soup", "Chicken curry"]
+    assert titles(client.get("/api/recipes", params={"search": "chicken tomato"})) == ["Chicken curry"]
+    assert titles(client.get("/api/recipes", params={"search": "soup", "sort": "newest"})) == ["Tomato soup"]
+
+
+def test_last_word_is_a_prefix(client, chef):
+    assert titles(client.get("/api/recipes", params={"search": "choc"})) == ["Chocolate cake"]
+
+
+def test_relevance_pages_follow_the_cursor(client, chef, make_recipe):
+    for n in range(3):
+        make_recipe(chef, title=f"Tomato salad {n}")
+    seen = []
+    cursor = None
+    while True:
+        params = {"search": "tomato", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/recipes", params=params)
+        seen += titles(response)
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 5
+
+
+@pytest.mark.parametrize("term", ["'", "-", "  ", "!?"])
+def test_search_without_words_matches_nothing(client, chef, term):
+    for sort in (None, "relevance", "newest"):
+        params = {"search": term, **({"sort": sort} if sort else {})}
+        assert titles(client.get("/api/recipes", params=params)) == []
+
+
+def test_search_backends_must_implement_the_interface():
+    class Incomplete(SearchBackend):
+        def tag_condition(self, tag):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_tokenize_search_lowercases_words():
+    assert tokenize_search("Crème-brûlée, 2 EGGS!") == ["crème", "brûlée", "2", "eggs"]
+
+
+@pytest.fixture
+def sqlite_session():
+    """The SQLite FTS5 fallback, on a throwaway in-memory database."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        chef = User(name="Chef", email="chef@example.com", password_hash="-", user_type=UserType.CHEF.value)
+        session.add(chef)
+        session.flush()
+        for title, description, tags in (
+            ("Tomato soup", "A warm bowl", ["soup", "vegan"]),
+            ("Chicken curry", "Spiced with tomatoes", ["dinner"]),
+            ("Chocolate cake", "Rich and dark", ["dessert", "vegan"]),
+        ):
+            session.add(Recipe(
+                user_id=chef.id, title=title, description=description, ingredients=["water"], steps=["Cook"],
+                time_minutes=10, difficulty="Easy", tags=tags, source="manual"
+            ))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def sqlite_search(session, term, **tags):
+    backend = SQLiteSearchBackend()
+    query, rank = backend.apply(select(Recipe.title), term)
+    query = backend.filter_tags(query, **tags)
+    return session.execute(query.order_by(rank.desc(), Recipe.id.desc())).scalars().all()
+
+
+def test_sqlite_backend_matches_stems_and_prefixes(sqlite_session):
+    assert sqlite_search(sqlite_session, "tomatoes") == ["Tomato soup", "Chicken curry"]
+    assert sqlite_search(sqlite_session, "choc") == ["Chocolate cake"]
+    assert sqlite_search(sqlite_session, "tomato chicken") == ["Chicken curry"]
+
+
+def test_sqlite_backend_filters_tags(sqlite_session):
+    assert sqlite_search(sqlite_session, "tomato", all_tags=["soup"]) == ["Tomato soup"]
+    assert sqlite_search(sqlite_session, "tomato", any_tags=["dinner", "vegan"]) == ["Tomato soup", "Chicken curry"]
+    assert sqlite_search(sqlite_session, "tomato", all_tags=["soup", "dinner"]) == []
+
+
+def test_sqlite_backend_follows_edits_and_deletes(sqlite_session):
+    soup = sqlite_session.execute(select(Recipe).where(Recipe.title == "Tomato soup")).scalar_one()
+    soup.title = "Leek soup"
+    sqlite_session.commit()
+    assert sqlite_search(sqlite_session, "leek") == ["Leek soup"]
+    assert sqlite_search(sqlite_session, "tomato") == ["Chicken curry"]
+    sqlite_session.delete(soup)
+    sqlite_session.commit()
+    assert sqlite_search(sqlite_session, "leek") == []
+
+
+def test_sqlite_backend_search_without_words_matches_nothing(sqlite_session):
+    assert sqlite_search(sqlite_session, "-") == []
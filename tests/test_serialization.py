@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app.models import RecipeResponse, RecipeSummary
+from app.services.serialization import dumps
+
+NOW = datetime(2026, 10, 17, 12, 30, 5, 123456, tzinfo=timezone.utc)
+RECIPE = {
+    "id": 7, "user_id": 3, "title": "Crème brûlée", "description": "Custard \"burnt\" on top",
+    "ingredients": ["4 egg yolks", "cream"], "steps": ["Bake", "Torch"], "time_minutes": 50,
+    "difficulty": "Medium", "tags": ["dessert"], "source": "manual", "is_public": True,
+    "avg_rating": Decimal("4.50"), "created_at": NOW, "updated_at": NOW,
+    "author": {"id": 3, "name": "Chef"}, "is_owner": False, "is_favorite": True, "user_rating": None,
+}
+
+
+@pytest.mark.parametrize("schema", [RecipeResponse, RecipeSummary])
+def test_rendering_matches_pydantic_json(schema):
+    model = schema.model_validate({name: value for name, value in RECIPE.items() if name in schema.model_fields})
+    assert dumps(model) == model.model_dump_json().encode()
+    assert dumps([model.model_dump(mode="json")]) == f"[{model.model_dump_json()}]".encode()
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_responses_match_their_schema(client, make_user, make_recipe):
+    chef = make_user("CHEF")
+    recipe_id = make_recipe(chef, title="Custard")
+    client.post(f"/api/recipes/{recipe_id}/rate", headers=make_user(), json={"rating": 4})
+    response = client.get(f"/api/recipes/{recipe_id}", headers=chef)
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    assert body == RecipeResponse.model_validate(body).model_dump(mode="json")
+    assert body["avg_rating"] == "4.00"
+    assert body["created_at"].endswith("Z")
@@ -0,0 +1,68 @@
+from sqlalchemy import func, select, text
+
+from app.services.recommendations import LOCK_KEY, refresh_similarities
+
+
+def refresh(client, rebuild=False):
+    # On the app's event loop, where its engine's connections live
+    return client.portal.call(refresh_similarities, rebuild)
+
+
+def similar(client, recipe_id, headers=None):
+    response = client.get(f"/api/recipes/{recipe_id}/similar", headers=headers)
+    assert response.status_code == 200, response.text
+    return [item["title"] for item in response.json()]
+
+
+def stored_lists(database, recipe_id):
+    with database.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM recipe_similarities WHERE recipe_id = :id"), {"id": recipe_id}).scalar()
+
+
+def test_first_run_builds_and_saves_the_model(client, database, make_user, make_recipe):
+    chef = make_user("CHEF")
+    omelette = make_recipe(chef, title="Omelette", ingredients=["eggs", "tomato", "onion"], tags=["breakfast"])
+    make_recipe(chef, title="Shakshuka", ingredients=["eggs", "tomatoes", "onion", "cumin"], tags=["breakfast"])
+    make_recipe(chef, title="Cake", ingredients=["flour", "sugar", "butter"])
+    make_recipe(chef, title="Biscuits", ingredients=["flour", "sugar", "butter", "milk"])
+
+    # No saved model yet, so even a fold-in rebuilds
+    result = refresh(client)
+    assert (result["command"], result["recipes"]) == ("rebuild", 4)
+    assert similar(client, omelette) == ["Shakshuka"]
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM similarity_models")).scalar() == 1
+
+    assert refresh(client)["command"] == "fold-in"
+    assert refresh(client, rebuild=True)["command"] == "rebuild"
+
+
+def test_fold_in_applies_new_edited_and_hidden_recipes(client, database, make_user, make_recipe):
+    chef = make_user("CHEF")
+    omelette = make_recipe(chef, title="Omelette", ingredients=["eggs", "tomato", "onion"])
+    shakshuka = make_recipe(chef, title="Shakshuka", ingredients=["eggs", "tomatoes", "onion", "cumin"])
+    cake = make_recipe(chef, title="Cake", ingredients=["flour", "sugar", "butter", "eggs"])
+    make_recipe(chef, title="Biscuits", ingredients=["flour", "sugar", "butter"])
+    refresh(client)
+    assert similar(client, omelette) == ["Shakshuka", "Cake"]
+    assert stored_lists(database, shakshuka) > 0
+
+    frittata = make_recipe(chef, title="Frittata", ingredients=["eggs", "tomato", "onion"])
+    client.put(f"/api/recipes/{shakshuka}", headers=chef, json={"is_public": False})
+    client.put(f"/api/recipes/{cake}", headers=chef, json={"ingredients": ["flour", "sugar", "butter"]})
+    assert refresh(client)["command"] == "fold-in"
+
+    assert similar(client, omelette) == ["Frittata"]
+    assert similar(client, frittata) == ["Omelette"]
+    # The hidden recipe's own list goes too, not just its places in others'
+    assert stored_lists(database, shakshuka) == 0
+    assert similar(client, shakshuka, headers=chef) == []
+
+
+def test_overlapping_runs_are_skipped(client, database):
+    with database.connect() as conn:
+        assert conn.execute(select(func.pg_try_advisory_lock(*LOCK_KEY))).scalar()
+        try:
+            assert refresh(client) is None
+        finally:
+            conn.execute(select(func.pg_advisory_unlock(*LOCK_KEY)))
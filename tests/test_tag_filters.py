@@ -0,0 +1,39 @@
+import pytest
+
+
+def titles(client, **params):
+    response = client.get("/api/recipes", params=params)
+    assert response.status_code == 200, response.text
+    return sorted(item["title"] for item in response.json())
+
+
+@pytest.fixture
+def chef(make_user, make_recipe):
+    chef = make_user("CHEF")
+    make_recipe(chef, title="Lentil soup", tags=["vegan", "soup"], time_minutes=40)
+    make_recipe(chef, title="Fruit salad", tags=["vegan", "dessert"], time_minutes=10)
+    make_recipe(chef, title="Beef stew", tags=["dinner"], time_minutes=120)
+    make_recipe(chef, title="Plain toast", tags=[], time_minutes=5)
+    return chef
+
+
+def test_diet_and_tags_must_all_match_by_default(client, chef):
+    assert titles(client, diet="vegan") == ["Fruit salad", "Lentil soup"]
+    assert titles(client, diet="vegan", tag="soup") == ["Lentil soup"]
+    assert titles(client, tag=["vegan", "dinner"]) == []
+
+
+def test_any_tag_match_keeps_the_diet_required(client, chef):
+    assert titles(client, tag=["soup", "dinner"], tag_match="any") == ["Beef stew", "Lentil soup"]
+    assert titles(client, diet="vegan", tag=["soup", "dinner"], tag_match="any") == ["Lentil soup"]
+
+
+def test_tag_filters_combine_with_time_and_search(client, chef):
+    assert titles(client, diet="vegan", max_time=20) == ["Fruit salad"]
+    assert titles(client, search="soup", tag="dinner") == []
+
+
+def test_tags_follow_recipe_edits(client, chef):
+    stew = next(item["id"] for item in client.get("/api/recipes").json() if item["title"] == "Beef stew")
+    assert client.put(f"/api/recipes/{stew}", headers=chef, json={"tags": ["dinner", "soup"]}).status_code == 200
+    assert titles(client, tag="soup") == ["Beef stew", "Lentil soup"]
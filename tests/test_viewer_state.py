@@ -0,0 +1,45 @@
+import pytest
+
+
+def viewer_fields(items):
+    return {item["title"]: (item["is_owner"], item["is_favorite"], item["user_rating"]) for item in items}
+
+
+@pytest.fixture
+def recipes(client, make_user, make_recipe):
+    chef, viewer = make_user("CHEF"), make_user()
+    soup = make_recipe(chef, title="Soup")
+    stew = make_recipe(chef, title="Stew")
+    make_recipe(chef, title="Salad")
+    client.post(f"/api/recipes/{soup}/favorite", headers=viewer)
+    client.post(f"/api/recipes/{stew}/rate", headers=viewer, json={"rating": 4})
+    return chef, viewer
+
+
+def test_list_items_carry_the_viewers_favorites_and_ratings(client, recipes):
+    chef, viewer = recipes
+    response = client.get("/api/recipes", headers=viewer)
+    assert response.status_code == 200, response.text
+    assert viewer_fields(response.json()) == {
+        "Soup": (False, True, None),
+        "Stew": (False, False, 4),
+        "Salad": (False, False, None),
+    }
+
+    owned = viewer_fields(client.get("/api/recipes", headers=chef).json())
+    assert owned == {title: (True, False, None) for title in ("Soup", "Stew", "Salad")}
+
+
+def test_shared_list_does_not_leak_one_viewers_state_to_another(client, recipes):
+    _, viewer = recipes
+    # Warms the shared page cache as this viewer
+    client.get("/api/recipes", headers=viewer)
+    anonymous = viewer_fields(client.get("/api/recipes").json())
+    assert anonymous == {title: (False, False, None) for title in ("Soup", "Stew", "Salad")}
+
+
+def test_detail_carries_the_viewers_state(client, recipes):
+    _, viewer = recipes
+    soup_id = next(item["id"] for item in client.get("/api/recipes").json() if item["title"] == "Soup")
+    item = client.get(f"/api/recipes/{soup_id}", headers=viewer).json()
+    assert (item["is_owner"], item["is_favorite"], item["user_rating"]) == (False, True, None)